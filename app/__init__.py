@@ -24,6 +24,10 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # max file size 16MB
 
     db.init_app(app)
+
+    # Batched background writer for the activity/audit logs
+    from .services.log_sink import log_sink
+    log_sink.init_app(app)
     login_manager.init_app(app)
     csrf = CSRFProtect(app)
     login_manager.login_view = 'auth.login' 
@@ -52,6 +56,29 @@ def create_app():
 
     from .models import User
 
+    # Keep the inquiry_daily_stats rollup in sync with Inquiry writes
+    from .services import inquiry_rollup
+    inquiry_rollup.register_listeners()
+
+    # Bump data_versions on writes so polled endpoints can answer 304
+    from .services import data_versions
+    data_versions.register_listeners()
+
+    # Fold high-volume student page views into hourly counters
+    from .services import activity_aggregation
+    activity_aggregation.register(app)
+
+    # Drop cached navbar badges when notifications, inquiries or sessions change
+    from .services import nav_context
+    nav_context.register_listeners()
+
+    # Drop cached chat sender profiles and inquiry routes when they change
+    from .services import chat_payloads
+    chat_payloads.register_listeners()
+
+    from .commands import register_commands
+    register_commands(app)
+
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
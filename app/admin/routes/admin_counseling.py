@@ -7,9 +7,9 @@ from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from sqlalchemy import func, case, or_
 from sqlalchemy.orm import aliased
-import csv
-import io
 from app.admin import admin_bp
+from app.admin.routes.exports import export_started_response
+from app.services.export_jobs import start_export
 
 @admin_bp.route('/counseling-sessions')
 @login_required
@@ -261,31 +261,24 @@ def export_counseling_csv():
             CounselingSession.scheduled_at < next_day
         )
     
-    # Order by scheduled date
-    sessions = query.order_by(CounselingSession.scheduled_at.desc()).all()
-    
-    # Create a CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Student', 'Office', 'Counselor', 'Scheduled Date', 'Status', 'Notes'])
-    
-    # Write data
-    for session in sessions:
-        student = User.query.join(Student).filter(Student.id == session.student_id).first()
-        counselor = User.query.filter_by(id=session.counselor_id).first()
-        office = Office.query.filter_by(id=session.office_id).first()
+    # Order by scheduled date; the joined names are selected with each session
+    query = query.with_entities(CounselingSession, StudentUser, Office, CounselorUser)\
+        .order_by(CounselingSession.scheduled_at.desc())
+    
+    def build(job):
+        def rows():
+            for session, student, office, counselor in query.with_session(db.session()).yield_per(500):
+                yield [
+                    session.id,
+                    student.get_full_name() if student else 'Unknown',
+                    office.name if office else 'Unknown',
+                    counselor.get_full_name() if counselor else 'Unknown',
+                    session.scheduled_at.strftime('%Y-%m-%d %H:%M'),
+                    session.status,
+                    session.notes or ''
+                ]
         
-        writer.writerow([
-            session.id,
-            student.get_full_name() if student else 'Unknown',
-            office.name if office else 'Unknown',
-            counselor.get_full_name() if counselor else 'Unknown',
-            session.scheduled_at.strftime('%Y-%m-%d %H:%M'),
-            session.status,
-            session.notes or ''
-        ])
+        return ['ID', 'Student', 'Office', 'Counselor', 'Scheduled Date', 'Status', 'Notes'], rows()
     
     # Log the export action
     SuperAdminActivityLog.log_action(
@@ -297,10 +290,7 @@ def export_counseling_csv():
         user_agent=request.user_agent.string
     )
     
-    # Prepare response
-    output.seek(0)
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": "attachment;filename=counseling_sessions.csv"}
-    )
\ No newline at end of file
+    # The CSV is written by a background job; progress and the download link arrive over the socket
+    job = start_export(current_user.id, 'csv', title="Counseling Sessions Export",
+                       filename='counseling_sessions', build=build)
+    return export_started_response(job, url_for('admin.admin_counseling'))
\ No newline at end of file
@@ -1,4 +1,4 @@
-from app.models import Inquiry, InquiryMessage, User, Office, db, OfficeAdmin, Student, CounselingSession, StudentActivityLog, SuperAdminActivityLog, OfficeLoginLog, AuditLog
+from app.models import Inquiry, InquiryMessage, User, Office, db, OfficeAdmin, Student, CounselingSession, StudentActivityLog, SuperAdminActivityLog, OfficeLoginLog, AuditLog, InquiryDailyStat
 from flask import Blueprint, redirect, url_for, render_template, jsonify, request, flash, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_required, current_user
@@ -10,22 +10,24 @@ from sqlalchemy import func, case, or_, desc
 import random
 import os
 from app.admin import admin_bp
+from app.services.timeseries import compare_periods
+from app.services.export_files import EXPORT_FORMATS
+from app.services.export_jobs import start_export
+from app.services.message_history import all_messages
+from app.admin.routes.exports import export_started_response
 
-@admin_bp.route('/admin_inquiries')
-@login_required
-def all_inquiries():
-    """
-    View all inquiries across offices (Superadmin only)
-    This is a read-only view for monitoring purposes
+def filter_inquiries(query, params):
     """
-    office_id = request.args.get('office', type=int)
-    status = request.args.get('status')
-    date_range = request.args.get('date_range')
-    search_query = request.args.get('search')
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
+    Apply the all-inquiries filters (office, status, date_range, search) to an Inquiry query.
 
-    query = Inquiry.query.join(Student).join(User).join(Office)
+    Args:
+        query: Inquiry query joined with Student, User and Office
+        params: The filter values, request.args or request.form
+    """
+    office_id = params.get('office', type=int)
+    status = params.get('status')
+    date_range = params.get('date_range')
+    search_query = params.get('search')
 
     if office_id:
         query = query.filter(Inquiry.office_id == office_id)
@@ -54,8 +56,8 @@ def all_inquiries():
         start_of_last_month = last_month.replace(day=1)
         query = query.filter(Inquiry.created_at >= start_of_last_month, Inquiry.created_at < today.replace(day=1))
     elif date_range == 'custom':
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
         if start_date:
             start_date = datetime.strptime(start_date, '%Y-%m-%d')
             query = query.filter(Inquiry.created_at >= start_date)
@@ -74,7 +76,21 @@ def all_inquiries():
                 Inquiry.content.ilike(search)
             )
         )
-    
+
+    return query
+
+
+@admin_bp.route('/admin_inquiries')
+@login_required
+def all_inquiries():
+    """
+    View all inquiries across offices (Superadmin only)
+    This is a read-only view for monitoring purposes
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = 10
+
+    query = filter_inquiries(Inquiry.query.join(Student).join(User).join(Office), request.args)
 
     offices = Office.query.all()
     
@@ -96,87 +112,33 @@ def all_inquiries():
 def get_inquiry_stats():
     """Calculate inquiry statistics for the dashboard"""
 
-    total = Inquiry.query.count()
-    pending = Inquiry.query.filter_by(status='pending').count()
-    in_progress = Inquiry.query.filter_by(status='in_progress').count()
-    resolved = Inquiry.query.filter_by(status='resolved').count()
-
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Rollup days are UTC, so compare whole UTC weeks
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     start_of_week = today - timedelta(days=today.weekday())
-    
     start_of_last_week = start_of_week - timedelta(days=7)
-    end_of_last_week = start_of_week - timedelta(seconds=1)
-    
-    this_week_total = Inquiry.query.filter(Inquiry.created_at >= start_of_week).count()
-    
-    last_week_total = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_last_week,
-        Inquiry.created_at <= end_of_last_week
-    ).count()
-
-    if last_week_total > 0:
-        total_change = ((this_week_total - last_week_total) / last_week_total) * 100
-    else:
-        total_change = 100 if this_week_total > 0 else 0
-    
-    this_week_pending = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_week,
-        Inquiry.status == 'pending'
-    ).count()
-    
-    last_week_pending = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_last_week,
-        Inquiry.created_at <= end_of_last_week,
-        Inquiry.status == 'pending'
-    ).count()
-    
-    if last_week_pending > 0:
-        pending_change = ((this_week_pending - last_week_pending) / last_week_pending) * 100
-    else:
-        pending_change = 100 if this_week_pending > 0 else 0
-    
-    this_week_in_progress = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_week,
-        Inquiry.status == 'in_progress'
-    ).count()
     
-    last_week_in_progress = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_last_week,
-        Inquiry.created_at <= end_of_last_week,
-        Inquiry.status == 'in_progress'
-    ).count()
-    
-    if last_week_in_progress > 0:
-        in_progress_change = ((this_week_in_progress - last_week_in_progress) / last_week_in_progress) * 100
-    else:
-        in_progress_change = 100 if this_week_in_progress > 0 else 0
-    
-    this_week_resolved = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_week,
-        Inquiry.status == 'resolved'
-    ).count()
-    
-    last_week_resolved = Inquiry.query.filter(
-        Inquiry.created_at >= start_of_last_week,
-        Inquiry.created_at <= end_of_last_week,
-        Inquiry.status == 'resolved'
-    ).count()
-    
-    if last_week_resolved > 0:
-        resolved_change = ((this_week_resolved - last_week_resolved) / last_week_resolved) * 100
-    else:
-        resolved_change = 100 if this_week_resolved > 0 else 0
+    # Totals and both weeks per status in one query over the inquiry_daily_stats rollup
+    stats = compare_periods(
+        InquiryDailyStat.day,
+        current=(start_of_week, None),
+        previous=(start_of_last_week, start_of_week),
+        group_by=InquiryDailyStat.status,
+        weight=InquiryDailyStat.inquiry_count,
+        include_overall=True
+    )
+    overall = stats['overall']
+    change = stats['change']
     
     # Return all stats
     return {
-        'total': total,
-        'pending': pending,
-        'in_progress': in_progress,
-        'resolved': resolved,
-        'total_change': round(total_change),
-        'pending_change': round(pending_change),
-        'in_progress_change': round(in_progress_change),
-        'resolved_change': round(resolved_change)
+        'total': overall['total'],
+        'pending': overall.get('pending', 0),
+        'in_progress': overall.get('in_progress', 0),
+        'resolved': overall.get('resolved', 0),
+        'total_change': round(change.get('total', 0)),
+        'pending_change': round(change.get('pending', 0)),
+        'in_progress_change': round(change.get('in_progress', 0)),
+        'resolved_change': round(change.get('resolved', 0))
     }
 
 @admin_bp.route('/admin/inquiry/<int:inquiry_id>')
@@ -188,8 +150,7 @@ def view_inquiry_details(inquiry_id):
     """
     inquiry = Inquiry.query.get_or_404(inquiry_id)
 
-    # Fix: Use proper query instead of trying to sort the InstrumentedList
-    messages = InquiryMessage.query.filter_by(inquiry_id=inquiry_id).order_by(InquiryMessage.created_at).all() if hasattr(inquiry, 'messages') else []
+    messages = all_messages(inquiry_id)
     
     return render_template(
         'admin/inquiry_details_modal.html',
@@ -203,22 +164,38 @@ def export_inquiries():
     """
     Export filtered inquiries data in various formats
     """
-    export_format = request.form.get('format', 'csv')
+    if current_user.role != 'super_admin':
+        return jsonify({'error': 'Unauthorized'}), 403
     
-    office_id = request.form.get('office', type=int)
-    status = request.form.get('status')
-    date_range = request.form.get('date_range')
-    search_query = request.form.get('search')
-    
-    query = Inquiry.query.join(Student).join(User).join(Office)
-
-    inquiries = query.order_by(desc(Inquiry.created_at)).all()
- 
-    if export_format == 'csv':
-        pass
-    elif export_format == 'pdf':
-        pass
-    elif export_format == 'excel':
-        pass
-    
-    return jsonify({'error': 'Export format not supported'}), 400
\ No newline at end of file
+    export_format = request.form.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Export format not supported'}), 400
+    
+    query = filter_inquiries(Inquiry.query.join(Student).join(User).join(Office), request.form)
+    query = query.with_entities(Inquiry, Student, User, Office).order_by(desc(Inquiry.created_at))
+    
+    def build(job):
+        job.total_rows = query.with_session(db.session()).order_by(None).count()
+        
+        def rows():
+            for inquiry, student, user, office in query.with_session(db.session()).yield_per(500):
+                yield [
+                    inquiry.id,
+                    f"{user.first_name} {user.last_name}",
+                    student.student_number or '',
+                    office.name,
+                    inquiry.subject,
+                    inquiry.status,
+                    inquiry.created_at.strftime('%Y-%m-%d %H:%M') if inquiry.created_at else ''
+                ]
+        
+        return ['ID', 'Student', 'Student Number', 'Office', 'Subject', 'Status', 'Created'], rows()
+    
+    # The file is built by a background job; progress and the download link arrive over the socket
+    job = start_export(
+        current_user.id, export_format,
+        title="Inquiries Export",
+        filename=f"inquiries_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        build=build
+    )
+    return export_started_response(job, url_for('admin.all_inquiries'))
\ No newline at end of file
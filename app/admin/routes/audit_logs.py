@@ -1,4 +1,4 @@
-from app.models import Inquiry, InquiryMessage, User, Office, db, OfficeAdmin, Student, CounselingSession, StudentActivityLog, SuperAdminActivityLog, OfficeLoginLog, AuditLog
+from app.models import Inquiry, InquiryMessage, User, Office, db, OfficeAdmin, Student, CounselingSession, StudentActivityLog, StudentActivityCounter, SuperAdminActivityLog, OfficeLoginLog, AuditLog
 from flask import Blueprint, redirect, url_for, render_template, jsonify, request, flash, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_required, current_user
@@ -10,9 +10,42 @@ from sqlalchemy import func, case, or_
 import random
 import os
 from app.admin import admin_bp
+from app.services.keyset import keyset_paginate, keyset_batches, approximate_count
+from app.services.log_search import search_filter, matching_student_ids
+from app.services.export_files import EXPORT_FORMATS
+from app.services.export_jobs import start_export
+from app.admin.routes.exports import export_started_response
+from app.services.activity_stream import StreamSource, merged_page
 
 ################################# AUDIT LOGS ###############################################
 
+def date_range_filters(column, filter_params):
+    """
+    Half-open [date_from, date_to + 1 day) bounds on ``column`` from the date filters.
+
+    Plain comparisons on the raw column let PostgreSQL skip the monthly log
+    partitions outside the range (see app/services/log_partitions.py).
+    """
+    filters = []
+    if filter_params['date_from']:
+        filters.append(column >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
+    if filter_params['date_to']:
+        filters.append(column < datetime.strptime(filter_params['date_to'], '%Y-%m-%d') + timedelta(days=1))
+    return filters
+
+
+def paginate_logs(query, time_column, id_column, per_page=10, cursor_arg='cursor'):
+    """
+    Keyset page of ``query`` for the ``cursor_arg`` request arg, with an approximate total.
+
+    Replaces ``.paginate()``, whose OFFSET and exact COUNT(*) get slower the
+    deeper the page and the bigger the log tables (see app/services/keyset.py).
+    """
+    page = keyset_paginate(query, time_column, id_column, cursor=request.args.get(cursor_arg), per_page=per_page)
+    page.total, page.total_is_estimate = approximate_count(query)
+    return page
+
+
 @admin_bp.route('/audit-logs')
 @login_required
 def audit_logs():
@@ -44,6 +77,8 @@ def audit_logs():
         return handle_office_logs(filter_params)
     elif filter_type == 'superadmin':
         return handle_superadmin_logs(filter_params)
+    elif filter_type == 'stream':
+        return handle_stream_logs(filter_params)
     else:  # 'all' or any other value
         return handle_all_logs(filter_params)
 
@@ -59,20 +94,9 @@ def handle_student_logs(filter_params):
     ).order_by(StudentActivityLog.timestamp.desc())
     
     if filter_params['search']:
-        student_logs_query = student_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                StudentActivityLog.action.ilike(f"%{filter_params['search']}%")
-            )
-        )
-    
-    if filter_params['date_from']:
-        student_logs_query = student_logs_query.filter(StudentActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
+        student_logs_query = student_logs_query.filter(search_filter('student', filter_params['search']))
     
-    if filter_params['date_to']:
-        student_logs_query = student_logs_query.filter(StudentActivityLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+    student_logs_query = student_logs_query.filter(*date_range_filters(StudentActivityLog.timestamp, filter_params))
     
     students_query = db.session.query(
         User,
@@ -91,9 +115,8 @@ def handle_student_logs(filter_params):
     )
     
     # Pagination
-    page = request.args.get('page', 1, type=int)
     per_page = 10
-    paginated_logs = student_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = paginate_logs(student_logs_query, StudentActivityLog.timestamp, StudentActivityLog.id, per_page)
     
     # Format student logs for display
     formatted_logs = []
@@ -109,10 +132,50 @@ def handle_student_logs(filter_params):
             'ip_address': log.ip_address
         })
     
+    # Hourly page view counters (view events are aggregated instead of logged one by one)
+    view_counts_query = db.session.query(
+        StudentActivityCounter, User
+    ).join(
+        Student, StudentActivityCounter.student_id == Student.id
+    ).join(
+        User, Student.user_id == User.id
+    )
+    
+    if filter_params['search']:
+        view_counts_query = view_counts_query.filter(
+            or_(
+                StudentActivityCounter.student_id.in_(matching_student_ids(filter_params['search'])),
+                StudentActivityCounter.action.ilike(f"%{filter_params['search']}%")
+            )
+        )
+    
+    view_counts_query = view_counts_query.filter(*date_range_filters(StudentActivityCounter.hour, filter_params))
+    
+    # Paged separately from the logs above, with its own cursor
+    paginated_views = paginate_logs(
+        view_counts_query, StudentActivityCounter.hour, StudentActivityCounter.id,
+        per_page=per_page, cursor_arg='views_cursor'
+    )
+    
+    view_counts = []
+    for counter, user in paginated_views.items:
+        view_counts.append({
+            'student_name': f"{user.first_name} {user.last_name}",
+            'student_email': user.email,
+            'action': counter.action,
+            'related_type': counter.related_type,
+            'related_id': counter.related_id or None,
+            'event_count': counter.event_count,
+            'hour': counter.hour,
+            'last_seen': counter.last_seen
+        })
+    
     return render_template('admin/audit_logs.html', 
                           students=students_query.all(),
                           student_logs=formatted_logs,
                           pagination=paginated_logs,
+                          student_view_counts=view_counts,
+                          views_pagination=paginated_views,
                           filter_type='student',
                           search_query=filter_params['search'],
                           view_type='student')
@@ -131,20 +194,9 @@ def handle_office_logs(filter_params):
     ).order_by(OfficeLoginLog.login_time.desc())
     
     if filter_params['search']:
-        office_logs_query = office_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                Office.name.ilike(f"%{filter_params['search']}%")
-            )
-        )
-    
-    if filter_params['date_from']:
-        office_logs_query = office_logs_query.filter(OfficeLoginLog.login_time >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
+        office_logs_query = office_logs_query.filter(search_filter('office', filter_params['search']))
     
-    if filter_params['date_to']:
-        office_logs_query = office_logs_query.filter(OfficeLoginLog.login_time <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+    office_logs_query = office_logs_query.filter(*date_range_filters(OfficeLoginLog.login_time, filter_params))
     
     offices_query = db.session.query(
         Office,
@@ -161,9 +213,7 @@ def handle_office_logs(filter_params):
     )
     
     # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    paginated_logs = office_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = paginate_logs(office_logs_query, OfficeLoginLog.login_time, OfficeLoginLog.id)
     
     # Format office logs for display
     formatted_logs = []
@@ -200,21 +250,9 @@ def handle_superadmin_logs(filter_params):
     ).order_by(SuperAdminActivityLog.timestamp.desc())
     
     if filter_params['search']:
-        superadmin_logs_query = superadmin_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                SuperAdminActivityLog.action.ilike(f"%{filter_params['search']}%"),
-                SuperAdminActivityLog.target_type.ilike(f"%{filter_params['search']}%")
-            )
-        )
+        superadmin_logs_query = superadmin_logs_query.filter(search_filter('superadmin', filter_params['search']))
     
-    if filter_params['date_from']:
-        superadmin_logs_query = superadmin_logs_query.filter(SuperAdminActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
-    
-    if filter_params['date_to']:
-        superadmin_logs_query = superadmin_logs_query.filter(SuperAdminActivityLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+    superadmin_logs_query = superadmin_logs_query.filter(*date_range_filters(SuperAdminActivityLog.timestamp, filter_params))
     
     super_admins_query = db.session.query(
         User,
@@ -228,9 +266,7 @@ def handle_superadmin_logs(filter_params):
     )
     
     # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    paginated_logs = superadmin_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = paginate_logs(superadmin_logs_query, SuperAdminActivityLog.timestamp, SuperAdminActivityLog.id)
     
     # Format super admin logs for display
     formatted_logs = []
@@ -270,26 +306,12 @@ def handle_all_logs(filter_params):
     ).order_by(AuditLog.timestamp.desc())
     
     if filter_params['search']:
-        audit_logs_query = audit_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                AuditLog.action.ilike(f"%{filter_params['search']}%"),
-                AuditLog.target_type.ilike(f"%{filter_params['search']}%")
-            )
-        )
-    
-    if filter_params['date_from']:
-        audit_logs_query = audit_logs_query.filter(AuditLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
+        audit_logs_query = audit_logs_query.filter(search_filter('all', filter_params['search']))
     
-    if filter_params['date_to']:
-        audit_logs_query = audit_logs_query.filter(AuditLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+    audit_logs_query = audit_logs_query.filter(*date_range_filters(AuditLog.timestamp, filter_params))
     
     # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    paginated_logs = audit_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = paginate_logs(audit_logs_query, AuditLog.timestamp, AuditLog.id)
     
     # Format audit logs for display
     formatted_logs = []
@@ -315,6 +337,86 @@ def handle_all_logs(filter_params):
                           view_type='all')
 
 
+def _stream_item(source, log, user, timestamp, **fields):
+    item = {
+        'source': source,
+        'id': log.id,
+        'timestamp': timestamp,
+        'actor_name': f"{user.first_name} {user.last_name}" if user else "Unknown",
+        'actor_email': user.email if user else None,
+        'is_success': log.is_success,
+        'ip_address': log.ip_address
+    }
+    item.update(fields)
+    return item
+
+
+def _log_source(log_type, name, time_column, id_column, format_row):
+    """A log table as a stream source, using the same filtered query as its export"""
+    return StreamSource(
+        name, lambda filter_params: log_export_query(log_type, filter_params)[0],
+        time_column, id_column, format_row
+    )
+
+
+# The four log tables merged by the 'stream' view, rows as built by log_export_query
+ACTIVITY_SOURCES = (
+    _log_source('all', 'audit', AuditLog.timestamp, AuditLog.id, lambda row: _stream_item(
+        'audit', row[0], row[1], row[0].timestamp,
+        actor_role=row[1].role if row[1] else row[0].actor_role,
+        action=row[0].action, target_type=row[0].target_type
+    )),
+    _log_source('student', 'student', StudentActivityLog.timestamp, StudentActivityLog.id, lambda row: _stream_item(
+        'student', row[0], row[2], row[0].timestamp,
+        actor_role='student', action=row[0].action, target_type=row[0].related_type
+    )),
+    _log_source('office', 'office', OfficeLoginLog.login_time, OfficeLoginLog.id, lambda row: _stream_item(
+        'office', row[0], row[2], row[0].login_time,
+        actor_role='office_admin', action=f"Logged in to {row[3].name}", target_type='office'
+    )),
+    _log_source('superadmin', 'superadmin', SuperAdminActivityLog.timestamp, SuperAdminActivityLog.id, lambda row: _stream_item(
+        'superadmin', row[0], row[1], row[0].timestamp,
+        actor_role='super_admin', action=row[0].action, target_type=row[0].target_type
+    )),
+)
+
+
+def handle_stream_logs(filter_params):
+    """Handle the merged activity stream of all four log tables"""
+    page = merged_page(ACTIVITY_SOURCES, filter_params, cursor=request.args.get('cursor'), per_page=25)
+    
+    return render_template('admin/audit_logs.html',
+                          stream_logs=page['items'],
+                          stream_next_cursor=page['next_cursor'],
+                          filter_type='stream',
+                          search_query=filter_params['search'],
+                          view_type='stream')
+
+
+@admin_bp.route('/api/activity-stream')
+@login_required
+def activity_stream_api():
+    """
+    The merged activity stream as JSON, newest first.
+
+    Pass the returned next_cursor back as ``cursor`` for the following page.
+    """
+    if current_user.role != 'super_admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    filter_params = {
+        'search': request.args.get('search', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', '')
+    }
+    per_page = min(request.args.get('per_page', 25, type=int), 100)
+    page = merged_page(ACTIVITY_SOURCES, filter_params, cursor=request.args.get('cursor'), per_page=per_page)
+    
+    for item in page['items']:
+        item['timestamp'] = item['timestamp'].isoformat() if item['timestamp'] else None
+    return jsonify(page)
+
+
 @admin_bp.route('/export-logs', methods=['GET'])
 @login_required
 def export_logs():
@@ -336,21 +438,32 @@ def export_logs():
         'action': request.args.get('action', '')
     }
     
-    logs = get_logs_based_on_type_and_filters(log_type, filter_params)
-    
-    if export_format == 'csv':
-        return export_logs_csv(logs, log_type)
-    elif export_format == 'excel':
-        return export_logs_excel(logs, log_type)
-    elif export_format == 'pdf':
-        return export_logs_pdf(logs, log_type)
-    else:
+    if export_format not in EXPORT_FORMATS:
         flash('Unsupported export format', 'error')
         return redirect(url_for('admin.audit_logs', filter_type=log_type))
+    
+    def build(job):
+        query, time_column, id_column = log_export_query(log_type, filter_params)
+        job.total_rows = approximate_count(query)[0]
+        return export_table(keyset_batches(query, time_column, id_column), log_type, for_pdf=export_format == 'pdf')
+    
+    # The file is built by a background job; progress and the download link arrive over the socket
+    job = start_export(
+        current_user.id, export_format,
+        title=f"{log_type.capitalize()} Audit Logs Export",
+        filename=f"{log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        build=build
+    )
+    return export_started_response(job, url_for('admin.audit_logs', filter_type=log_type))
+
 
+def log_export_query(log_type, filter_params):
+    """
+    Build the export query for a log type.
 
-def get_logs_based_on_type_and_filters(log_type, filter_params):
-    """Get logs based on type and applied filters."""
+    Returns:
+        tuple: (query, time column, id column) for keyset iteration
+    """
     if log_type == 'student':
         query = db.session.query(
             StudentActivityLog, Student, User
@@ -361,22 +474,11 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%'),
-                    User.last_name.ilike(f'%{filter_params["search"]}%'),
-                    User.email.ilike(f'%{filter_params["search"]}%'),
-                    StudentActivityLog.action.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(search_filter('student', filter_params['search']))
             
-        if filter_params['date_from']:
-            query = query.filter(StudentActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
-        
-        if filter_params['date_to']:
-            query = query.filter(StudentActivityLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+        query = query.filter(*date_range_filters(StudentActivityLog.timestamp, filter_params))
             
-        return query.order_by(StudentActivityLog.timestamp.desc()).all()
+        return query, StudentActivityLog.timestamp, StudentActivityLog.id
         
     elif log_type == 'office':
         query = db.session.query(
@@ -390,22 +492,11 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%'),
-                    User.last_name.ilike(f'%{filter_params["search"]}%'),
-                    User.email.ilike(f'%{filter_params["search"]}%'),
-                    Office.name.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(search_filter('office', filter_params['search']))
             
-        if filter_params['date_from']:
-            query = query.filter(OfficeLoginLog.login_time >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
-        
-        if filter_params['date_to']:
-            query = query.filter(OfficeLoginLog.login_time <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+        query = query.filter(*date_range_filters(OfficeLoginLog.login_time, filter_params))
             
-        return query.order_by(OfficeLoginLog.login_time.desc()).all()
+        return query, OfficeLoginLog.login_time, OfficeLoginLog.id
         
     elif log_type == 'superadmin':
         query = db.session.query(
@@ -415,23 +506,11 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%'),
-                    User.last_name.ilike(f'%{filter_params["search"]}%'),
-                    User.email.ilike(f'%{filter_params["search"]}%'),
-                    SuperAdminActivityLog.action.ilike(f'%{filter_params["search"]}%'),
-                    SuperAdminActivityLog.target_type.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(search_filter('superadmin', filter_params['search']))
             
-        if filter_params['date_from']:
-            query = query.filter(SuperAdminActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
-        
-        if filter_params['date_to']:
-            query = query.filter(SuperAdminActivityLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
+        query = query.filter(*date_range_filters(SuperAdminActivityLog.timestamp, filter_params))
             
-        return query.order_by(SuperAdminActivityLog.timestamp.desc()).all()
+        return query, SuperAdminActivityLog.timestamp, SuperAdminActivityLog.id
         
     else:  # 'all' or any other value
         query = db.session.query(
@@ -441,284 +520,94 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%') if User else False,
-                    User.last_name.ilike(f'%{filter_params["search"]}%') if User else False,
-                    User.email.ilike(f'%{filter_params["search"]}%') if User else False,
-                    AuditLog.action.ilike(f'%{filter_params["search"]}%'),
-                    AuditLog.target_type.ilike(f'%{filter_params["search"]}%')
-                )
-            )
-            
-        if filter_params['date_from']:
-            query = query.filter(AuditLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
-        
-        if filter_params['date_to']:
-            query = query.filter(AuditLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
-            
-        return query.order_by(AuditLog.timestamp.desc()).all()
-
-
-def export_logs_csv(logs, log_type):
-    """Export logs as CSV file."""
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    if log_type == 'student':
-        writer.writerow(['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, student, user in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                log.action,
-                log.related_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'office':
-        writer.writerow(['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration (sec)', 'Status', 'IP Address'])
-        
-        for log, office_admin, user, office in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                office.name,
-                log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
-                log.session_duration or '',
-                'Success' if log.is_success else 'Failed',
-                log.ip_address or ''
-            ])
+            query = query.filter(search_filter('all', filter_params['search']))
             
-    elif log_type == 'superadmin':
-        writer.writerow(['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Details', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.email if user else '',
-                log.action,
-                log.target_type or '',
-                log.details or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
+        query = query.filter(*date_range_filters(AuditLog.timestamp, filter_params))
             
-    else:  # 'all' or any other value
-        writer.writerow(['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.role if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-    
-    output.seek(0)
-    
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-    )
-
+        return query, AuditLog.timestamp, AuditLog.id
 
-def export_logs_excel(logs, log_type):
-    """Export logs as Excel file."""
-    import openpyxl
-    from io import BytesIO
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = f"{log_type.capitalize()} Logs"
-    
-    if log_type == 'student':
-        ws.append(['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, student, user in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                log.action,
-                log.related_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'office':
-        ws.append(['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration (sec)', 'Status', 'IP Address'])
-        
-        for log, office_admin, user, office in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                office.name,
-                log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
-                log.session_duration or '',
-                'Success' if log.is_success else 'Failed',
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'superadmin':
-        ws.append(['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Details', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.email if user else '',
-                log.action,
-                log.target_type or '',
-                log.details or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    else:  # 'all' or any other value
-        ws.append(['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.role if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-    
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return Response(
-        output.getvalue(),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"}
-    )
 
+def export_table(logs, log_type, for_pdf=False):
+    """
+    Header row and a generator of data rows for a log export.
 
-def export_logs_pdf(logs, log_type):
-    """Export logs as PDF file."""
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.pagesizes import letter, landscape
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet
-    from io import BytesIO
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    
-    elements.append(Paragraph(f"{log_type.capitalize()} Audit Logs Export", title_style))
-    elements.append(Spacer(1, 12))
-    
+    The PDF layout leaves out super admin details and shows session
+    durations with their unit; CSV and Excel share the full columns.
+    """
     if log_type == 'student':
-        data = [['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address']]
+        headers = ['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address']
         
-        for log, student, user in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                log.action,
-                log.related_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
+        def rows():
+            for log, student, user in logs:
+                yield [
+                    log.id,
+                    f"{user.first_name} {user.last_name}",
+                    user.email,
+                    log.action,
+                    log.related_type or '',
+                    'Success' if log.is_success else 'Failed',
+                    log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                    log.ip_address or ''
+                ]
             
     elif log_type == 'office':
-        data = [['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration', 'Status', 'IP Address']]
+        headers = ['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time',
+                   'Duration' if for_pdf else 'Duration (sec)', 'Status', 'IP Address']
         
-        for log, office_admin, user, office in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                office.name,
-                log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
-                str(log.session_duration) + ' sec' if log.session_duration else '',
-                'Success' if log.is_success else 'Failed',
-                log.ip_address or ''
-            ])
+        def rows():
+            for log, office_admin, user, office in logs:
+                if for_pdf:
+                    duration = str(log.session_duration) + ' sec' if log.session_duration else ''
+                else:
+                    duration = log.session_duration or ''
+                yield [
+                    log.id,
+                    f"{user.first_name} {user.last_name}",
+                    user.email,
+                    office.name,
+                    log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
+                    log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
+                    duration,
+                    'Success' if log.is_success else 'Failed',
+                    log.ip_address or ''
+                ]
             
     elif log_type == 'superadmin':
-        data = [['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address']]
+        headers = ['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Details', 'Status', 'Timestamp', 'IP Address']
+        if for_pdf:
+            headers.remove('Details')
         
-        for log, user in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.email if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
+        def rows():
+            for log, user in logs:
+                row = [
+                    log.id,
+                    f"{user.first_name} {user.last_name}" if user else 'Unknown',
+                    user.email if user else '',
+                    log.action,
+                    log.target_type or '',
+                    log.details or '',
+                    'Success' if log.is_success else 'Failed',
+                    log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                    log.ip_address or ''
+                ]
+                if for_pdf:
+                    del row[5]
+                yield row
             
     else:  # 'all' or any other value
-        data = [['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address']]
+        headers = ['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address']
         
-        for log, user in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.role if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-    
-    # Create the table with appropriate styling
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
-    
-    return Response(
-        buffer.getvalue(),
-        mimetype="application/pdf",
-        headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
-    )
\ No newline at end of file
+        def rows():
+            for log, user in logs:
+                yield [
+                    log.id,
+                    f"{user.first_name} {user.last_name}" if user else 'Unknown',
+                    user.role if user else '',
+                    log.action,
+                    log.target_type or '',
+                    'Success' if log.is_success else 'Failed',
+                    log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                    log.ip_address or ''
+                ]
+    
+    return headers, rows()
@@ -9,6 +9,9 @@ from datetime import datetime, timedelta
 from sqlalchemy import func, case, or_
 from app.admin import admin_bp
 from app.websockets.admin_sockets import emit_inquiry_update, emit_session_update, emit_system_log, update_dashboard_stats
+from app.services.timeseries import inquiry_time_series, trailing_window
+from app.services.inquiry_rollup import status_counts, office_counts
+from app.services.data_versions import versioned_sections, versioned_response
 
 @admin_bp.route('/dashboard')
 @login_required
@@ -20,29 +23,25 @@ def dashboard():
     # Dashboard statistics
     total_students = User.query.filter_by(role='student').count()
     total_office_admins = User.query.filter_by(role='office_admin').count()
-    total_inquiries = Inquiry.query.count()
-    pending_inquiries = Inquiry.query.filter_by(status='pending').count()
-    resolved_inquiries = Inquiry.query.filter_by(status='resolved').count()
+    # Inquiry totals come from the inquiry_daily_stats rollup
+    inquiry_counts = status_counts()
+    total_inquiries = inquiry_counts['total']
+    pending_inquiries = inquiry_counts.get('pending', 0)
+    resolved_inquiries = inquiry_counts.get('resolved', 0)
 
     # Office data
     office_data = []
     offices = Office.query.all()
+    counts_by_office = office_counts()
     for office in offices:
-        inquiry_count = db.session.query(db.func.count(Inquiry.id)).filter(Inquiry.office_id == office.id).scalar()
         office_data.append({
             "name": office.name,
-            "count": inquiry_count
+            "count": counts_by_office.get(office.id, 0)
         })
     
     # Find top office by inquiry count
-    top_office = (
-        db.session.query(Office.name, db.func.count(Inquiry.id).label('inquiry_count'))
-        .join(Inquiry)
-        .group_by(Office.id)
-        .order_by(db.desc('inquiry_count'))
-        .first()
-    )
-    top_inquiry_office = top_office.name if top_office else "N/A"
+    top_office = max(office_data, key=lambda item: item['count'], default=None)
+    top_inquiry_office = top_office['name'] if top_office and top_office['count'] else "N/A"
     
     # Recent activities and logs
     recent_activities = AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(5).all()
@@ -64,67 +63,8 @@ def dashboard():
         .all()
     )
     
-    # Chart data initialization
-    weekly_labels = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
-    current_week_data = [0, 0, 0, 0, 0, 0, 0]  
-    weekly_new_inquiries = current_week_data.copy()  # Use copy to avoid reference issues
-    weekly_resolved = current_week_data.copy() 
-    
-    monthly_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    monthly_new_inquiries = [0] * 12  
-    monthly_resolved = [0] * 12  
-    
-    # Calculate weekly inquiry data
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_of_week = day.weekday()
-        
-        # Adjust for Python's weekday (0=Monday) to our display (0=Sunday)
-        chart_index = (day_of_week + 1) % 7
-        
-        new_count = (
-            Inquiry.query
-            .filter(func.date(Inquiry.created_at) == day.date())
-            .count()
-        )
-        
-        # For resolved inquiries, we count those that have status='resolved'
-        # and were updated (not using resolved_at since it doesn't exist)
-        resolved_count = (
-            Inquiry.query
-            .filter(
-                func.date(Inquiry.created_at) == day.date(),
-                Inquiry.status == 'resolved'
-            )
-            .count()
-        )
-        
-        # Update the data arrays
-        weekly_new_inquiries[chart_index] = new_count
-        weekly_resolved[chart_index] = resolved_count
-    
-    # Calculate monthly data
-    current_month = today.month - 1  # 0-based index for months
-    for i in range(12):
-        month_index = (current_month - 11 + i) % 12  # Get the month index, wrapping around
-        year_offset = 0 if month_index <= current_month else -1
-        query_year = today.year + year_offset
-        
-        # Month in database is 1-based
-        db_month = month_index + 1
-        
-        # Count new inquiries for this month
-        monthly_new_inquiries[i] = Inquiry.query.filter(
-            func.extract('year', Inquiry.created_at) == query_year,
-            func.extract('month', Inquiry.created_at) == db_month
-        ).count()
-        
-        # Count resolved inquiries for this month
-        monthly_resolved[i] = Inquiry.query.filter(
-            func.extract('year', Inquiry.created_at) == query_year,
-            func.extract('month', Inquiry.created_at) == db_month,
-            Inquiry.status == 'resolved'
-        ).count()
+    # Chart data for the weekly and monthly trend charts
+    chart_data = get_inquiry_chart_data(today)
 
     return render_template(
         'admin/dashboard.html',
@@ -138,14 +78,58 @@ def dashboard():
         recent_activities=recent_activities,
         upcoming_sessions=upcoming_sessions,
         system_logs=system_logs,
-        weekly_labels=weekly_labels,
-        weekly_new_inquiries=weekly_new_inquiries,
-        weekly_resolved=weekly_resolved,
-        monthly_labels=monthly_labels,
-        monthly_new_inquiries=monthly_new_inquiries,
-        monthly_resolved=monthly_resolved
+        weekly_labels=chart_data['weekly_labels'],
+        weekly_new_inquiries=chart_data['weekly_new_inquiries'],
+        weekly_resolved=chart_data['weekly_resolved'],
+        monthly_labels=chart_data['monthly_labels'],
+        monthly_new_inquiries=chart_data['monthly_new_inquiries'],
+        monthly_resolved=chart_data['monthly_resolved']
     )
 
+def get_inquiry_chart_data(now=None):
+    """
+    Build the weekly and monthly inquiry trend chart data.
+
+    Each chart is backed by one grouped query from the time-series service.
+    Weekly values are placed by weekday (Sun-Sat) and monthly values by
+    calendar month (Jan-Dec), matching the fixed labels and the indexes the
+    dashboard JS uses for live increments.
+    """
+    now = now or datetime.utcnow()
+    
+    weekly_labels = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+    weekly_new_inquiries = [0] * 7
+    weekly_resolved = [0] * 7
+    
+    monthly_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    monthly_new_inquiries = [0] * 12
+    monthly_resolved = [0] * 12
+    
+    # Last 7 days, one bucket per day
+    start, end = trailing_window(7, 'day', now)
+    weekly = inquiry_time_series(start, end, 'day')
+    for index, day in enumerate(weekly['buckets']):
+        # Adjust for Python's weekday (0=Monday) to our display (0=Sunday)
+        chart_index = (day.weekday() + 1) % 7
+        weekly_new_inquiries[chart_index] = weekly['new'][index]
+        weekly_resolved[chart_index] = weekly['resolved'][index]
+    
+    # Last 12 months, one bucket per month
+    start, end = trailing_window(12, 'month', now)
+    monthly = inquiry_time_series(start, end, 'month')
+    for index, month in enumerate(monthly['buckets']):
+        monthly_new_inquiries[month.month - 1] = monthly['new'][index]
+        monthly_resolved[month.month - 1] = monthly['resolved'][index]
+    
+    return {
+        'weekly_labels': weekly_labels,
+        'weekly_new_inquiries': weekly_new_inquiries,
+        'weekly_resolved': weekly_resolved,
+        'monthly_labels': monthly_labels,
+        'monthly_new_inquiries': monthly_new_inquiries,
+        'monthly_resolved': monthly_resolved
+    }
+
 @admin_bp.route('/counseling_sessions')
 @login_required
 def counseling_sessions():
@@ -273,24 +257,24 @@ def update_session(session_id):
         db.session.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@admin_bp.route('/api/dashboard/stats', methods=['GET'])
-@login_required
-def get_dashboard_stats():
-    """API endpoint for fetching dashboard statistics"""
-    if not current_user.role in ['office_admin', 'super_admin']:
-        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
-    
-    total_students = User.query.filter_by(role='student').count()
-    total_office_admins = User.query.filter_by(role='office_admin').count()
-    total_inquiries = Inquiry.query.count()
-    pending_inquiries = Inquiry.query.filter_by(status='pending').count()
-    resolved_inquiries = Inquiry.query.filter_by(status='resolved').count()
-    
-    # Get offices with their inquiry counts
+def _dashboard_counts():
+    """Headline counts for the admin dashboard stats API"""
+    inquiry_counts = status_counts()
+    return {
+        'total_students': User.query.filter_by(role='student').count(),
+        'total_office_admins': User.query.filter_by(role='office_admin').count(),
+        'total_inquiries': inquiry_counts['total'],
+        'pending_inquiries': inquiry_counts.get('pending', 0),
+        'resolved_inquiries': inquiry_counts.get('resolved', 0)
+    }
+
+def _dashboard_offices():
+    """Offices with their inquiry and session counts"""
     offices = Office.query.all()
+    counts_by_office = office_counts()
     office_data = []
     for office in offices:
-        inquiry_count = Inquiry.query.filter_by(office_id=office.id).count()
+        inquiry_count = counts_by_office.get(office.id, 0)
         session_count = CounselingSession.query.filter_by(office_id=office.id).count()
         office_data.append({
             "id": office.id,
@@ -298,8 +282,10 @@ def get_dashboard_stats():
             "inquiry_count": inquiry_count,
             "session_count": session_count
         })
-    
-    # Get upcoming sessions
+    return {'offices': office_data}
+
+def _dashboard_upcoming_sessions():
+    """Next five counseling sessions across all offices"""
     today = datetime.utcnow()
     upcoming_sessions = (
         CounselingSession.query
@@ -323,16 +309,29 @@ def get_dashboard_stats():
             "scheduled_at": session.scheduled_at.strftime('%Y-%m-%d %H:%M:%S'),
             "status": session.status
         })
+    return {'upcoming_sessions': upcoming_session_data}
+
+@admin_bp.route('/api/dashboard/stats', methods=['GET'])
+@login_required
+def get_dashboard_stats():
+    """
+    API endpoint for fetching dashboard statistics.
+    Answers 304 on a matching If-None-Match; with ?since=<version> only
+    the sections that changed are included in 'data'.
+    """
+    if not current_user.role in ['office_admin', 'super_admin']:
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
     
-    return jsonify({
-        'status': 'success',
-        'data': {
-            'total_students': total_students,
-            'total_office_admins': total_office_admins,
-            'total_inquiries': total_inquiries,
-            'pending_inquiries': pending_inquiries,
-            'resolved_inquiries': resolved_inquiries,
-            'offices': office_data,
-            'upcoming_sessions': upcoming_session_data
+    payload, token, etag = versioned_sections(
+        ['users', 'inquiries', 'sessions', 'offices'],
+        {
+            'counts': (['users', 'inquiries'], _dashboard_counts),
+            'offices': (['offices', 'inquiries', 'sessions'], _dashboard_offices),
+            'upcoming_sessions': (['sessions', 'users', 'offices'], _dashboard_upcoming_sessions),
+            'charts': (['inquiries'], lambda: {'charts': get_inquiry_chart_data()})
         }
+    )
+    return versioned_response(payload, token, etag, wrap=lambda data: {
+        'status': 'success',
+        'data': data
     })
\ No newline at end of file
@@ -0,0 +1,54 @@
+from flask import redirect, url_for, jsonify, request, flash, send_file, abort
+from flask_login import login_required, current_user
+import os
+from app.admin import admin_bp
+from app.services.export_files import EXPORT_FORMATS
+from app.services.export_jobs import get_job, load_download_token, export_folder
+
+
+################################################ EXPORT JOBS #################################################
+
+def export_started_response(job, fallback_url):
+    """
+    Answer an export request once its job is queued.
+
+    Script callers get the job as JSON and follow it through the
+    ``export_progress`` socket events; plain links are sent back to the page
+    with a flash message.
+    """
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': url_for('admin.export_status', job_id=job.id)
+        }), 202
+
+    flash('Your export has started. A download link will appear when it is ready.', 'info')
+    return redirect(fallback_url)
+
+
+@admin_bp.route('/exports/<job_id>')
+@login_required
+def export_status(job_id):
+    """Current state of one of the user's export jobs"""
+    job = get_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@admin_bp.route('/exports/download/<token>')
+@login_required
+def download_export(token):
+    """Download a finished export through the signed link sent with its last progress event"""
+    data = load_download_token(token)
+    if data is None or data['user'] != current_user.id:
+        abort(404)
+
+    path = os.path.join(export_folder(), os.path.basename(data['file']))
+    if not os.path.exists(path):
+        abort(404)
+
+    extension = os.path.splitext(path)[1].lstrip('.')
+    mimetype = next((mime for ext, mime in EXPORT_FORMATS.values() if ext == extension), 'application/octet-stream')
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=data['name'])
@@ -89,14 +89,11 @@ def manage_admins():
     offices = Office.query.all()
     
     # Log the action
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
+    SuperAdminActivityLog.log_action(
+        super_admin=current_user,
         action="Viewed admin management page",
-        target_type="system",
-        timestamp=datetime.utcnow()
+        target_type="system"
     )
-    db.session.add(log)
-    db.session.commit()
     
     return render_template(
         'admin/manage_admin.html',
@@ -150,15 +147,12 @@ def admin_details(admin_id):
     }
     
     # Log the action
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
+    SuperAdminActivityLog.log_action(
+        super_admin=current_user,
         action=f"Viewed admin details",
         target_type="user",
-        target_user_id=admin_id,
-        timestamp=datetime.utcnow()
+        target_user=user
     )
-    db.session.add(log)
-    db.session.commit()
     
     return jsonify(admin_details)
 
@@ -7,13 +7,63 @@ from app import socketio
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from sqlalchemy import func, case, or_
+from sqlalchemy.orm import selectinload, contains_eager
 import random
 import os
 from app.admin import admin_bp
+from app.services.inquiry_rollup import status_counts, office_counts
 
 ################################# OFFICE STATS ###############################################
 
 
+def admin_counts_by_office():
+    """
+    Count admins and enabled admins per office in one grouped query.
+
+    Returns:
+        dict: office_id -> (admin_count, enabled_admin_count); offices without admins are absent
+    """
+    rows = db.session.query(
+        OfficeAdmin.office_id,
+        func.count(OfficeAdmin.id),
+        func.sum(case((User.is_active == True, 1), else_=0))
+    ).join(User, OfficeAdmin.user_id == User.id).group_by(OfficeAdmin.office_id).all()
+    return {office_id: (count, int(enabled or 0)) for office_id, count, enabled in rows}
+
+
+def unassigned_admins_query():
+    """Office admin users that are not assigned to any office (NOT EXISTS anti-join)"""
+    assigned = db.session.query(OfficeAdmin.id).filter(OfficeAdmin.user_id == User.id).exists()
+    return User.query.filter(User.role == 'office_admin', ~assigned).order_by(User.id)
+
+
+def get_office_stats_summary(admin_counts=None):
+    """
+    Headline office/admin assignment figures, computed with aggregate queries.
+
+    Args:
+        admin_counts: Result of admin_counts_by_office() if the caller already has it
+
+    Returns:
+        dict: Office, admin and inquiry totals
+    """
+    if admin_counts is None:
+        admin_counts = admin_counts_by_office()
+
+    total_offices = Office.query.count()
+    inquiry_counts = status_counts()
+    return {
+        'total_offices': total_offices,
+        'active_offices': len(admin_counts),
+        'unassigned_offices': total_offices - len(admin_counts),
+        'total_admins': User.query.filter(User.role == 'office_admin').count(),
+        'active_admins': sum(enabled for _, enabled in admin_counts.values()),
+        'unassigned_admins': unassigned_admins_query().count(),
+        'total_inquiries': inquiry_counts['total'],
+        'pending_inquiries': inquiry_counts.get('pending', 0)
+    }
+
+
 @admin_bp.route('/office-stats')
 @login_required
 def office_stats():
@@ -21,65 +71,122 @@ def office_stats():
         flash('You do not have permission to access this page.', 'error')
         return redirect(url_for('main.index'))
     
-    # Get all offices
-    offices = Office.query.all()
+    # Get all offices with their admins and admin users loaded up front
+    offices = Office.query.options(
+        selectinload(Office.office_admins).joinedload(OfficeAdmin.user)
+    ).order_by(Office.id).all()
     
     # Get all office admins with their related data
-    office_admins = OfficeAdmin.query.join(User).join(Office).all()
+    office_admins = OfficeAdmin.query.join(User).join(Office).options(
+        contains_eager(OfficeAdmin.user), contains_eager(OfficeAdmin.office)
+    ).all()
     
-    # Get active offices (those with at least one admin)
-    active_offices = []
-    for office in offices:
-        if office.office_admins:
-            active_offices.append(office)
-    
-    # Get active admins (those whose user account is active)
-    active_admins = []
-    for admin in office_admins:
-        if admin.user.is_active:
-            active_admins.append(admin)
+    admin_counts = admin_counts_by_office()
+    summary = get_office_stats_summary(admin_counts)
     
     # Get unassigned offices (offices with no admins)
-    unassigned_offices = []
-    for office in offices:
-        if not office.office_admins:
-            unassigned_offices.append(office)
+    unassigned_offices = [office for office in offices if office.id not in admin_counts]
     
     # Get unassigned admins (users with admin role but not assigned to any office)
-    # First, get all users with admin role who are not super admins
-    admin_users = User.query.filter(User.role == 'office_admin').all()
-    
-    # Then filter out those who are already assigned to an office
-    assigned_admin_ids = [admin.user_id for admin in office_admins]
-    unassigned_admins = [user for user in admin_users if user.id not in assigned_admin_ids]
+    unassigned_admins = unassigned_admins_query().all()
     
     # Get available admins for assignment
     available_admins = unassigned_admins
     
-    # Calculate total inquiries and pending inquiries
-    total_inquiries = Inquiry.query.count()
-    pending_inquiries = Inquiry.query.filter_by(status='pending').count()
+    # Inquiry totals per office from the rollup
+    inquiry_counts = office_counts()
+    pending_counts = office_counts('pending')
     
     # Log this activity
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
-        action="Viewed office statistics",
-        timestamp=datetime.utcnow()
+    SuperAdminActivityLog.log_action(
+        super_admin=current_user,
+        action="Viewed office statistics"
     )
-    db.session.add(log)
-    db.session.commit()
     
     return render_template('admin/office_stats.html', 
                            offices=offices,
                            office_admins=office_admins,
-                           active_offices=active_offices,
-                           active_admins=active_admins,
+                           summary=summary,
                            unassigned_offices=unassigned_offices,
                            unassigned_admins=unassigned_admins,
                            available_admins=available_admins,
-                           total_inquiries=total_inquiries,
-                           pending_inquiries=pending_inquiries,
-                           admins=admin_users) 
+                           inquiry_counts=inquiry_counts,
+                           pending_counts=pending_counts,
+                           total_inquiries=summary['total_inquiries'],
+                           pending_inquiries=summary['pending_inquiries'])
+
+
+@admin_bp.route('/api/office-stats', methods=['GET'])
+@login_required
+def office_stats_api():
+    """Office/admin assignment figures as JSON, with the office and admin rosters paginated"""
+    if current_user.role != 'super_admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 25, type=int), 100)
+    
+    admin_counts = admin_counts_by_office()
+    inquiry_counts = office_counts()
+    pending_counts = office_counts('pending')
+    
+    offices_page = Office.query.order_by(Office.id).paginate(page=page, per_page=per_page, error_out=False)
+    offices = []
+    for office in offices_page.items:
+        admin_count, enabled_admins = admin_counts.get(office.id, (0, 0))
+        offices.append({
+            'id': office.id,
+            'name': office.name,
+            'admin_count': admin_count,
+            'enabled_admins': enabled_admins,
+            'total_inquiries': inquiry_counts.get(office.id, 0),
+            'pending_inquiries': pending_counts.get(office.id, 0)
+        })
+    
+    admins_page = db.session.query(OfficeAdmin, User, Office).join(
+        User, OfficeAdmin.user_id == User.id
+    ).join(
+        Office, OfficeAdmin.office_id == Office.id
+    ).order_by(OfficeAdmin.id).paginate(page=page, per_page=per_page, error_out=False)
+    admins = [{
+        'id': office_admin.id,
+        'user_id': user.id,
+        'name': user.get_full_name(),
+        'email': user.email,
+        'is_active': user.is_active,
+        'office_id': office.id,
+        'office_name': office.name
+    } for office_admin, user, office in admins_page.items]
+    
+    unassigned_page = unassigned_admins_query().paginate(page=page, per_page=per_page, error_out=False)
+    unassigned_admins = [{
+        'id': user.id,
+        'name': user.get_full_name(),
+        'email': user.email
+    } for user in unassigned_page.items]
+    
+    def page_info(pagination):
+        return {
+            'current_page': page,
+            'total_pages': pagination.pages,
+            'total_items': pagination.total,
+            'has_next': pagination.has_next,
+            'has_prev': pagination.has_prev
+        }
+    
+    return jsonify({
+        'status': 'success',
+        'summary': get_office_stats_summary(admin_counts),
+        'offices': offices,
+        'office_admins': admins,
+        'unassigned_admins': unassigned_admins,
+        'pagination': {
+            'offices': page_info(offices_page),
+            'office_admins': page_info(admins_page),
+            'unassigned_admins': page_info(unassigned_page)
+        }
+    })
+
                            
 @admin_bp.route('/office/<int:office_id>/')
 @login_required
@@ -88,39 +195,31 @@ def view_office_details(office_id):
         flash('You do not have permission to access this page.', 'error')
         return redirect(url_for('main.index'))
     
-    office = Office.query.get_or_404(office_id)
+    office = Office.query.options(
+        selectinload(Office.office_admins).joinedload(OfficeAdmin.user)
+    ).filter_by(id=office_id).first_or_404()
     
     # Get recent inquiries for this office
     recent_inquiries = Inquiry.query.filter_by(office_id=office_id).order_by(Inquiry.created_at.desc()).limit(10).all()
     
     # Get stats for this office
+    office_counts = status_counts(office_id)
     inquiry_stats = {
-        'total': Inquiry.query.filter_by(office_id=office_id).count(),
-        'pending': Inquiry.query.filter_by(office_id=office_id, status='pending').count(),
-        'in_progress': Inquiry.query.filter_by(office_id=office_id, status='in_progress').count(),
-        'resolved': Inquiry.query.filter_by(office_id=office_id, status='resolved').count(),
+        'total': office_counts['total'],
+        'pending': office_counts.get('pending', 0),
+        'in_progress': office_counts.get('in_progress', 0),
+        'resolved': office_counts.get('resolved', 0),
     }
     
-    # Get all office admins
-    office_admins = OfficeAdmin.query.all()
-    
-    # Get all users with admin role who are not super admins
-    admin_users = User.query.filter(User.role == 'office_admin').all()
-    
-    # Get assigned admin IDs
-    assigned_admin_ids = [admin.user_id for admin in office_admins]
-    
     # Get unassigned admins (available for assignment)
-    available_admins = [user for user in admin_users if user.id not in assigned_admin_ids]
+    available_admins = unassigned_admins_query().all()
     
     # Log activity
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
+    SuperAdminActivityLog.log_action(
+        super_admin=current_user,
         action=f"Viewed details for office: {office.name}",
-        timestamp=datetime.utcnow()
+        target_office=office
     )
-    db.session.add(log)
-    db.session.commit()
     
     return render_template('admin/office_detail.html', 
                           office=office, 
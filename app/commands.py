@@ -0,0 +1,117 @@
+import click
+
+
+def register_commands(app):
+    """Register maintenance CLI commands (run with `flask <command>`)"""
+
+    @app.cli.command('rebuild-inquiry-stats')
+    @click.option('--office-id', type=int, default=None, help='Only rebuild rows for this office.')
+    def rebuild_inquiry_stats(office_id):
+        """Rebuild the inquiry_daily_stats rollup from the inquiries table."""
+        from app.services.inquiry_rollup import rebuild
+
+        rows = rebuild(office_id=office_id)
+        click.echo(f"Rebuilt inquiry_daily_stats: {rows} rows written")
+
+    @app.cli.command('refresh-office-kpis')
+    def refresh_office_kpis():
+        """Build or refresh the office_kpis snapshot now."""
+        from app.services.office_kpis import refresh
+
+        refresh()
+        click.echo("office_kpis refreshed")
+
+    @app.cli.command('partition-log-tables')
+    @click.option('--months-ahead', type=int, default=3, help='Future monthly partitions to create.')
+    def partition_log_tables(months_ahead):
+        """Convert the log tables to monthly partitioned tables (PostgreSQL)."""
+        from app.services.log_partitions import convert_all, PARTITIONED_TABLES
+
+        converted = convert_all(months_ahead=months_ahead)
+        for table in PARTITIONED_TABLES:
+            state = 'converted' if table in converted else 'already partitioned'
+            click.echo(f"{table}: {state}")
+
+    @app.cli.command('purge-logs')
+    def purge_logs():
+        """Delete log rows past their retention_days now, from the tables and the archive."""
+        from app.services.log_retention import purge_expired, format_report
+        from app.services.log_archive import purge_expired_archive, format_purge_report
+
+        for line in format_report(purge_expired()):
+            click.echo(line)
+        for line in format_purge_report(purge_expired_archive()):
+            click.echo(line)
+
+    @app.cli.command('replay-log-dead-letters')
+    def replay_log_dead_letters():
+        """Write the log records kept in the dead-letter files again."""
+        from app.services.log_sink import replay_dead_letters
+
+        click.echo(f"{replay_dead_letters()} log records replayed")
+
+    @app.cli.command('archive-logs')
+    def archive_logs():
+        """Move log rows older than LOG_ARCHIVE_AFTER_DAYS to the cold archive now."""
+        from app.services.log_archive import archive_logs, format_report
+
+        for line in format_report(archive_logs()):
+            click.echo(line)
+
+    @app.cli.command('search-log-archive')
+    @click.option('--table', default=None, help='Only this log table (e.g. audit_logs).')
+    @click.option('--date-from', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='First day (YYYY-MM-DD).')
+    @click.option('--date-to', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Last day (YYYY-MM-DD).')
+    @click.option('--actor', default=None, help='Email or user id of the acting user.')
+    @click.option('--limit', type=int, default=100, help='Rows to print at most (0 for all).')
+    def search_log_archive(table, date_from, date_to, actor, limit):
+        """Print archived log rows as JSON lines."""
+        import json
+        from app.models import User
+        from app.services.log_archive import scan_archive, actor_ids_for
+
+        actors = None
+        if actor:
+            user = User.query.get(int(actor)) if actor.isdigit() else User.query.filter_by(email=actor).first()
+            if user is None:
+                raise click.ClickException(f"No user matches {actor}")
+            actors = actor_ids_for(user)
+
+        rows = scan_archive(
+            table=table,
+            date_from=date_from.date() if date_from else None,
+            date_to=date_to.date() if date_to else None,
+            actors=actors
+        )
+        for count, (log_table, row) in enumerate(rows, 1):
+            click.echo(json.dumps({'table': log_table, **row}))
+            if limit and count >= limit:
+                break
+
+    @app.cli.command('build-log-retention-indexes')
+    def build_log_retention_indexes():
+        """Create the (retention_days, time) indexes the log purge relies on (concurrently on PostgreSQL)."""
+        from app.services.log_retention import ensure_indexes
+
+        ensure_indexes()
+        click.echo("Log retention indexes are ready")
+
+    @app.cli.command('build-log-search-index')
+    def build_log_search_index():
+        """Create the audit log search indexes (pg_trgm on PostgreSQL, FTS5 on SQLite)."""
+        from app.services.log_search import ensure_search_indexes
+
+        if ensure_search_indexes():
+            click.echo("Audit log search indexes are ready")
+        else:
+            click.echo("Indexed search is not available on this database; searches use ILIKE")
+
+    @app.cli.command('build-message-search-index')
+    def build_message_search_index():
+        """Create the inquiry conversation search indexes (tsvector GIN on PostgreSQL, FTS5 on SQLite)."""
+        from app.services.message_search import ensure_search_indexes
+
+        if ensure_search_indexes():
+            click.echo("Conversation search indexes are ready")
+        else:
+            click.echo("Indexed search is not available on this database; searches use ILIKE")
@@ -1,4 +1,5 @@
 from app.extensions import db
+from app.services.log_sink import log_sink
 from datetime import datetime
 from flask_login import UserMixin
 
@@ -199,9 +200,24 @@ class InquiryMessage(db.Model):
     inquiry = db.relationship('Inquiry', backref=db.backref('messages', order_by=created_at))
     attachments = db.relationship('MessageAttachment', back_populates='message', lazy='joined', cascade='all, delete-orphan')
     
+    # Message history pages are keyset scans over (created_at, id) within one inquiry
+    __table_args__ = (
+        db.Index('idx_inquiry_messages_history', 'inquiry_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<InquiryMessage {self.id}>'
 
+# How far each participant has received and read an inquiry's messages: every
+# message up to the id is delivered / read. Advanced by app/services/message_receipts.py
+class InquiryReadState(db.Model):
+    __tablename__ = 'inquiry_read_states'
+    inquiry_id = db.Column(db.Integer, db.ForeignKey('inquiries.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    delivered_up_to_id = db.Column(db.Integer, nullable=False, default=0)
+    read_up_to_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Update to Inquiry class to ensure it only references InquiryMessage
 class Inquiry(db.Model):
     __tablename__ = 'inquiries'
@@ -228,7 +244,27 @@ class Inquiry(db.Model):
     def get_other_specifications(self):
         """Return specifications for any 'Other' concerns"""
         return {ic.concern_type_id: ic.other_specification for ic in self.concerns if ic.other_specification}
-    
+
+# Daily rollup of inquiry counts per office, creation day and current status.
+# Kept current by the Inquiry listeners in app/services/inquiry_rollup.py
+class InquiryDailyStat(db.Model):
+    __tablename__ = 'inquiry_daily_stats'
+    office_id = db.Column(db.Integer, db.ForeignKey('offices.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)  # Day the inquiries were created (UTC)
+    status = db.Column(db.String(50), primary_key=True)  # Current status of those inquiries
+    inquiry_count = db.Column(db.Integer, nullable=False, default=0)
+
+    office = db.relationship('Office')
+
+# Write counters per data scope (e.g. 'inquiries', 'inquiries:office:3') used as
+# cheap version tokens by polled endpoints. Bumped by the listeners in
+# app/services/data_versions.py
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    scope = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Notification(db.Model):
     __tablename__ = 'notifications'
     id = db.Column(db.Integer, primary_key=True)
@@ -512,8 +548,8 @@ class AuditLog(db.Model, JsonSerializableMixin):
     @classmethod
     def log_action(cls, actor, action, target_type=None, inquiry=None, office=None, status=None, is_success=True, 
                   failure_reason=None, ip_address=None, user_agent=None, retention_days=365):
-        """Helper method to create a new audit log entry"""
-        log = cls(
+        """Helper method to queue a new audit log entry (see app/services/log_sink.py)"""
+        log_sink.enqueue(cls, dict(
             actor_id=actor.id if actor else None,
             actor_role=actor.role if actor else None,
             action=action,
@@ -526,9 +562,7 @@ class AuditLog(db.Model, JsonSerializableMixin):
             ip_address=ip_address,
             user_agent=user_agent,
             retention_days=retention_days
-        )
-        db.session.add(log)
-        return log
+        ))
 
 
 # Student activity log for tracking actions performed by students
@@ -551,8 +585,8 @@ class StudentActivityLog(db.Model, JsonSerializableMixin):
     @classmethod
     def log_action(cls, student, action, related_id=None, related_type=None, is_success=True, 
                   failure_reason=None, ip_address=None, user_agent=None, retention_days=365):
-        """Helper method to create a new student activity log entry"""
-        log = cls(
+        """Helper method to queue a new student activity log entry"""
+        log_sink.enqueue(cls, dict(
             student_id=student.id,
             action=action,
             related_id=related_id,
@@ -562,9 +596,28 @@ class StudentActivityLog(db.Model, JsonSerializableMixin):
             ip_address=ip_address,
             user_agent=user_agent,
             retention_days=retention_days
-        )
-        db.session.add(log)
-        return log
+        ))
+
+# Hourly counters for high-volume student page views, folded from StudentActivityLog
+# entries by app/services/activity_aggregation.py instead of one row per view
+class StudentActivityCounter(db.Model):
+    __tablename__ = 'student_activity_counters'
+    id = db.Column(db.Integer, primary_key=True)  # Keyset tiebreaker for the admin listing
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), nullable=False)
+    action = db.Column(db.String(100), nullable=False)  # Action template, e.g. 'Viewed inquiry'
+    related_id = db.Column(db.Integer, nullable=False, default=0)  # 0 when the action has no related record
+    hour = db.Column(db.DateTime, nullable=False)  # Start of the UTC hour
+    related_type = db.Column(db.String(50))
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    last_seen = db.Column(db.DateTime)
+
+    student = db.relationship('Student')
+
+    __table_args__ = (
+        # One counter per (student, action, related record, hour); the upserts conflict on it
+        db.UniqueConstraint('student_id', 'action', 'related_id', 'hour', name='uq_student_activity_counters_key'),
+        db.Index('idx_student_activity_counters_hour', 'hour', 'id'),
+    )
 
 # Office login logs to track the time when office admins log in
 class OfficeLoginLog(db.Model, JsonSerializableMixin):
@@ -629,8 +682,8 @@ class SuperAdminActivityLog(db.Model, JsonSerializableMixin):
     def log_action(cls, super_admin, action, target_type=None, target_user=None, target_office=None, 
                   details=None, is_success=True, failure_reason=None, ip_address=None, 
                   user_agent=None, retention_days=730):
-        """Helper method to create a new super admin activity log entry"""
-        log = cls(
+        """Helper method to queue a new super admin activity log entry"""
+        log_sink.enqueue(cls, dict(
             super_admin_id=super_admin.id,
             action=action,
             target_type=target_type,
@@ -642,6 +695,4 @@ class SuperAdminActivityLog(db.Model, JsonSerializableMixin):
             ip_address=ip_address,
             user_agent=user_agent,
             retention_days=retention_days
-        )
-        db.session.add(log)
-        return log
\ No newline at end of file
+        ))
\ No newline at end of file
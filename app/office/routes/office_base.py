@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from app.models import Inquiry, CounselingSession, Student, User, OfficeAdmin, Announcement
 from app.utils import role_required
 from .office_dashboard import get_dashboard_stats, get_chart_data
+from app.services.data_versions import office_scope, versioned_sections, versioned_response
+from app.services.nav_context import office_context
 from app.office import office_bp
 
 
@@ -50,47 +52,19 @@ def dashboard():
         (Announcement.target_office_id == office_id) | (Announcement.is_public == True)
     ).order_by(Announcement.created_at.desc()).limit(3).all()
     
-    # Add counts needed by the base template
-    # Count of pending inquiries for the badge in sidebar
-    pending_inquiries_count = Inquiry.query.filter_by(
-        office_id=office_id, 
-        status='pending'
-    ).count()
-    
-    # Count of upcoming counseling sessions for the badge in sidebar
-    upcoming_sessions_count = CounselingSession.query.filter(
-        CounselingSession.office_id == office_id,
-        CounselingSession.scheduled_at >= now,
-        CounselingSession.status.in_(['scheduled', 'confirmed'])
-    ).count()
-    
-    # Count of unread notifications
-    unread_notifications_count = 0
-    # You should replace this with actual notification counting logic
-    # For example:
-    # unread_notifications_count = Notification.query.filter_by(
-    #     user_id=current_user.id, 
-    #     is_read=False
-    # ).count()
-    
-    # Get notifications for dropdown - replace with your actual model/logic
-    notifications = []
-    # For example:
-    # notifications = Notification.query.filter_by(
-    #     user_id=current_user.id
-    # ).order_by(Notification.created_at.desc()).limit(5).all()
+    # Badge counts and notifications for the base template come from the
+    # cached office context processor; the dashboard keeps its own
+    # upcoming-session predicate (scheduled/confirmed, from now on)
+    nav = office_context(current_user.id, office_id)
     
     return render_template('office/office_dashboard.html', 
+                          upcoming_sessions_count=nav['dashboard_upcoming_sessions_count'],
                           stats=stats,
                           chart_data=chart_data,
                           recent_inquiries=recent_inquiries,
                           todays_sessions=todays_sessions,
                           online_staff=online_staff,
                           recent_announcements=recent_announcements,
-                          pending_inquiries_count=pending_inquiries_count,
-                          upcoming_sessions_count=upcoming_sessions_count,
-                          unread_notifications_count=unread_notifications_count,
-                          notifications=notifications,
                           now=now)
 
 
@@ -98,16 +72,27 @@ def dashboard():
 @login_required
 @role_required(['office_admin'])
 def dashboard_data():
-    """API endpoint to get updated dashboard data for AJAX refreshes"""
+    """
+    API endpoint to get updated dashboard data for AJAX refreshes.
+    Answers 304 on a matching If-None-Match; with ?since=<version> only
+    the sections that changed are returned.
+    """
     if not hasattr(current_user, 'office_admin'):
         return jsonify({'error': 'Not authorized'}), 403
     
     office_id = current_user.office_admin.office_id
     
-    stats = get_dashboard_stats(office_id)
-    chart_data = get_chart_data(office_id)
+    # Version scopes this endpoint depends on; unchanged sections are skipped
+    inquiries = office_scope('inquiries', office_id)
+    sessions = office_scope('sessions', office_id)
+    staff = office_scope('staff', office_id)
     
-    return jsonify({
-        'stats': stats,
-        'chart_data': chart_data
-    })
\ No newline at end of file
+    payload, token, etag = versioned_sections(
+        [inquiries, sessions, staff],
+        {
+            'stats': ([inquiries, sessions, staff], lambda: {'stats': get_dashboard_stats(office_id)}),
+            'chart_data': ([inquiries, sessions], lambda: {'chart_data': get_chart_data(office_id)})
+        },
+        owner=office_id
+    )
+    return versioned_response(payload, token, etag)
\ No newline at end of file
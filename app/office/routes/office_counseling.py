@@ -102,6 +102,89 @@ def check_upcoming_sessions():
         db.session.commit()
 
 
+@scheduler.task('interval', id='refresh_office_kpis', seconds=300)
+def refresh_office_kpis():
+    """
+    Refresh the office_kpis snapshot (materialized view on PostgreSQL)
+    so dashboards and inquiry lists can read per-office KPIs without recounting
+    """
+    global flask_app
+    
+    if not flask_app:
+        print("Error: Flask app not initialized for scheduler")
+        return
+    
+    with flask_app.app_context():
+        from app.services.office_kpis import refresh
+        
+        try:
+            refresh()
+        except Exception as e:
+            db.session.rollback()
+            flask_app.logger.error(f"Error refreshing office KPIs: {str(e)}")
+
+
+@scheduler.task('interval', id='ensure_log_partitions', hours=12)
+def ensure_log_partitions():
+    """
+    Create the current and upcoming monthly partitions of the log tables
+    (PostgreSQL only, once they were converted with `flask partition-log-tables`)
+    """
+    global flask_app
+    
+    if not flask_app:
+        print("Error: Flask app not initialized for scheduler")
+        return
+    
+    with flask_app.app_context():
+        from app.services.log_partitions import ensure_partitions
+        
+        try:
+            ensure_partitions()
+        except Exception as e:
+            db.session.rollback()
+            flask_app.logger.error(f"Error creating log partitions: {str(e)}")
+
+
+@scheduler.task('interval', id='purge_expired_logs', hours=24)
+def purge_expired_logs():
+    """
+    Move old log rows to the cold archive, then delete log rows older than
+    their retention_days in small batches, drop fully expired log partitions
+    and remove expired rows from the archive
+    """
+    global flask_app
+    
+    if not flask_app:
+        print("Error: Flask app not initialized for scheduler")
+        return
+    
+    with flask_app.app_context():
+        from app.services.log_retention import purge_expired, format_report
+        from app.services import log_archive
+        
+        try:
+            for line in log_archive.format_report(log_archive.archive_logs()):
+                flask_app.logger.info(f"Log archive: {line}")
+        except Exception as e:
+            db.session.rollback()
+            flask_app.logger.error(f"Error archiving old logs: {str(e)}")
+        
+        try:
+            report = purge_expired()
+            for line in format_report(report):
+                flask_app.logger.info(f"Log retention: {line}")
+        except Exception as e:
+            db.session.rollback()
+            flask_app.logger.error(f"Error purging expired logs: {str(e)}")
+        
+        try:
+            for line in log_archive.format_purge_report(log_archive.purge_expired_archive()):
+                flask_app.logger.info(f"Log archive retention: {line}")
+        except Exception as e:
+            flask_app.logger.error(f"Error purging expired archived logs: {str(e)}")
+
+
 @office_bp.route('/video-counseling')
 @login_required
 def video_counseling():
@@ -9,34 +9,29 @@ from datetime import datetime, timedelta
 import time  # Add missing import for time module
 from sqlalchemy import func, case, desc, or_  # Add missing desc import
 from app.office import office_bp
+from app.services.timeseries import (
+    inquiry_time_series, time_series, trailing_window, compare_periods, percent_change
+)
+from app.services.inquiry_rollup import status_counts
+from app.services.office_kpis import get_office_kpis
+from app.services.nav_context import office_context
 
 
 def get_dashboard_stats(office_id):
     """Calculate dashboard statistics for a specific office"""
     now = datetime.utcnow()
     one_week_ago = now - timedelta(days=7)
-    one_month_ago = now - timedelta(days=30)
-    two_months_ago = now - timedelta(days=60)
-    
-    # Pending inquiries
-    pending_inquiries = Inquiry.query.filter_by(
-        office_id=office_id, status='pending'
-    ).count()
-    
-    # Pending inquiries last week for comparison
-    pending_inquiries_last_week = Inquiry.query.filter(
-        Inquiry.office_id == office_id,
-        Inquiry.status == 'pending',
-        Inquiry.created_at > one_week_ago,
-        Inquiry.created_at <= now - timedelta(days=1)
-    ).count()
     
-    # Calculate % change
-    if pending_inquiries_last_week > 0:
-        pending_inquiries_change = ((pending_inquiries - pending_inquiries_last_week) / 
-                                   pending_inquiries_last_week) * 100
-    else:
-        pending_inquiries_change = 0
+    # Pending inquiries now vs. those created in the last week (up to yesterday), one query
+    pending = compare_periods(
+        Inquiry.created_at,
+        current=(None, None),
+        previous=(one_week_ago, now - timedelta(days=1)),
+        filters=[Inquiry.office_id == office_id, Inquiry.status == 'pending'],
+        empty_change=0
+    )
+    pending_inquiries = pending['current']['total']
+    pending_inquiries_change = pending['change']['total']
     
     # Upcoming sessions
     tomorrow = now + timedelta(days=1)
@@ -69,52 +64,13 @@ def get_dashboard_stats(office_id):
         else:
             next_session_time = next_session.scheduled_at.strftime('%b %d, %H:%M')
     
-    # Students served this month (resolved inquiries or completed sessions)
-    students_served_month = db.session.query(func.count(func.distinct(Student.id))).join(
-        Inquiry, Student.id == Inquiry.student_id
-    ).filter(
-        Inquiry.office_id == office_id,
-        Inquiry.status == 'resolved',
-        Inquiry.created_at > one_month_ago
-    ).scalar()
-    
-    students_served_month += db.session.query(func.count(func.distinct(Student.id))).join(
-        CounselingSession, Student.id == CounselingSession.student_id
-    ).filter(
-        CounselingSession.office_id == office_id,
-        CounselingSession.status == 'completed',
-        CounselingSession.scheduled_at > one_month_ago
-    ).scalar()
-    
-    # Students served previous month
-    students_served_prev_month = db.session.query(
-        func.count(func.distinct(Student.id))
-    ).join(
-        Inquiry, Student.id == Inquiry.student_id
-    ).filter(
-        Inquiry.office_id == office_id,
-        Inquiry.status == 'resolved',
-        Inquiry.created_at > two_months_ago,
-        Inquiry.created_at <= one_month_ago
-    ).scalar()
-    
-    students_served_prev_month += db.session.query(
-        func.count(func.distinct(Student.id))
-    ).join(
-        CounselingSession, Student.id == CounselingSession.student_id
-    ).filter(
-        CounselingSession.office_id == office_id,
-        CounselingSession.status == 'completed',
-        CounselingSession.scheduled_at > two_months_ago,
-        CounselingSession.scheduled_at <= one_month_ago
-    ).scalar()
+    # Students served this month vs. the month before (resolved inquiries or completed sessions)
+    kpis = get_office_kpis(office_id)
+    students_served_month = kpis['students_served_30d']
+    students_served_prev_month = kpis['students_served_prev_30d']
     
     # Calculate percentage change for students served
-    if students_served_prev_month > 0:
-        students_served_change = ((students_served_month - students_served_prev_month) / 
-                                  students_served_prev_month) * 100
-    else:
-        students_served_change = 0
+    students_served_change = percent_change(students_served_month, students_served_prev_month, empty_change=0)
     
     # Staff statistics
     total_staff = OfficeAdmin.query.filter_by(office_id=office_id).count()
@@ -137,88 +93,31 @@ def get_dashboard_stats(office_id):
 
 def get_chart_data(office_id):
     """Get activity chart data for the last 7-14 days for a specific office"""
-    now = datetime.utcnow()
-    labels = []
-    inquiries_data = []
-    sessions_data = []
-    
-    # Get data for the last 7 days
-    for i in range(6, -1, -1):
-        day = now - timedelta(days=i)
-        day_start = datetime.combine(day.date(), datetime.min.time())  # Fixed: use datetime.min.time()
-        day_end = datetime.combine(day.date(), datetime.max.time())    # Fixed: use datetime.max.time()
-        
-        # Format label as "Mon", "Tue", etc.
-        labels.append(day.strftime('%a'))
-        
-        # Count inquiries created on this day
-        inquiries_count = Inquiry.query.filter(
-            Inquiry.office_id == office_id,
-            Inquiry.created_at >= day_start,
-            Inquiry.created_at <= day_end
-        ).count()
-        inquiries_data.append(inquiries_count)
-        
-        # Count counseling sessions scheduled on this day
-        sessions_count = CounselingSession.query.filter(
-            CounselingSession.office_id == office_id,
-            CounselingSession.scheduled_at >= day_start,
-            CounselingSession.scheduled_at <= day_end
-        ).count()
-        sessions_data.append(sessions_count)
+    start, end = trailing_window(7, 'day')
+    
+    # Inquiries come from the daily rollup, sessions from one grouped query
+    inquiries = inquiry_time_series(start, end, 'day', office_id=office_id)
+    sessions = time_series(
+        CounselingSession.scheduled_at, start, end, 'day',
+        filters=[CounselingSession.office_id == office_id]
+    )
     
     return {
-        'labels': labels,
-        'inquiries': inquiries_data,
-        'sessions': sessions_data
+        # Format label as "Mon", "Tue", etc.
+        'labels': [day.strftime('%a') for day in inquiries['buckets']],
+        'inquiries': inquiries['new'],
+        'sessions': sessions['count']
     }
 
 
-# Function to get office context - assumed to be defined elsewhere
 def get_office_context():
-    """Get common context data needed across office views"""
-    # Add notifications data for the office_base.html template
-    from app.models import Notification, CounselingSession, Inquiry
-    from datetime import datetime, timedelta
-    from sqlalchemy import desc
-    
-    unread_notifications_count = 0
-    notifications = []
-    
-    if current_user.is_authenticated:
-        office_id = current_user.office_admin.office_id
-        now = datetime.utcnow()
-        
-        # Get unread notifications count
-        unread_notifications_count = Notification.query.filter_by(
-            user_id=current_user.id,
-            is_read=False
-        ).count()
-        
-        # Get recent notifications for dropdown
-        notifications = Notification.query.filter_by(
-            user_id=current_user.id
-        ).order_by(desc(Notification.created_at)).limit(5).all()
-        
-        # Get count of pending inquiries
-        pending_inquiries_count = Inquiry.query.filter_by(
-            office_id=office_id, 
-            status='pending'
-        ).count()
-        
-        # Get count of upcoming sessions
-        upcoming_sessions_count = CounselingSession.query.filter(
-            CounselingSession.office_id == office_id,
-            CounselingSession.status.in_(['pending', 'confirmed']),
-            CounselingSession.scheduled_at > now
-        ).count()
-        
-        return {
-            'unread_notifications_count': unread_notifications_count,
-            'notifications': notifications,
-            'pending_inquiries_count': pending_inquiries_count,
-            'upcoming_sessions_count': upcoming_sessions_count
-        }
+    """
+    Get common context data needed across office views.
+    Values are cached per (user, office) for a few seconds, see app/services/nav_context.py
+    """
+    office_admin = getattr(current_user, 'office_admin', None) if current_user.is_authenticated else None
+    if office_admin:
+        return office_context(current_user.id, office_admin.office_id)
     
     return {
         'unread_notifications_count': 0,
@@ -227,6 +126,12 @@ def get_office_context():
         'upcoming_sessions_count': 0
     }
 
+
+@office_bp.context_processor
+def inject_office_context():
+    """Provide navbar badges and notifications to every office template"""
+    return get_office_context()
+
 # Additional routes for the office dashboard
 @office_bp.route('/inquiries')
 @login_required
@@ -270,9 +175,10 @@ def inquiries():
     inquiries = query.paginate(page=page, per_page=20, error_out=False)
     
     # Get stats for sidebar
-    pending_count = Inquiry.query.filter_by(office_id=office_id, status='pending').count()
-    in_progress_count = Inquiry.query.filter_by(office_id=office_id, status='in_progress').count()
-    resolved_count = Inquiry.query.filter_by(office_id=office_id, status='resolved').count()
+    office_counts = status_counts(office_id)
+    pending_count = office_counts.get('pending', 0)
+    in_progress_count = office_counts.get('in_progress', 0)
+    resolved_count = office_counts.get('resolved', 0)
     
     context = get_office_context()
     context.update({
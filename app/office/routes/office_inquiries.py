@@ -11,12 +11,17 @@ import time
 from sqlalchemy import func, case, desc, or_
 from app.office import office_bp
 from app.utils import role_required
+from app.services.office_kpis import get_office_kpis
+from app.services.message_history import message_page, message_to_dict
+from app.services import message_receipts
+from app.services.message_search import search_messages
 
 
 def calculate_response_rate(office_id):
     """
     Calculate the response rate for inquiries in a specific office.
     Response rate is defined as the percentage of inquiries that have at least one response.
+    The value comes from the office_kpis snapshot, so it lags by up to one refresh interval.
     
     Args:
         office_id: The ID of the office to calculate the response rate for
@@ -24,26 +29,8 @@ def calculate_response_rate(office_id):
     Returns:
         int: The response rate as a percentage (0-100)
     """
-    # Get all inquiries for this office
-    total_inquiries = Inquiry.query.filter_by(office_id=office_id).count()
-    
-    if total_inquiries == 0:
-        return 0  # Avoid division by zero
-    
-    # Count inquiries with responses (those that have at least one message from an office admin)
-    inquiries_with_responses = db.session.query(func.count(func.distinct(Inquiry.id))).join(
-        InquiryMessage, Inquiry.id == InquiryMessage.inquiry_id
-    ).join(
-        User, InquiryMessage.sender_id == User.id
-    ).filter(
-        Inquiry.office_id == office_id,
-        User.role == 'office_admin'
-    ).scalar()
-    
-    # Calculate the response rate as a percentage
-    response_rate = round((inquiries_with_responses / total_inquiries) * 100)
-    
-    return response_rate
+    # Read from the office_kpis snapshot refreshed by the scheduler
+    return get_office_kpis(office_id)['response_rate']
 
 
 @office_bp.route('/office-inquiry')
@@ -124,6 +111,39 @@ def office_inquiries():
     )
 
 
+@office_bp.route('/api/inquiries/search', methods=['GET'])
+@login_required
+@role_required(['office_admin'])
+def search_inquiry_messages():
+    """API to search the messages and subjects of this office's inquiries"""
+    try:
+        # Get the current office admin's office
+        office_admin = OfficeAdmin.query.filter_by(user_id=current_user.id).first()
+        if not office_admin:
+            return jsonify({'success': False, 'message': 'Office admin not found'}), 403
+        
+        page = request.args.get('page', 1, type=int)
+        found = search_messages(
+            office_admin.office_id,
+            request.args.get('q', ''),
+            page=page,
+            per_page=request.args.get('per_page', 20, type=int)
+        )
+        
+        return jsonify({
+            'success': True,
+            'results': found['results'],
+            'page': page,
+            'has_more': found['has_more']
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error searching inquiries: {str(e)}'
+        }), 500
+
+
 @office_bp.route('/inquiry/<int:inquiry_id>')
 @login_required
 @role_required(['office_admin'])
@@ -138,16 +158,9 @@ def view_inquiry(inquiry_id):
     # Fetch the inquiry and verify it belongs to this office
     inquiry = Inquiry.query.filter_by(id=inquiry_id, office_id=office_admin.office_id).first_or_404()
     
-    # Get latest 6 messages for this inquiry for initial load
-    messages = InquiryMessage.query.filter_by(
-        inquiry_id=inquiry.id
-    ).order_by(desc(InquiryMessage.created_at)).limit(6).all()
-    
-    # Reverse the messages to display in chronological order
-    messages = messages[::-1]
-    
-    # Get total message count for pagination
-    total_messages = InquiryMessage.query.filter_by(inquiry_id=inquiry.id).count()
+    # Get latest 6 messages for this inquiry for initial load, oldest first
+    history = message_page(inquiry.id, per_page=6)
+    messages = history.messages
     
     # Get count of pending inquiries for navbar badge
     pending_inquiries_count = Inquiry.query.filter_by(
@@ -191,12 +204,11 @@ def view_inquiry(inquiry_id):
         'office/view_inquiry.html',
         inquiry=inquiry,
         messages=messages,
-        total_messages=total_messages,
         unread_notifications_count=unread_notifications_count,
         notifications=notifications,
         pending_inquiries_count=pending_inquiries_count,
         upcoming_sessions_count=upcoming_sessions_count,
-        has_more_messages=(total_messages > 6)
+        has_more_messages=history.has_more
     )
 
 
@@ -459,52 +471,27 @@ def get_older_messages(inquiry_id):
             return jsonify({'success': False, 'message': 'Inquiry not found or access denied'}), 404
         
         # Get pagination parameters
-        before_id = request.args.get('before_id', type=int)
-        limit = request.args.get('limit', 6, type=int)
-        
-        # Query for older messages
-        query = InquiryMessage.query.filter_by(
-            inquiry_id=inquiry.id
+        history = message_page(
+            inquiry.id,
+            cursor=request.args.get('cursor'),
+            before_id=request.args.get('before_id', type=int),
+            per_page=request.args.get('limit', 6, type=int)
         )
         
-        # If we have a before_id, only get messages older than that
-        if before_id:
-            oldest_message = InquiryMessage.query.get(before_id)
-            if oldest_message:
-                query = query.filter(InquiryMessage.created_at < oldest_message.created_at)
+        # Serialize before the commit below expires the loaded messages
+        messages_data = [message_to_dict(message) for message in history.messages]
         
-        # Get messages in descending order and limit
-        messages = query.order_by(desc(InquiryMessage.created_at)).limit(limit).all()
-        
-        # Reverse the messages to display in chronological order
-        messages = messages[::-1]
-        
-        # Mark any unread messages as read
-        for message in messages:
-            if message.sender_id != current_user.id and not message.read_at:
-                message.read_at = datetime.utcnow()
-        
-        db.session.commit()
-        
-        # Serialize messages data for JSON response
-        messages_data = []
-        for message in messages:
-            sender = User.query.get(message.sender_id)
-            is_student = sender and sender.role == 'student'
-            
-            messages_data.append({
-                'id': message.id,
-                'content': message.content,
-                'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'sender_name': sender.get_full_name() if sender else 'Unknown',
-                'is_student': is_student,
-                'status': message.status
-            })
+        # Mark everything up to the newest message of this page as read
+        if history.messages:
+            update = message_receipts.advance(inquiry.id, current_user.id, message_receipts.READ, history.messages[-1].id)
+            if update:
+                message_receipts.broadcast(update)
         
         return jsonify({
             'success': True,
             'messages': messages_data,
-            'has_more': len(messages) >= limit
+            'has_more': history.has_more,
+            'cursor': history.cursor
         })
         
     except Exception as e:
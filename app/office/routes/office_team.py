@@ -8,6 +8,8 @@ from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from sqlalchemy import func, case, desc, or_
 from app.office import office_bp
+from app.services.inquiry_rollup import status_counts
+from app.services.staff_metrics import StaffMetrics
 
 # Import the office context function
 from app.office.routes.office_dashboard import get_office_context
@@ -22,26 +24,18 @@ def team_dashboard():
     
     office_id = current_user.office_admin.office_id
     
-    # Get all staff members for this office
-    staff_members = User.query.join(OfficeAdmin).filter(
-        OfficeAdmin.office_id == office_id,
-        User.role == 'office_admin'
-    ).all()
-    
-    # Get activity stats for each staff member
-    staff_data = []
     now = datetime.utcnow()
-    one_month_ago = now - timedelta(days=30)
-    today_start = datetime.combine(now.date(), datetime.min.time())
+    metrics = StaffMetrics(office_id, now=now)
     
     # Get office information
     office = Office.query.get(office_id)
     
     # Calculate overall office metrics
-    total_inquiries = Inquiry.query.filter_by(office_id=office_id).count()
-    pending_inquiries = Inquiry.query.filter_by(office_id=office_id, status='pending').count()
-    in_progress_inquiries = Inquiry.query.filter_by(office_id=office_id, status='in_progress').count()
-    resolved_inquiries = Inquiry.query.filter_by(office_id=office_id, status='resolved').count()
+    inquiry_counts = status_counts(office_id)
+    total_inquiries = inquiry_counts['total']
+    pending_inquiries = inquiry_counts.get('pending', 0)
+    in_progress_inquiries = inquiry_counts.get('in_progress', 0)
+    resolved_inquiries = inquiry_counts.get('resolved', 0)
     
     total_sessions = CounselingSession.query.filter_by(office_id=office_id).count()
     upcoming_sessions = CounselingSession.query.filter(
@@ -54,131 +48,8 @@ def team_dashboard():
         status='completed'
     ).count()
     
-    # Get activity data for each staff member
-    for staff in staff_members:
-        # Count inquiries handled (both pending and resolved)
-        inquiries_handled = Inquiry.query.filter(
-            Inquiry.office_id == office_id,
-            # Check if the staff member handled any messages for this inquiry
-            Inquiry.id.in_(
-                db.session.query(InquiryMessage.inquiry_id)
-                .filter(InquiryMessage.sender_id == staff.id)
-                .distinct()
-            )
-        ).count()
-        
-        # Count resolved inquiries
-        inquiries_resolved = Inquiry.query.filter(
-            Inquiry.office_id == office_id,
-            Inquiry.status == 'resolved',
-            # Check if the staff member handled any messages for this inquiry
-            Inquiry.id.in_(
-                db.session.query(InquiryMessage.inquiry_id)
-                .filter(InquiryMessage.sender_id == staff.id)
-                .distinct()
-            )
-        ).count()
-        
-        # Count pending inquiries being handled
-        inquiries_pending = Inquiry.query.filter(
-            Inquiry.office_id == office_id,
-            Inquiry.status.in_(['pending', 'in_progress']),
-            # Check if the staff member handled any messages for this inquiry
-            Inquiry.id.in_(
-                db.session.query(InquiryMessage.inquiry_id)
-                .filter(InquiryMessage.sender_id == staff.id)
-                .distinct()
-            )
-        ).count()
-        
-        # Calculate response time (average minutes to first response)
-        avg_response_time = db.session.query(
-            func.avg(
-                func.extract('epoch', InquiryMessage.created_at) - 
-                func.extract('epoch', Inquiry.created_at)
-            ) / 60  # Convert seconds to minutes
-        ).join(
-            Inquiry, InquiryMessage.inquiry_id == Inquiry.id
-        ).filter(
-            Inquiry.office_id == office_id,
-            InquiryMessage.sender_id == staff.id,
-            # Only first response from staff to each inquiry
-            ~InquiryMessage.id.in_(
-                db.session.query(func.min(InquiryMessage.id))
-                .filter(InquiryMessage.sender_id == staff.id)
-                .group_by(InquiryMessage.inquiry_id)
-            )
-        ).scalar() or 0
-        
-        # Count counseling sessions conducted
-        sessions_count = CounselingSession.query.filter(
-            CounselingSession.office_id == office_id,
-            CounselingSession.counselor_id == staff.id,
-            CounselingSession.status == 'completed'
-        ).count()
-        
-        # Count upcoming sessions
-        upcoming_sessions_count = CounselingSession.query.filter(
-            CounselingSession.office_id == office_id,
-            CounselingSession.counselor_id == staff.id,
-            CounselingSession.status.in_(['pending', 'confirmed']),
-            CounselingSession.scheduled_at > now
-        ).count()
-        
-        # Get today's sessions
-        todays_sessions_count = CounselingSession.query.filter(
-            CounselingSession.office_id == office_id,
-            CounselingSession.counselor_id == staff.id,
-            CounselingSession.scheduled_at >= today_start,
-            CounselingSession.scheduled_at < today_start + timedelta(days=1)
-        ).count()
-        
-        # Get last login time
-        last_login = OfficeLoginLog.query.filter_by(
-            office_admin_id=staff.office_admin.id
-        ).order_by(desc(OfficeLoginLog.login_time)).first()
-        
-        # Activity breakdown for last 30 days
-        monthly_inquiries = db.session.query(
-            func.count(InquiryMessage.id)
-        ).filter(
-            InquiryMessage.sender_id == staff.id,
-            InquiryMessage.created_at > one_month_ago
-        ).scalar() or 0
-        
-        monthly_sessions = CounselingSession.query.filter(
-            CounselingSession.office_id == office_id,
-            CounselingSession.counselor_id == staff.id,
-            CounselingSession.scheduled_at > one_month_ago
-        ).count()
-        
-        # Calculate workload level
-        total_active_items = inquiries_pending + upcoming_sessions_count
-        if total_active_items < 3:
-            workload = "low"
-        elif total_active_items < 7:
-            workload = "medium"
-        else:
-            workload = "high"
-        
-        staff_data.append({
-            'user': staff,
-            'inquiries_handled': inquiries_handled,
-            'inquiries_resolved': inquiries_resolved,
-            'inquiries_pending': inquiries_pending,
-            'sessions_count': sessions_count,
-            'upcoming_sessions': upcoming_sessions_count,
-            'todays_sessions': todays_sessions_count,
-            'total_activity': inquiries_handled + sessions_count,
-            'monthly_activity': monthly_inquiries + monthly_sessions,
-            'avg_response_time': int(avg_response_time) if avg_response_time else 0,
-            'last_login': last_login.login_time if last_login else None,
-            'is_online': staff.is_online and staff.last_activity > now - timedelta(minutes=15),
-            'workload': workload
-        })
-    
-    # Sort by activity
-    staff_data.sort(key=lambda x: x['is_online'], reverse=True)
+    # Get activity data for each staff member, sorted with online staff first
+    staff_data = metrics.staff_data()
     
     # Get latest activity logs
     activity_logs = AuditLog.query.join(
@@ -222,27 +93,22 @@ def team_data():
     
     office_id = current_user.office_admin.office_id
     
-    # Get all staff members for this office
-    staff_members = User.query.join(OfficeAdmin).filter(
-        OfficeAdmin.office_id == office_id,
-        User.role == 'office_admin'
-    ).all()
-    
-    # Build simplified staff data for JSON response
-    now = datetime.utcnow()
+    # Build staff data for JSON response from the same metrics as the dashboard
     staff_data = []
-    
-    for staff in staff_members:
-        staff_data.append({
+    for row in StaffMetrics(office_id).staff_data():
+        staff = row.pop('user')
+        row.update({
             'id': staff.id,
             'name': staff.get_full_name(),
-            'is_online': staff.is_online and staff.last_activity > now - timedelta(minutes=15),
-            'last_activity': staff.last_activity.isoformat() if staff.last_activity else None
+            'last_activity': staff.last_activity.isoformat() if staff.last_activity else None,
+            'last_login': row['last_login'].isoformat() if row['last_login'] else None
         })
+        staff_data.append(row)
     
     # Get overall office metrics
-    pending_inquiries = Inquiry.query.filter_by(office_id=office_id, status='pending').count()
-    in_progress_inquiries = Inquiry.query.filter_by(office_id=office_id, status='in_progress').count()
+    inquiry_counts = status_counts(office_id)
+    pending_inquiries = inquiry_counts.get('pending', 0)
+    in_progress_inquiries = inquiry_counts.get('in_progress', 0)
     
     return jsonify({
         'staff_data': staff_data,
@@ -0,0 +1,6 @@
+"""
+Shared services used by the admin, office and student blueprints.
+
+Modules in this package hold query and caching logic that is reused across
+several routes or socket handlers, so the views only deal with requests.
+"""
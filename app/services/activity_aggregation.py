@@ -0,0 +1,86 @@
+"""
+Aggregation policy for high-volume student activity events.
+
+Successful page-view events ("Viewed inquiry #12", "Viewed inquiries list",
+"Checked video support for office: Registrar", ...) make up most of the
+student_activity_logs volume. When STUDENT_VIEW_AGGREGATION is enabled
+(the default) the log sink folds them into per (student, action template,
+related_id, hour) counters in student_activity_counters instead of writing
+one row per view. Everything else, including failed events, is still
+written verbatim to student_activity_logs.
+"""
+
+import re
+from app.models import StudentActivityLog, StudentActivityCounter
+from app.services.counters import increment
+from app.services.log_sink import log_sink
+
+# Successful events whose action starts with one of these are aggregated
+AGGREGATED_ACTION_PREFIXES = ('Viewed ', 'Checked video support')
+
+_ID_SUFFIX = re.compile(r'\s*#(\d+)$')
+
+
+def action_template(action, related_id=None):
+    """
+    Split a view action into its template and related id.
+
+    "Viewed inquiry #12" -> ("Viewed inquiry", 12) and
+    "Viewed office details: Registrar" -> ("Viewed office details", related_id)
+    """
+    match = _ID_SUFFIX.search(action)
+    if match:
+        action = action[:match.start()]
+        if related_id is None:
+            related_id = int(match.group(1))
+    action = action.split(':', 1)[0].strip()
+    return action, related_id
+
+
+class ViewCounter:
+    """Log sink aggregator turning StudentActivityLog view events into hourly counters"""
+
+    def key(self, values):
+        """
+        Get the counter key for a log record, or None to write it verbatim.
+
+        Returns:
+            tuple: (student_id, action template, related_id, related_type, hour)
+        """
+        action = values.get('action') or ''
+        if not action.startswith(AGGREGATED_ACTION_PREFIXES):
+            return None
+        if values.get('is_success') is False or values.get('failure_reason'):
+            return None
+        if values.get('student_id') is None:
+            return None
+
+        template, related_id = action_template(action, values.get('related_id'))
+        hour = values['timestamp'].replace(minute=0, second=0, microsecond=0)
+        return (values['student_id'], template, related_id or 0, values.get('related_type'), hour)
+
+    def write(self, connection, folded):
+        """
+        Add folded counts to student_activity_counters.
+
+        Args:
+            connection: Connection to execute on
+            folded: Dict of key() -> (event count, latest timestamp)
+        """
+        table = StudentActivityCounter.__table__
+        for (student_id, action, related_id, related_type, hour), (count, last_seen) in folded.items():
+            increment(
+                connection, table,
+                {'student_id': student_id, 'action': action, 'related_id': related_id, 'hour': hour},
+                'event_count', count,
+                values={'related_type': related_type, 'last_seen': last_seen}
+            )
+
+
+view_counter = ViewCounter()
+
+
+def register(app):
+    """Route student view events through the counters unless STUDENT_VIEW_AGGREGATION is off"""
+    if app.config.get('STUDENT_VIEW_AGGREGATION', True):
+        log_sink.register_aggregator(StudentActivityLog, view_counter)
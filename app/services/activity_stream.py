@@ -0,0 +1,114 @@
+"""
+Merged, newest-first stream over several time-ordered tables.
+
+Used for the audit log "Everything" view, which merges AuditLog,
+StudentActivityLog, OfficeLoginLog and SuperAdminActivityLog. Instead of
+UNIONing the tables and sorting the lot, each page reads at most
+``per_page`` + 1 rows from each table with a keyset query (see keyset.py)
+and k-way merges them by (timestamp, id). The page cursor holds one keyset
+position per source, so the next page continues every table exactly where
+the previous page stopped consuming it, and a source that has run out is
+not queried again.
+"""
+
+import base64
+import heapq
+import json
+from app.services.keyset import keyset_paginate, encode_cursor
+
+EXHAUSTED = 'x'
+
+
+class StreamSource:
+    """
+    One table feeding the stream.
+
+    Args:
+        name: Short name, used in the cursor and as the item's 'source'
+        query: Function(filter_params) returning the filtered query
+        time_column, id_column: Keyset columns of the query's first entity
+        format_row: Function(row) returning the item dict
+    """
+
+    def __init__(self, name, query, time_column, id_column, format_row):
+        self.name = name
+        self.query = query
+        self.time_column = time_column
+        self.id_column = id_column
+        self.format_row = format_row
+
+
+def encode_stream_cursor(positions):
+    """Opaque token for {source name: keyset cursor token or EXHAUSTED}"""
+    payload = json.dumps(positions, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_stream_cursor(token):
+    """Positions dict from a stream cursor token; {} (start from the newest rows) if missing or malformed"""
+    if not token:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return {}
+    if not isinstance(positions, dict):
+        return {}
+    return {name: value for name, value in positions.items() if isinstance(value, str)}
+
+
+def merged_page(sources, filter_params, cursor=None, per_page=25):
+    """
+    Fetch one page of the merged stream.
+
+    Returns:
+        dict: 'items' (newest first), 'next_cursor' (None on the last page)
+        and 'has_more'
+    """
+    positions = decode_stream_cursor(cursor)
+
+    # Up to per_page rows from each source that still has rows
+    fetched = []
+    for order, source in enumerate(sources):
+        if positions.get(source.name) == EXHAUSTED:
+            continue
+        page = keyset_paginate(
+            source.query(filter_params), source.time_column, source.id_column,
+            cursor=positions.get(source.name), per_page=per_page
+        )
+        entries = []
+        for row in page.items:
+            entity = row[0] if hasattr(row, '_fields') else row
+            timestamp = getattr(entity, source.time_column.key)
+            row_id = getattr(entity, source.id_column.key)
+            # Ties on timestamp are broken by source order, then id, so the merge order is total
+            entries.append(((timestamp, -order, row_id), source, row))
+        fetched.append((source, entries, page.has_next))
+
+    merged = heapq.merge(*(entries for _, entries, _ in fetched), key=lambda entry: entry[0], reverse=True)
+    taken = []
+    for entry in merged:
+        if len(taken) == per_page:
+            break
+        taken.append(entry)
+
+    # Move each source's position past the rows this page consumed
+    last_taken = {}
+    for (timestamp, _, row_id), source, _ in taken:
+        last_taken[source.name] = (timestamp, row_id)
+
+    has_more = False
+    for source, entries, source_has_next in fetched:
+        consumed = sum(1 for entry in taken if entry[1] is source)
+        remaining = consumed < len(entries) or source_has_next
+        if source.name in last_taken:
+            positions[source.name] = encode_cursor(*last_taken[source.name])
+        if not remaining:
+            positions[source.name] = EXHAUSTED
+        has_more = has_more or remaining
+
+    return {
+        'items': [source.format_row(row) for _, source, row in taken],
+        'next_cursor': encode_stream_cursor(positions) if has_more else None,
+        'has_more': has_more
+    }
@@ -0,0 +1,57 @@
+"""
+Run work for flushed rows once their transaction has committed.
+
+Mapper listeners fire at flush, while the writer's transaction is still
+open. Work that must only happen once the change is visible to everyone
+(dropping cache entries) or must not hold locks for the rest of the
+writer's transaction (bumping a shared counter row) is collected with
+``defer()`` in the session's ``info`` and handed to the handler registered
+for its name after the session commits. A rollback discards it.
+
+Usage:
+    after_commit.register('chat_senders', lambda user_ids: ...)
+    after_commit.defer(target, 'chat_senders', target.id)   # in a mapper listener
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+_INFO_KEY = 'after_commit'
+
+# Name -> function(set of deferred items)
+_handlers = {}
+
+
+def register(name, handler):
+    """Set the handler receiving the items deferred under ``name`` (also attaches the session hooks)"""
+    _handlers[name] = handler
+    if not event.contains(Session, 'after_commit', _run_deferred):
+        event.listen(Session, 'after_commit', _run_deferred)
+        event.listen(Session, 'after_soft_rollback', _discard_deferred)
+
+
+def defer(target, name, *items):
+    """
+    Hand ``items`` to the ``name`` handler after the transaction flushing ``target`` commits.
+
+    Runs the handler right away if ``target`` is not in a session.
+    """
+    session = object_session(target)
+    if session is None:
+        _handlers[name](set(items))
+        return
+    session.info.setdefault(_INFO_KEY, {}).setdefault(name, set()).update(items)
+
+
+def _run_deferred(session):
+    deferred = session.info.pop(_INFO_KEY, None)
+    if not deferred:
+        return
+    for name, items in deferred.items():
+        _handlers[name](items)
+
+
+def _discard_deferred(session, previous_transaction):
+    # Rolling back a savepoint keeps what the enclosing transaction flushed before it
+    if previous_transaction.parent is None:
+        session.info.pop(_INFO_KEY, None)
@@ -0,0 +1,194 @@
+"""
+Chat message event payloads shared by the socket handlers and the reply routes.
+
+Every ``new_chat_message`` / ``new_message`` / ``student_message_sent`` event
+carries the same payload, built by ``message_payload()``. The sender's
+display data (name, role, office) and the inquiry's routing data (student,
+student's user, office) come from two in-process LRU caches, so fanning out a
+message costs no queries once the sender and inquiry have been seen.
+
+Mapper listeners drop cached entries when a user's profile changes, an
+office admin is added, reassigned or removed, a student record is created or
+removed, an office is renamed or an inquiry moves to another office. The
+entries are dropped after the writing transaction commits (see
+after_commit.py); dropping them at flush would let a fan-out running before
+the commit cache the old values again, with no expiry to correct them.
+"""
+
+from sqlalchemy import event, inspect
+from app.extensions import db
+from app.models import User, OfficeAdmin, Office, Student, Inquiry
+from app.services import after_commit
+from app.services.cache import LRUCache
+
+DEFAULT_CACHE_SIZE = 5000
+
+sender_cache = LRUCache(max_entries=DEFAULT_CACHE_SIZE)
+inquiry_route_cache = LRUCache(max_entries=DEFAULT_CACHE_SIZE)
+
+
+def _cached(cache, key, load):
+    # Ids from socket clients may be strings; the listeners invalidate integer keys
+    try:
+        key = int(key)
+    except (TypeError, ValueError):
+        return None
+    value = cache.get(key)
+    if value is None:
+        value = load(key)
+        # Missing rows are not cached; they may be created later
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+def _load_sender(user_id):
+    row = db.session.query(
+        User.first_name, User.middle_name, User.last_name, User.role,
+        OfficeAdmin.office_id, Office.name, Student.id
+    ).outerjoin(OfficeAdmin, OfficeAdmin.user_id == User.id).outerjoin(
+        Office, Office.id == OfficeAdmin.office_id
+    ).outerjoin(Student, Student.user_id == User.id).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    first_name, middle_name, last_name, role, office_id, office_name, student_id = row
+    return {
+        'id': user_id,
+        # Same as User.get_full_name()
+        'name': ' '.join(part for part in (first_name, middle_name, last_name) if part),
+        'role': role,
+        'office_id': office_id,
+        'office_name': office_name,
+        'student_id': student_id
+    }
+
+
+def _load_inquiry_route(inquiry_id):
+    row = db.session.query(Inquiry.student_id, Inquiry.office_id, Student.user_id).join(
+        Student, Student.id == Inquiry.student_id
+    ).filter(Inquiry.id == inquiry_id).first()
+    if row is None:
+        return None
+    return {'id': inquiry_id, 'student_id': row[0], 'office_id': row[1], 'student_user_id': row[2]}
+
+
+def sender_profile(user_id):
+    """
+    Cached display data of a message sender.
+
+    Returns:
+        dict: id, name, role, office_id and office_name (office admins),
+        student_id (students); or None if the user does not exist
+    """
+    return _cached(sender_cache, user_id, _load_sender)
+
+
+def inquiry_route(inquiry_id):
+    """
+    Cached routing data of an inquiry.
+
+    Returns:
+        dict: id, student_id, student_user_id and office_id; or None if the inquiry does not exist
+    """
+    return _cached(inquiry_route_cache, inquiry_id, _load_inquiry_route)
+
+
+def message_payload(message, status=None, timestamp=None):
+    """
+    The chat event payload for a message.
+
+    Args:
+        message: InquiryMessage (only its columns are read)
+        status: Status to report instead of message.status
+        timestamp: Preformatted timestamp instead of '%Y-%m-%d %H:%M:%S'
+
+    Returns:
+        dict, or None if the sender or inquiry no longer exists
+    """
+    return build_payload(
+        message.inquiry_id, message.sender_id, message.id, message.content,
+        timestamp or message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        status or message.status
+    )
+
+
+def build_payload(inquiry_id, sender_id, message_id, content, timestamp, status):
+    """The chat event payload from loose fields, for messages relayed before they are saved"""
+    sender = sender_profile(sender_id)
+    route = inquiry_route(inquiry_id)
+    if sender is None or route is None:
+        return None
+
+    from_admin = sender['role'] == 'office_admin'
+    return {
+        'id': message_id,
+        'message_id': message_id,
+        'inquiry_id': route['id'],
+        'content': content,
+        'timestamp': timestamp,
+        'sender_id': sender_id,
+        'sender_name': sender['name'],
+        'sender_role': sender['role'],
+        'status': status,
+        'from_admin': from_admin,
+        'is_admin': from_admin,
+        'is_student': sender['role'] == 'student',
+        'office_id': route['office_id'],
+        'office_name': sender['office_name'] or ('Office' if from_admin else None),
+        'student_id': route['student_id']
+    }
+
+
+def _history_values(target, attribute):
+    """Current and previous values of an attribute of an object being flushed"""
+    history = inspect(target).attrs[attribute].history
+    return {value for value in [getattr(target, attribute), *(history.deleted or ())] if value is not None}
+
+
+def _on_user_write(mapper, connection, target):
+    after_commit.defer(target, 'chat_senders', target.id)
+
+
+def _on_user_link_write(mapper, connection, target):
+    # OfficeAdmin and Student rows: drop the (old and new) linked users
+    after_commit.defer(target, 'chat_senders', *_history_values(target, 'user_id'))
+
+
+def _on_office_write(mapper, connection, target):
+    # Renames are rare; forget every sender rather than tracking office members
+    after_commit.defer(target, 'chat_all_senders', True)
+
+
+def _on_inquiry_write(mapper, connection, target):
+    after_commit.defer(target, 'chat_inquiry_routes', target.id)
+
+
+def _invalidate_senders(user_ids):
+    for user_id in user_ids:
+        sender_cache.invalidate(user_id)
+
+
+def _invalidate_routes(inquiry_ids):
+    for inquiry_id in inquiry_ids:
+        inquiry_route_cache.invalidate(inquiry_id)
+
+
+LISTENERS = (
+    (User, _on_user_write, ('after_update', 'after_delete')),
+    (OfficeAdmin, _on_user_link_write, ('after_insert', 'after_update', 'after_delete')),
+    (Student, _on_user_link_write, ('after_insert', 'after_update', 'after_delete')),
+    (Office, _on_office_write, ('after_update', 'after_delete')),
+    (Inquiry, _on_inquiry_write, ('after_update', 'after_delete')),
+)
+
+
+def register_listeners():
+    """Attach the invalidation listeners to the mappers (safe to call more than once)"""
+    after_commit.register('chat_senders', _invalidate_senders)
+    after_commit.register('chat_all_senders', lambda _: sender_cache.clear())
+    after_commit.register('chat_inquiry_routes', _invalidate_routes)
+    for model, listener, identifiers in LISTENERS:
+        for identifier in identifiers:
+            if not event.contains(model, identifier, listener):
+                event.listen(model, identifier, listener)
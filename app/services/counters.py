@@ -0,0 +1,80 @@
+"""
+Atomic counter and watermark upserts shared by the rollup, version and
+message receipt tables.
+"""
+
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def increment(connection, table, key, column, delta, values=None):
+    """
+    Add ``delta`` to ``column`` of the row identified by ``key``, inserting it if missing.
+
+    Runs on the flush connection, so it can be used from mapper events.
+
+    Args:
+        connection: Connection to execute on
+        table: Table holding the counter
+        key: Dict of primary key (or unique key) column -> value
+        column: Name of the counter column
+        delta: Amount to add (the initial value for a new row)
+        values: Optional extra column values to set on insert and update
+    """
+    values = values or {}
+    counter = table.c[column]
+    dialect = connection.dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(**key, **values, **{column: delta}).on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: counter + delta, **values}
+        )
+        connection.execute(stmt)
+        return
+
+    # Generic fallback for databases without ON CONFLICT support
+    result = connection.execute(
+        table.update().where(
+            *[table.c[name] == value for name, value in key.items()]
+        ).values(**{column: counter + delta}, **values)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**key, **values, **{column: delta}))
+
+
+def raise_to(connection, table, key, values):
+    """
+    Raise each of ``values``' columns of the row identified by ``key`` to at
+    least the given value, inserting the row if missing. Columns never move
+    backwards, so watermarks can be advanced by concurrent writers.
+
+    Args:
+        connection: Connection to execute on
+        table: Table holding the watermarks
+        key: Dict of primary key column -> value
+        values: Dict of watermark column -> new value
+    """
+    dialect = connection.dialect.name
+
+    def raised(column, value):
+        return case((table.c[column] < value, value), else_=table.c[column])
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(**key, **values).on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: raised(column, value) for column, value in values.items()}
+        )
+        connection.execute(stmt)
+        return
+
+    # Generic fallback for databases without ON CONFLICT support
+    result = connection.execute(
+        table.update().where(
+            *[table.c[name] == value for name, value in key.items()]
+        ).values(**{column: raised(column, value) for column, value in values.items()})
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**key, **values))
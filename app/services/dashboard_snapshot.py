@@ -0,0 +1,170 @@
+"""
+Cached, debounced snapshot of the real-time admin dashboard statistics.
+
+Write paths call ``mark_dirty()`` instead of recomputing the statistics
+inline. The first call schedules a background task which recomputes the
+snapshot at most once every ``DASHBOARD_STATS_INTERVAL`` seconds (default 5)
+and broadcasts only the fields that changed to ``admin_room``. Any number
+of writes within one interval therefore cost a single recompute.
+
+The snapshot and dirty flag live in process memory, so every worker process
+keeps and broadcasts its own copy.
+"""
+
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, case
+from app.extensions import db, socketio
+from app.models import User, Office, CounselingSession
+from app.services.inquiry_rollup import status_counts, office_counts
+
+DEFAULT_INTERVAL = 5  # seconds
+
+_lock = threading.Lock()
+_snapshot = None
+_dirty = False
+_flush_scheduled = False
+_last_computed = 0.0
+
+
+def compute_stats(now=None):
+    """
+    Compute the full dashboard statistics.
+
+    Returns:
+        dict: active_users, pending_inquiries, upcoming_sessions and office_activity
+    """
+    now = now or datetime.utcnow()
+
+    active_users = User.query.filter_by(is_active=True).count()
+    pending_inquiries = status_counts().get('pending', 0)
+
+    # Session totals and upcoming sessions in one grouped query
+    session_rows = db.session.query(
+        CounselingSession.office_id,
+        func.count(CounselingSession.id),
+        func.sum(case((
+            (CounselingSession.scheduled_at > now) &
+            (CounselingSession.status == 'scheduled'), 1), else_=0))
+    ).group_by(CounselingSession.office_id).all()
+    sessions_by_office = {office_id: count for office_id, count, _ in session_rows}
+    upcoming_sessions = sum(int(upcoming or 0) for _, _, upcoming in session_rows)
+
+    inquiries_by_office = office_counts()
+    office_activity = []
+    for office in Office.query.order_by(Office.id).all():
+        office_activity.append({
+            'office_id': office.id,
+            'office_name': office.name,
+            'inquiries_count': inquiries_by_office.get(office.id, 0),
+            'sessions_count': sessions_by_office.get(office.id, 0)
+        })
+
+    return {
+        'active_users': active_users,
+        'pending_inquiries': pending_inquiries,
+        'upcoming_sessions': upcoming_sessions,
+        'office_activity': office_activity
+    }
+
+
+def diff_stats(old, new):
+    """
+    Get the fields of ``new`` that differ from ``old``.
+
+    Offices are compared by office_id; only changed or added offices are
+    listed in 'office_activity' and deleted ones in 'removed_offices'.
+    """
+    if old is None:
+        return dict(new)
+
+    changes = {}
+    for key, value in new.items():
+        if key != 'office_activity' and old.get(key) != value:
+            changes[key] = value
+
+    old_offices = {office['office_id']: office for office in old.get('office_activity', [])}
+    new_offices = {office['office_id']: office for office in new.get('office_activity', [])}
+
+    changed_offices = [office for office_id, office in new_offices.items()
+                       if old_offices.get(office_id) != office]
+    if changed_offices:
+        changes['office_activity'] = changed_offices
+
+    removed_offices = [office_id for office_id in old_offices if office_id not in new_offices]
+    if removed_offices:
+        changes['removed_offices'] = removed_offices
+
+    return changes
+
+
+def refresh():
+    """Recompute the snapshot now and broadcast the changed fields to admin_room"""
+    global _snapshot, _last_computed
+
+    stats = compute_stats()
+    with _lock:
+        changes = diff_stats(_snapshot, stats)
+        _snapshot = stats
+        _last_computed = time.monotonic()
+
+    if changes:
+        changes['timestamp'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        socketio.emit('dashboard_stats', changes, room='admin_room')
+    return changes
+
+
+def get_snapshot():
+    """Get the cached statistics, computing them on first use"""
+    with _lock:
+        snapshot = _snapshot
+    if snapshot is None:
+        refresh()
+        with _lock:
+            snapshot = _snapshot
+    return snapshot
+
+
+def mark_dirty():
+    """
+    Flag the snapshot as stale after a write.
+
+    Schedules a background recompute unless one is already pending, so the
+    calling request never waits for the statistics queries.
+    """
+    global _dirty, _flush_scheduled
+
+    with _lock:
+        _dirty = True
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+
+    app = current_app._get_current_object()
+    socketio.start_background_task(_flush, app)
+
+
+def _flush(app):
+    """Background task: recompute once per interval while the snapshot is dirty"""
+    global _dirty, _flush_scheduled
+
+    interval = app.config.get('DASHBOARD_STATS_INTERVAL', DEFAULT_INTERVAL)
+    while True:
+        wait = interval - (time.monotonic() - _last_computed)
+        if wait > 0:
+            socketio.sleep(wait)
+
+        with _lock:
+            if not _dirty:
+                _flush_scheduled = False
+                return
+            _dirty = False
+
+        with app.app_context():
+            try:
+                refresh()
+            except Exception as e:
+                app.logger.error(f"Error refreshing dashboard stats: {str(e)}")
+                db.session.rollback()
@@ -0,0 +1,188 @@
+"""
+Write counters used as version tokens for polled JSON endpoints.
+
+Mapper listeners note every scope a write touches, e.g. an inquiry update
+touches 'inquiries' and 'inquiries:office:<office_id>', and the counters in
+data_versions are bumped once the writer's transaction has committed, in a
+short transaction of their own (see after_commit.py). Bumping inside the
+writer's transaction would hold the shared counter row's lock until it
+commits and serialize every concurrent writer of the table. A polled endpoint reads the counters for
+the scopes it depends on with one primary-key lookup. It then answers
+``304 Not Modified`` when the client's ETag is current, or rebuilds only
+the sections whose scopes changed when a ``since=`` token is given.
+
+Tokens also carry a time bucket (DASHBOARD_POLL_BUCKET seconds, default
+300) so time-dependent figures such as "next session in 2h 15m" or online
+staff still refresh without a write.
+"""
+
+import time
+from datetime import datetime
+from flask import request, current_app, jsonify
+from sqlalchemy import event, inspect
+from app.extensions import db
+from app.models import DataVersion, Inquiry, CounselingSession, User, Office, OfficeAdmin
+from app.services import after_commit
+from app.services.counters import increment
+
+DEFAULT_POLL_BUCKET = 300  # seconds
+
+# User columns shown on dashboards; other updates (last_activity, is_online...) do not bump 'users'
+USER_DASHBOARD_FIELDS = ('first_name', 'last_name', 'role', 'is_active')
+
+
+def office_scope(name, office_id):
+    """Scope name for one office, e.g. office_scope('inquiries', 3) -> 'inquiries:office:3'"""
+    return f"{name}:office:{office_id}"
+
+
+def bump(connection, scope):
+    """Increment the version of ``scope`` on ``connection``"""
+    increment(
+        connection, DataVersion.__table__,
+        {'scope': scope}, 'version', 1,
+        values={'updated_at': datetime.utcnow()}
+    )
+
+
+def _bump_committed(scopes):
+    """after_commit handler: bump the scopes written by a committed transaction"""
+    with db.engine.begin() as connection:
+        # Always in the same order, so concurrent bumps cannot deadlock
+        for scope in sorted(scopes):
+            bump(connection, scope)
+
+
+def _office_ids(target, attribute='office_id'):
+    """Current and (if changed in this flush) previous office ids of ``target``"""
+    history = inspect(target).attrs[attribute].history
+    office_ids = {getattr(target, attribute)}
+    office_ids.update(history.deleted or ())
+    return {office_id for office_id in office_ids if office_id is not None}
+
+
+def _per_office_listener(name):
+    """Listener bumping ``name`` and the per-office scope of every affected office"""
+    def listener(mapper, connection, target):
+        scopes = [office_scope(name, office_id) for office_id in _office_ids(target)]
+        after_commit.defer(target, 'data_versions', name, *scopes)
+    return listener
+
+
+def _bump_users(mapper, connection, target):
+    after_commit.defer(target, 'data_versions', 'users')
+
+
+def _bump_users_on_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in USER_DASHBOARD_FIELDS):
+        after_commit.defer(target, 'data_versions', 'users')
+
+
+def _bump_offices(mapper, connection, target):
+    after_commit.defer(target, 'data_versions', 'offices')
+
+
+def _bump_staff(mapper, connection, target):
+    scopes = [office_scope('staff', office_id) for office_id in _office_ids(target)]
+    after_commit.defer(target, 'data_versions', *scopes)
+
+
+_bump_inquiries = _per_office_listener('inquiries')
+_bump_sessions = _per_office_listener('sessions')
+
+LISTENERS = (
+    (Inquiry, ('after_insert', 'after_update', 'after_delete'), _bump_inquiries),
+    (CounselingSession, ('after_insert', 'after_update', 'after_delete'), _bump_sessions),
+    (User, ('after_insert', 'after_delete'), _bump_users),
+    (User, ('after_update',), _bump_users_on_update),
+    (Office, ('after_insert', 'after_update', 'after_delete'), _bump_offices),
+    (OfficeAdmin, ('after_insert', 'after_update', 'after_delete'), _bump_staff),
+)
+
+
+def register_listeners():
+    """Attach the version listeners to the mappers (safe to call more than once)"""
+    after_commit.register('data_versions', _bump_committed)
+    for model, identifiers, listener in LISTENERS:
+        for identifier in identifiers:
+            if not event.contains(model, identifier, listener):
+                event.listen(model, identifier, listener)
+
+
+def current_versions(scopes):
+    """
+    Get the version of each scope with a single primary-key lookup.
+
+    Returns:
+        list: Versions in the order of ``scopes``; 0 for scopes never written
+    """
+    rows = db.session.query(DataVersion.scope, DataVersion.version).filter(
+        DataVersion.scope.in_(scopes)
+    ).all()
+    versions = dict(rows)
+    return [versions.get(scope, 0) for scope in scopes]
+
+
+def _parse_token(token, length):
+    """Split a version token into its integer parts, or None if it is malformed"""
+    try:
+        parts = [int(part) for part in token.strip('"').split('-')]
+    except (AttributeError, ValueError):
+        return None
+    return parts if len(parts) == length else None
+
+
+def versioned_sections(scopes, sections, owner=None):
+    """
+    Build a polled payload, skipping sections the client already has.
+
+    Args:
+        scopes: Ordered list of every version scope the endpoint depends on
+        sections: Dict of section name -> (list of scopes it depends on,
+            callable returning the section's dict of payload keys)
+        owner: Optional id (e.g. the office) added to the ETag, so a browser
+            shared between accounts never revalidates another office's data
+
+    Returns:
+        tuple: (payload dict, version token, etag). The payload is None when
+        the request's If-None-Match already matches the ETag.
+    """
+    bucket_size = current_app.config.get('DASHBOARD_POLL_BUCKET', DEFAULT_POLL_BUCKET)
+    parts = [int(time.time() // bucket_size)] + current_versions(scopes)
+    token = '-'.join(str(part) for part in parts)
+    etag = f"{owner}.{token}" if owner is not None else token
+
+    if request.if_none_match.contains(etag):
+        return None, token, etag
+
+    since = _parse_token(request.args.get('since'), len(parts))
+    positions = {scope: index + 1 for index, scope in enumerate(scopes)}
+
+    payload = {}
+    for name, (depends_on, build) in sections.items():
+        if since is not None:
+            indexes = [0] + [positions[scope] for scope in depends_on]
+            if all(since[index] == parts[index] for index in indexes):
+                continue
+        payload.update(build())
+    return payload, token, etag
+
+
+def versioned_response(payload, token, etag, wrap=None):
+    """
+    Turn the result of versioned_sections() into a response with an ETag.
+
+    Args:
+        wrap: Optional callable that puts the payload into the endpoint's
+            JSON envelope
+    """
+    if payload is None:
+        response = current_app.response_class(status=304)
+    else:
+        payload['version'] = token
+        response = jsonify(wrap(payload) if wrap else payload)
+    response.set_etag(etag)
+    # Let the browser store the ETag but always revalidate
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,129 @@
+"""
+Writers for the CSV, Excel and PDF export files.
+
+Each writer takes a header row and an iterator of data rows and writes them
+to a file path one row at a time, so memory stays flat however many rows the
+export has. CSV rows go straight to disk, Excel uses openpyxl's write-only
+workbook, and PDF rows are drawn onto a reportlab canvas that finishes each
+page as soon as it is full instead of laying out one table holding every row.
+"""
+
+import csv
+
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+}
+
+# PDF layout (points, landscape letter)
+PDF_MARGIN = 36
+PDF_ROW_HEIGHT = 16
+PDF_FONT_SIZE = 7
+PDF_COLUMN_WEIGHTS = {'ID': 0.5, 'Action': 2, 'Email': 1.6, 'Details': 2, 'Subject': 2, 'Notes': 2,
+                      'Timestamp': 1.3, 'Login Time': 1.3, 'Logout Time': 1.3}
+
+
+def _counted(rows, progress):
+    """Pass rows through, calling progress(rows so far) every 100 rows and at the end"""
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if progress and count % 100 == 0:
+            progress(count)
+    if progress:
+        progress(count)
+
+
+def write_csv(path, headers, rows, title=None):
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+
+
+def write_excel(path, headers, rows, title=None):
+    import openpyxl
+
+    # Write-only mode streams rows to disk instead of keeping every cell in memory
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=(title or 'Export')[:31])
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def write_pdf(path, headers, rows, title=None):
+    from reportlab.pdfgen import canvas
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.lib import colors
+
+    page_width, page_height = landscape(letter)
+    weights = [PDF_COLUMN_WEIGHTS.get(header, 1) for header in headers]
+    unit = (page_width - 2 * PDF_MARGIN) / sum(weights)
+    widths = [weight * unit for weight in weights]
+
+    pdf = canvas.Canvas(path, pagesize=(page_width, page_height), pageCompression=1)
+
+    def fit(value, width, font):
+        text = str(value)
+        while text and stringWidth(text, font, PDF_FONT_SIZE) > width - 4:
+            text = text[:-2] + '…' if len(text) > 1 else ''
+        return text
+
+    def draw_row(y, values, header=False):
+        font = 'Helvetica-Bold' if header else 'Helvetica'
+        pdf.setFillColor(colors.grey if header else colors.beige)
+        pdf.rect(PDF_MARGIN, y, sum(widths), PDF_ROW_HEIGHT, stroke=0, fill=1)
+        pdf.setFillColor(colors.whitesmoke if header else colors.black)
+        pdf.setFont(font, PDF_FONT_SIZE)
+        x = PDF_MARGIN
+        for value, width in zip(values, widths):
+            pdf.drawCentredString(x + width / 2, y + 5, fit(value, width, font))
+            pdf.rect(x, y, width, PDF_ROW_HEIGHT, stroke=1, fill=0)
+            x += width
+
+    def start_page(first):
+        top = page_height - PDF_MARGIN
+        if first and title:
+            pdf.setFont('Helvetica-Bold', 18)
+            pdf.drawString(PDF_MARGIN, top - 18, title)
+            top -= 36
+        top -= PDF_ROW_HEIGHT
+        draw_row(top, headers, header=True)
+        return top - PDF_ROW_HEIGHT
+
+    y = start_page(first=True)
+    for row in rows:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = start_page(first=False)
+        draw_row(y, row)
+        y -= PDF_ROW_HEIGHT
+    pdf.save()
+
+
+WRITERS = {
+    'csv': write_csv,
+    'excel': write_excel,
+    'pdf': write_pdf,
+}
+
+
+def write_export(path, export_format, headers, rows, title=None, progress=None):
+    """
+    Write an export file.
+
+    Args:
+        path: File to write
+        export_format: 'csv', 'excel' or 'pdf'
+        headers: Header row
+        rows: Iterable of data rows (lists)
+        title: Sheet name for Excel, heading for PDF
+        progress: Optional callback receiving the number of rows written so far
+    """
+    WRITERS[export_format](path, headers, _counted(rows, progress), title=title)
@@ -0,0 +1,276 @@
+"""
+Background export jobs.
+
+Export routes call ``start_export()`` and return the job id right away. The
+export runs off the request in a background task. Under eventlet the rows
+are fetched in that green thread (the session, pool and cursors use green
+locks, which must not be touched from an OS thread) and handed in batches,
+through an unpatched queue, to the file writer running in eventlet's native
+thread pool (``tpool``), so building a large PDF does not block the other
+greenlets. Without eventlet the background thread does both. At most
+EXPORT_MAX_CONCURRENT exports run at once and the rest wait their turn.
+
+While a job runs, its progress is emitted as ``export_progress`` events to the
+requester's ``user_<id>`` socket room. The last event carries a signed
+download URL that only the requester can use and that expires after
+EXPORT_LINK_MAX_AGE seconds (default 1 hour). Finished files are written
+to EXPORT_FOLDER (default <instance>/exports) and deleted once their link has
+expired.
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app, url_for
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from app.extensions import db, socketio
+from app.services.export_files import EXPORT_FORMATS, write_export
+
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_LINK_MAX_AGE = 3600  # seconds
+PROGRESS_INTERVAL = 1  # seconds between progress events
+WRITE_BATCH_SIZE = 500  # rows handed to the file writer at a time
+WRITE_QUEUE_BATCHES = 4  # batches fetched ahead of the writer
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_slots = None
+
+
+class ExportJob:
+    """State of one export, shared between the worker and the progress reporter"""
+
+    def __init__(self, user_id, export_format, title, filename):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.export_format = export_format
+        self.title = title
+        self.filename = filename
+        self.status = 'queued'
+        self.rows_written = 0
+        self.total_rows = None
+        self.error = None
+        self.download_url = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'title': self.title,
+            'format': self.export_format,
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'error': self.error,
+            'download_url': self.download_url if self.status == 'done' else None
+        }
+
+
+def export_folder(app=None):
+    app = app or current_app
+    folder = app.config.get('EXPORT_FOLDER') or os.path.join(app.instance_path, 'exports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _serializer(app=None):
+    return URLSafeTimedSerializer((app or current_app).secret_key, salt='export-download')
+
+
+def _link_max_age(app=None):
+    return (app or current_app).config.get('EXPORT_LINK_MAX_AGE', DEFAULT_LINK_MAX_AGE)
+
+
+def load_download_token(token):
+    """
+    Check a download token.
+
+    Returns:
+        dict: {'job': job id, 'user': requester id, 'file': stored file name,
+        'name': download file name}, or None if the token is invalid or has expired
+    """
+    try:
+        return _serializer().loads(token, max_age=_link_max_age())
+    except (BadSignature, SignatureExpired):
+        return None
+
+
+def get_job(job_id, user_id):
+    """The caller's job with this id, or None"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None or job.user_id != user_id:
+        return None
+    return job
+
+
+def _cleanup(app):
+    """Forget finished jobs and delete export files whose download links have expired"""
+    max_age = _link_max_age(app)
+    now = time.time()
+    with _jobs_lock:
+        for job_id, job in list(_jobs.items()):
+            if job.finished_at and (datetime.utcnow() - job.finished_at).total_seconds() > max_age:
+                del _jobs[job_id]
+
+    folder = export_folder(app)
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def start_export(user_id, export_format, title, filename, build):
+    """
+    Queue an export and return immediately.
+
+    Args:
+        user_id: Requesting user (receives the progress events and the link)
+        export_format: 'csv', 'excel' or 'pdf'
+        title: Human readable name shown with the progress
+        filename: Download file name without extension
+        build: Function called with the job in an app context, returning
+            (headers, rows); it may set job.total_rows for progress reporting
+
+    Returns:
+        ExportJob
+    """
+    global _slots
+
+    app = current_app._get_current_object()
+    extension = EXPORT_FORMATS[export_format][0]
+    job = ExportJob(user_id, export_format, title, f"{filename}.{extension}")
+
+    stored_name = f"{job.id}.{extension}"
+    token = _serializer(app).dumps({'job': job.id, 'user': user_id, 'file': stored_name, 'name': job.filename})
+    job.download_url = url_for('admin.download_export', token=token)
+
+    with _jobs_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(app.config.get('EXPORT_MAX_CONCURRENT', DEFAULT_MAX_CONCURRENT))
+        _jobs[job.id] = job
+
+    _cleanup(app)
+    socketio.start_background_task(_run, app, job, build, stored_name)
+    socketio.start_background_task(_report_progress, app, job)
+    return job
+
+
+def _eventlet_patched():
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_in_native_thread(path, job, headers, rows, progress):
+    """
+    Write the export file in a tpool thread while this greenlet fetches the rows.
+
+    Only plain row lists cross over, through an OS-thread queue; the green
+    side never blocks on it, it polls with eventlet.sleep while the queue is full.
+    """
+    import eventlet
+    from eventlet import patcher, tpool
+    native_queue = patcher.original('queue')
+    batches = native_queue.Queue(maxsize=WRITE_QUEUE_BATCHES)
+
+    def queued_rows():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            yield from batch
+
+    writer = eventlet.spawn(
+        tpool.execute, write_export, path, job.export_format, headers, queued_rows(),
+        title=job.title, progress=progress
+    )
+
+    def put(item):
+        """Queue a batch; False if the writer has stopped"""
+        while not writer.dead:
+            try:
+                batches.put_nowait(item)
+                return True
+            except native_queue.Full:
+                eventlet.sleep(0.05)
+        return False
+
+    try:
+        for batch in _batched(rows, WRITE_BATCH_SIZE):
+            if not put(batch):
+                break
+    finally:
+        put(None)
+        # Re-raises the writer's error, if any
+        writer.wait()
+
+
+def _execute(app, job, build, stored_name):
+    path = os.path.join(export_folder(app), stored_name)
+    with app.app_context():
+        try:
+            job.status = 'running'
+            headers, rows = build(job)
+
+            def progress(count):
+                job.rows_written = count
+
+            if _eventlet_patched():
+                _write_in_native_thread(path, job, headers, rows, progress)
+            else:
+                write_export(path, job.export_format, headers, rows, title=job.title, progress=progress)
+            job.status = 'done'
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = 'Export failed'
+            app.logger.error(f"Error running export {job.id}: {str(e)}")
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.remove()
+
+
+def _run(app, job, build, stored_name):
+    """Background task: wait for a free slot, then build the file"""
+    with _slots:
+        _execute(app, job, build, stored_name)
+
+
+def _report_progress(app, job):
+    """Background task: emit the job state to the requester while it changes"""
+    last = None
+    while True:
+        finished = job.finished
+        state = job.to_dict()
+        if state != last:
+            socketio.emit('export_progress', state, room=f'user_{job.user_id}')
+            last = state
+        if finished:
+            return
+        socketio.sleep(PROGRESS_INTERVAL)
@@ -0,0 +1,166 @@
+"""
+Incrementally maintained inquiry_daily_stats rollup.
+
+Each row holds the number of inquiries of one office that were created on a
+given day and currently have a given status. Mapper listeners on Inquiry
+apply +1/-1 deltas inside the same transaction whenever an inquiry is
+created, deleted, or changes status or office, so dashboards can read the
+rollup instead of recounting the inquiries table.
+
+Writes that bypass the ORM (raw SQL, ON DELETE CASCADE) are not tracked;
+run ``flask rebuild-inquiry-stats`` to backfill or repair the table.
+"""
+
+from datetime import datetime
+from sqlalchemy import event, func, inspect, case
+from app.extensions import db
+from app.models import Inquiry, InquiryDailyStat
+from app.services.counters import increment
+
+
+def _rollup_key(office_id, created_at, status):
+    """Build the (office_id, day, status) key for an inquiry"""
+    created_at = created_at or datetime.utcnow()
+    return office_id, created_at.date(), status or 'pending'
+
+
+def _apply_delta(connection, key, delta):
+    """Add ``delta`` to the rollup row for ``key``, creating it if needed"""
+    office_id, day, status = key
+    if office_id is None:
+        return
+
+    increment(
+        connection, InquiryDailyStat.__table__,
+        {'office_id': office_id, 'day': day, 'status': status},
+        'inquiry_count', delta
+    )
+
+
+def _previous_value(state, attribute):
+    """Return the value an attribute had before the current flush"""
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, attribute)
+
+
+def _after_insert(mapper, connection, target):
+    _apply_delta(connection, _rollup_key(target.office_id, target.created_at, target.status), 1)
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    old_key = _rollup_key(
+        _previous_value(state, 'office_id'),
+        _previous_value(state, 'created_at'),
+        _previous_value(state, 'status')
+    )
+    new_key = _rollup_key(target.office_id, target.created_at, target.status)
+    if old_key != new_key:
+        _apply_delta(connection, old_key, -1)
+        _apply_delta(connection, new_key, 1)
+
+
+def _after_delete(mapper, connection, target):
+    _apply_delta(connection, _rollup_key(target.office_id, target.created_at, target.status), -1)
+
+
+def register_listeners():
+    """Attach the rollup listeners to the Inquiry mapper (safe to call more than once)"""
+    for identifier, listener in (
+        ('after_insert', _after_insert),
+        ('after_update', _after_update),
+        ('after_delete', _after_delete),
+    ):
+        if not event.contains(Inquiry, identifier, listener):
+            event.listen(Inquiry, identifier, listener)
+
+
+def rebuild(office_id=None):
+    """
+    Recompute the rollup from the inquiries table.
+
+    Args:
+        office_id: Only rebuild rows for this office when given
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    delete_query = InquiryDailyStat.query
+    if office_id is not None:
+        delete_query = delete_query.filter(InquiryDailyStat.office_id == office_id)
+    delete_query.delete(synchronize_session=False)
+
+    day = func.date(Inquiry.created_at)
+    status = func.coalesce(Inquiry.status, 'pending')
+    source = db.session.query(
+        Inquiry.office_id,
+        day,
+        status,
+        func.count(Inquiry.id)
+    ).filter(Inquiry.created_at.isnot(None))
+    if office_id is not None:
+        source = source.filter(Inquiry.office_id == office_id)
+    source = source.group_by(Inquiry.office_id, day, status)
+
+    table = InquiryDailyStat.__table__
+    result = db.session.execute(
+        table.insert().from_select(
+            ['office_id', 'day', 'status', 'inquiry_count'],
+            source
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def status_counts(office_id=None, start=None, end=None):
+    """
+    Inquiry counts per current status from the rollup.
+
+    Args:
+        office_id: Restrict to one office
+        start: Only inquiries created on or after this datetime
+        end: Only inquiries created before this datetime
+
+    Returns:
+        dict: status -> count, plus a 'total' key
+    """
+    query = db.session.query(
+        InquiryDailyStat.status,
+        func.sum(InquiryDailyStat.inquiry_count)
+    )
+    if office_id is not None:
+        query = query.filter(InquiryDailyStat.office_id == office_id)
+    if start is not None:
+        query = query.filter(InquiryDailyStat.day >= start.date())
+    if end is not None:
+        query = query.filter(InquiryDailyStat.day < end.date())
+
+    counts = {'total': 0}
+    for status, count in query.group_by(InquiryDailyStat.status).all():
+        counts[status] = int(count or 0)
+        counts['total'] += int(count or 0)
+    return counts
+
+
+def office_counts(status=None):
+    """
+    Inquiry counts per office from the rollup.
+
+    Args:
+        status: Only count inquiries currently in this status
+
+    Returns:
+        dict: office_id -> count
+    """
+    total = func.sum(InquiryDailyStat.inquiry_count)
+    if status is not None:
+        total = func.sum(case((InquiryDailyStat.status == status, InquiryDailyStat.inquiry_count), else_=0))
+
+    rows = db.session.query(
+        InquiryDailyStat.office_id,
+        total
+    ).group_by(InquiryDailyStat.office_id).all()
+    return {office_id: int(count or 0) for office_id, count in rows}
@@ -0,0 +1,386 @@
+"""
+Cold archive for old log rows.
+
+Rows older than LOG_ARCHIVE_AFTER_DAYS (default 90) are moved out of the log
+tables into gzipped JSON Lines files under LOG_ARCHIVE_FOLDER (default
+<instance>/log_archive), one or more files per table and day:
+
+    <folder>/<table>/<YYYY>/<MM>/<YYYY-MM-DD>-<first id>-<last id>.jsonl.gz
+
+``manifest.json`` in the folder lists every file with its table, day, row
+count, time range and the actor ids it contains, so ``scan_archive()`` only
+opens the files that can match a date or actor filter. Each entry also
+records when its first and its last row pass their ``retention_days``
+(``first_expires`` / ``expires``).
+
+A file is written under a temporary name, renamed, added to the manifest and
+only then are its rows deleted from the table (in LOG_RETENTION_BATCH_SIZE
+chunks). If a run stops between the manifest and the delete, the next run
+archives those rows again; ``scan_archive()`` skips the repeats. Each run
+archives at most LOG_RETENTION_BATCH_SIZE * LOG_RETENTION_MAX_BATCHES rows
+per table and continues on the next run.
+
+Archived rows keep their retention period. The ``purge_expired_logs``
+scheduler job archives, then purges the tables and then the archive with
+``purge_expired_archive()``: a file whose rows have all expired is deleted,
+and a file with some expired rows is rewritten without them. Run it by hand
+with ``flask archive-logs`` and ``flask purge-logs``, and search the archive
+with ``flask search-log-archive``.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models import AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog
+from app.services.keyset import keyset_paginate
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+MANIFEST_NAME = 'manifest.json'
+
+# Log model -> (column its age is measured by, column identifying the actor)
+ARCHIVE_MODELS = (
+    (AuditLog, AuditLog.timestamp, AuditLog.actor_id),
+    (StudentActivityLog, StudentActivityLog.timestamp, StudentActivityLog.student_id),
+    (OfficeLoginLog, OfficeLoginLog.login_time, OfficeLoginLog.office_admin_id),
+    (SuperAdminActivityLog, SuperAdminActivityLog.timestamp, SuperAdminActivityLog.super_admin_id),
+)
+
+
+def _setting(name, default):
+    return current_app.config.get(name, default)
+
+
+def archive_folder():
+    folder = _setting('LOG_ARCHIVE_FOLDER', None) or os.path.join(current_app.instance_path, 'log_archive')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def load_manifest(folder=None):
+    path = os.path.join(folder or archive_folder(), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'version': 1, 'files': []}
+    with open(path, encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def _save_manifest(folder, manifest):
+    path = os.path.join(folder, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _default_retention(model):
+    """The model's retention_days column default (used for rows where it is NULL)"""
+    return model.__table__.c.retention_days.default.arg
+
+
+def _expires(retention_days, timestamp, default_days):
+    """When a row logged at ``timestamp`` passes its retention period"""
+    return timestamp + timedelta(days=retention_days if retention_days is not None else default_days)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _DayFile:
+    """A gzipped JSON Lines file being written for one table and day"""
+
+    def __init__(self, folder, table, day, default_days):
+        self.folder = folder
+        self.table = table
+        self.day = day
+        self.default_days = default_days
+        self.directory = os.path.join(folder, table, f"{day:%Y}", f"{day:%m}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.temp_path = os.path.join(self.directory, f"{day.isoformat()}.jsonl.gz.part")
+        self.output = gzip.open(self.temp_path, 'wt', encoding='utf-8')
+        self.ids = []
+        self.actor_ids = set()
+        self.first_time = self.last_time = None
+        self.first_expires = self.expires = None
+
+    def write(self, row, timestamp, actor_id):
+        self.output.write(json.dumps({key: _json_value(value) for key, value in row.items()}, separators=(',', ':')))
+        self.output.write('\n')
+        self.ids.append(row['id'])
+        if actor_id is not None:
+            self.actor_ids.add(actor_id)
+        # Rows arrive newest first
+        self.first_time = timestamp
+        if self.last_time is None:
+            self.last_time = timestamp
+
+        expires = _expires(row.get('retention_days'), timestamp, self.default_days)
+        self.first_expires = min(self.first_expires or expires, expires)
+        self.expires = max(self.expires or expires, expires)
+
+    def close(self):
+        """Finish the file and return its manifest entry"""
+        self.output.close()
+        name = f"{self.day.isoformat()}-{min(self.ids)}-{max(self.ids)}.jsonl.gz"
+        path = os.path.join(self.directory, name)
+        os.replace(self.temp_path, path)
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as archived:
+            for chunk in iter(lambda: archived.read(1 << 16), b''):
+                digest.update(chunk)
+
+        return {
+            'table': self.table,
+            'date': self.day.isoformat(),
+            'path': os.path.relpath(path, self.folder).replace(os.sep, '/'),
+            'rows': len(self.ids),
+            'first_time': self.first_time.isoformat(),
+            'last_time': self.last_time.isoformat(),
+            'actor_ids': sorted(self.actor_ids),
+            'first_expires': self.first_expires.isoformat(),
+            'expires': self.expires.isoformat(),
+            'sha256': digest.hexdigest(),
+            'archived_at': datetime.utcnow().isoformat()
+        }
+
+
+def _delete_archived(model, column, day, ids, batch_size, pause):
+    """Delete archived rows by id; the day range lets PostgreSQL prune partitions"""
+    table = model.__table__
+    start = datetime.combine(day, datetime.min.time())
+    for offset in range(0, len(ids), batch_size):
+        db.session.execute(table.delete().where(
+            (column >= start) & (column < start + timedelta(days=1)) &
+            table.c.id.in_(ids[offset:offset + batch_size])
+        ))
+        db.session.commit()
+        if pause:
+            time.sleep(pause)
+
+
+def _row_batches(query, column, id_column, actor_column, batch_size):
+    """
+    Keyset batches of (row dict, timestamp, actor id), newest first.
+
+    Each batch is copied out of its ORM objects before it is handed on, so
+    the commits of the deletes in between do not expire rows still to be written.
+    """
+    cursor = None
+    while True:
+        page = keyset_paginate(query, column, id_column, cursor=cursor, per_page=batch_size)
+        yield [(log.to_dict(), getattr(log, column.key), getattr(log, actor_column.key)) for log in page.items]
+        if not page.has_next:
+            return
+        cursor = page.next_cursor
+
+
+def archive_logs(now=None):
+    """
+    Move log rows older than LOG_ARCHIVE_AFTER_DAYS into the archive.
+
+    Returns:
+        dict: table name -> {'archived': rows moved, 'files': files written,
+        'incomplete': True if the row limit stopped the run early}
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=_setting('LOG_ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS))
+    batch_size = _setting('LOG_RETENTION_BATCH_SIZE', 5000)
+    pause = _setting('LOG_RETENTION_PAUSE', 0.2)
+    max_rows = batch_size * _setting('LOG_RETENTION_MAX_BATCHES', 200)
+
+    folder = archive_folder()
+    manifest = load_manifest(folder)
+
+    report = {}
+    for model, column, actor_column in ARCHIVE_MODELS:
+        table = model.__tablename__
+        stats = {'archived': 0, 'files': 0, 'incomplete': False}
+        report[table] = stats
+
+        def finish(day_file):
+            manifest['files'].append(day_file.close())
+            _save_manifest(folder, manifest)
+            _delete_archived(model, column, day_file.day, day_file.ids, batch_size, pause)
+            stats['archived'] += len(day_file.ids)
+            stats['files'] += 1
+
+        day_file = None
+        query = model.query.filter(column < cutoff)
+        for rows in _row_batches(query, column, model.id, actor_column, batch_size):
+            for row, timestamp, actor_id in rows:
+                if day_file is not None and day_file.day != timestamp.date():
+                    finish(day_file)
+                    day_file = None
+                if stats['archived'] + (len(day_file.ids) if day_file else 0) >= max_rows:
+                    stats['incomplete'] = True
+                    break
+                if day_file is None:
+                    day_file = _DayFile(folder, table, timestamp.date(), _default_retention(model))
+                day_file.write(row, timestamp, actor_id)
+            if stats['incomplete']:
+                break
+
+        if day_file is not None:
+            finish(day_file)
+
+    return report
+
+
+def _read_rows(folder, entry):
+    with gzip.open(os.path.join(folder, entry['path']), 'rt', encoding='utf-8') as archived:
+        return [json.loads(line) for line in archived]
+
+
+def purge_expired_archive(now=None):
+    """
+    Remove archived rows past their retention_days.
+
+    Only files whose ``first_expires`` has passed are opened (entries written
+    before expiry dates were recorded are opened once and get them). A file
+    whose rows have all expired is deleted; one with some expired rows is
+    rewritten without them. The manifest is saved before old files are
+    removed, so an interrupted run leaves at most an unlisted file behind.
+
+    Returns:
+        dict: table name -> {'deleted': rows removed, 'files_deleted': files
+        removed, 'files_rewritten': files written again without expired rows}
+    """
+    now = now or datetime.utcnow()
+    folder = archive_folder()
+    manifest = load_manifest(folder)
+    models = {model.__tablename__: (model, column, actor_column) for model, column, actor_column in ARCHIVE_MODELS}
+    report = {table: {'deleted': 0, 'files_deleted': 0, 'files_rewritten': 0} for table in models}
+
+    kept, removed_paths, changed = [], [], False
+    for entry in manifest['files']:
+        if 'first_expires' in entry and datetime.fromisoformat(entry['first_expires']) > now:
+            kept.append(entry)
+            continue
+
+        model, column, actor_column = models[entry['table']]
+        default_days = _default_retention(model)
+        rows = _read_rows(folder, entry)
+        expiries = [
+            _expires(row.get('retention_days'), datetime.fromisoformat(row[column.key]), default_days)
+            for row in rows
+        ]
+        live = [row for row, expires in zip(rows, expiries) if expires > now]
+        stats = report[entry['table']]
+        changed = True
+
+        if len(live) == len(rows):
+            # Entry written before expiry dates were recorded
+            entry['first_expires'], entry['expires'] = min(expiries).isoformat(), max(expiries).isoformat()
+            kept.append(entry)
+            continue
+
+        if live:
+            day_file = _DayFile(folder, entry['table'], date.fromisoformat(entry['date']), default_days)
+            for row in live:
+                day_file.write(row, datetime.fromisoformat(row[column.key]), row[actor_column.key])
+            rewritten = day_file.close()
+            kept.append(rewritten)
+            stats['files_rewritten'] += 1
+            if rewritten['path'] != entry['path']:
+                removed_paths.append(entry['path'])
+        else:
+            stats['files_deleted'] += 1
+            removed_paths.append(entry['path'])
+        stats['deleted'] += len(rows) - len(live)
+
+    if changed:
+        manifest['files'] = kept
+        _save_manifest(folder, manifest)
+    for path in removed_paths:
+        # A day archived twice has two entries that may share a file name
+        if not any(entry['path'] == path for entry in kept):
+            os.remove(os.path.join(folder, path))
+    return report
+
+
+def format_purge_report(report):
+    """One line per table, e.g. 'audit_logs: 1200 archived rows purged (3 files deleted, 1 rewritten)'"""
+    return [
+        f"{table}: {stats['deleted']} archived rows purged "
+        f"({stats['files_deleted']} files deleted, {stats['files_rewritten']} rewritten)"
+        for table, stats in report.items()
+    ]
+
+
+def format_report(report):
+    """One line per table, e.g. 'audit_logs: 1200 rows archived in 12 files'"""
+    lines = []
+    for table, stats in report.items():
+        line = f"{table}: {stats['archived']} rows archived in {stats['files']} files"
+        if stats['incomplete']:
+            line += " - row limit reached, continuing next run"
+        lines.append(line)
+    return lines
+
+
+def actor_ids_for(user):
+    """The id each log table records for ``user`` as its actor"""
+    return {
+        AuditLog.__tablename__: user.id,
+        StudentActivityLog.__tablename__: user.student.id if user.student else None,
+        OfficeLoginLog.__tablename__: user.office_admin.id if user.office_admin else None,
+        SuperAdminActivityLog.__tablename__: user.id,
+    }
+
+
+def scan_archive(table=None, date_from=None, date_to=None, actors=None):
+    """
+    Yield archived rows matching the filters, oldest day first within each table.
+
+    Args:
+        table: Only this log table
+        date_from, date_to: Inclusive dates
+        actors: Dict of table name -> actor id (see actor_ids_for); tables
+            without an id for the actor are skipped
+
+    Yields:
+        tuple: (table name, row dict with ISO formatted datetimes)
+    """
+    folder = archive_folder()
+    actor_keys = {model.__tablename__: actor_column.key for model, _, actor_column in ARCHIVE_MODELS}
+
+    entries = []
+    for entry in load_manifest(folder)['files']:
+        if table and entry['table'] != table:
+            continue
+        if date_from and entry['date'] < date_from.isoformat():
+            continue
+        if date_to and entry['date'] > date_to.isoformat():
+            continue
+        if actors is not None:
+            actor_id = actors.get(entry['table'])
+            if actor_id is None or actor_id not in entry['actor_ids']:
+                continue
+        entries.append(entry)
+    entries.sort(key=lambda entry: (entry['table'], entry['date'], entry['first_time']))
+
+    seen_day, seen_ids = None, set()
+    for entry in entries:
+        # A day archived twice after an interrupted run has the same ids in two files
+        if (entry['table'], entry['date']) != seen_day:
+            seen_day, seen_ids = (entry['table'], entry['date']), set()
+
+        actor_id = actors.get(entry['table']) if actors is not None else None
+        rows = _read_rows(folder, entry)
+        # Files are written newest first
+        for row in reversed(rows):
+            if row['id'] in seen_ids:
+                continue
+            seen_ids.add(row['id'])
+            if actor_id is not None and row[actor_keys[entry['table']]] != actor_id:
+                continue
+            yield entry['table'], row
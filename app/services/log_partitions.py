@@ -0,0 +1,198 @@
+"""
+Monthly range partitioning of the log tables on PostgreSQL.
+
+``flask partition-log-tables`` converts audit_logs, student_activity_logs,
+office_login_logs and super_admin_activity_logs into tables partitioned by
+month on their time column, e.g. audit_logs_p2025_03 holds March 2025. The
+data is copied over in the same transaction. The primary key becomes (id,
+<time column>) because PostgreSQL requires the partition key in it; ids still
+come from the original sequence, so the ORM keeps using ``id`` alone.
+
+The ``ensure_log_partitions`` scheduler job then creates the partitions
+for the current month and LOG_PARTITION_MONTHS_AHEAD months ahead (default
+3). A DEFAULT partition catches rows outside any month partition. The
+partition key is part of the primary key and so cannot be NULL: legacy rows
+without a time are copied with 1970-01-01, which lands them in the DEFAULT
+partition. Foreign keys of the old table are re-created on the partitioned
+one. Months are UTC months, like the stored times. Queries filtering on the
+time column with plain range comparisons only scan the matching months
+(partition pruning).
+
+Other databases keep the plain tables and every function here is a no-op.
+"""
+
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import text
+from app.extensions import db
+
+DEFAULT_MONTHS_AHEAD = 3
+
+# Partitioned log tables and the column each one is partitioned by
+PARTITIONED_TABLES = {
+    'audit_logs': 'timestamp',
+    'student_activity_logs': 'timestamp',
+    'office_login_logs': 'login_time',
+    'super_admin_activity_logs': 'timestamp',
+}
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _utc_today():
+    # Log times are stored with datetime.utcnow()
+    return datetime.utcnow().date()
+
+
+def month_start(value, offset=0):
+    """First day of the month ``offset`` months after the one containing ``value``"""
+    month_index = value.year * 12 + value.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """Name of a month partition, e.g. partition_name('audit_logs', date(2025, 3, 1)) -> 'audit_logs_p2025_03'"""
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(table, connection=None):
+    """Whether ``table`` is already a partitioned table"""
+    return (connection or db.session).execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {'table': table}).scalar()
+
+
+def list_partitions(table, connection=None):
+    """Names of the partitions attached to ``table``"""
+    rows = (connection or db.session).execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    ), {'table': table})
+    return [row[0] for row in rows]
+
+
+def create_month_partition(table, month):
+    """Create the partition of ``table`` for the month starting at ``month`` if it is missing"""
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+    ))
+
+
+def ensure_partitions(months_ahead=None, today=None):
+    """
+    Create the current and upcoming month partitions of every partitioned log table.
+
+    Returns:
+        int: Number of tables checked (0 when nothing is partitioned or not on PostgreSQL)
+    """
+    if not _is_postgres():
+        return 0
+
+    if months_ahead is None:
+        months_ahead = current_app.config.get('LOG_PARTITION_MONTHS_AHEAD', DEFAULT_MONTHS_AHEAD)
+    today = today or _utc_today()
+
+    checked = 0
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            continue
+        for offset in range(months_ahead + 1):
+            create_month_partition(table, month_start(today, offset))
+        checked += 1
+    db.session.commit()
+    return checked
+
+
+def convert_table(table, months_ahead=DEFAULT_MONTHS_AHEAD):
+    """
+    Convert one log table into a monthly partitioned table, keeping its rows.
+
+    The old table is renamed, a partitioned copy takes its name, partitions
+    are created for every month that has rows plus the months ahead, and the
+    rows are copied across before the old table is dropped.
+
+    Returns:
+        bool: False if the table was already partitioned
+    """
+    if is_partitioned(table):
+        return False
+
+    column = PARTITIONED_TABLES[table]
+    legacy = f"{table}_unpartitioned"
+
+    indexes = db.session.execute(text(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = :table AND indexname NOT LIKE '%_pkey'"
+    ), {'table': table}).scalars().all()
+    bounds = db.session.execute(text(f"SELECT min(\"{column}\"), max(\"{column}\") FROM {table}")).first()
+    sequence = db.session.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table}).scalar()
+    # LIKE does not copy foreign keys; they are re-created on the partitioned table
+    foreign_keys = db.session.execute(text(
+        "SELECT con.conname, pg_get_constraintdef(con.oid) FROM pg_constraint con "
+        "JOIN pg_class c ON c.oid = con.conrelid WHERE c.relname = :table AND con.contype = 'f'"
+    ), {'table': table}).all()
+
+    db.session.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    db.session.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey"))
+    for indexdef in indexes:
+        index_name = indexdef.split(' INDEX ', 1)[1].split(' ON ', 1)[0]
+        db.session.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name}_unpartitioned"))
+
+    db.session.execute(text(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+        f"PRIMARY KEY (id, \"{column}\")) PARTITION BY RANGE (\"{column}\")"
+    ))
+    if sequence:
+        # Keep drawing ids from the existing sequence, and keep it when the old table is dropped
+        db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    for indexdef in indexes:
+        # Indexes created on the parent are created on every partition
+        db.session.execute(text(indexdef.replace(f" ON public.{table} ", f" ON {table} ")))
+    db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+    first, last = bounds
+    today = _utc_today()
+    month = month_start(first or today)
+    last_month = month_start(today, months_ahead)
+    if last is not None:
+        last_month = max(last_month, month_start(last))
+    while month <= last_month:
+        create_month_partition(table, month)
+        month = month_start(month, 1)
+
+    # The time column is part of the new primary key, so it cannot be NULL
+    db.session.execute(text(
+        f"UPDATE {legacy} SET \"{column}\" = TIMESTAMP '1970-01-01' WHERE \"{column}\" IS NULL"
+    ))
+    db.session.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+    db.session.execute(text(f"DROP TABLE {legacy}"))
+    for name, definition in foreign_keys:
+        db.session.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+    return True
+
+
+def convert_all(months_ahead=DEFAULT_MONTHS_AHEAD):
+    """
+    Partition every log table that is not partitioned yet, in one transaction.
+
+    Returns:
+        list: Names of the tables converted
+    """
+    if not _is_postgres():
+        raise RuntimeError("Log table partitioning requires PostgreSQL")
+
+    converted = []
+    try:
+        for table in PARTITIONED_TABLES:
+            if convert_table(table, months_ahead):
+                converted.append(table)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return converted
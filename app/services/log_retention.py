@@ -0,0 +1,260 @@
+"""
+Retention enforcement for the log tables.
+
+Every log row carries ``retention_days`` (365 by default, 730 for super
+admin logs). The ``purge_expired_logs`` scheduler job and ``flask
+purge-logs`` delete rows older than their retention period:
+
+* Rows are deleted per distinct retention_days value with
+  ``retention_days = :days AND <time column> < :cutoff``, a range scan on a
+  (retention_days, <time column>) index. The distinct values are found with
+  one index probe each instead of a full scan.
+* Each DELETE removes at most LOG_RETENTION_BATCH_SIZE rows (default 5000)
+  and commits, then the job pauses LOG_RETENTION_PAUSE seconds so row locks
+  are short-lived and other writers get through. A run stops after
+  LOG_RETENTION_MAX_BATCHES batches per table and picks up where it left
+  off next time.
+* On PostgreSQL, month partitions created by log_partitions.py whose
+  newest possible row is past the longest retention in the partition are
+  dropped whole instead.
+
+The (retention_days, <time column>) indexes are in schema.txt; existing
+databases get them from ``flask build-log-retention-indexes``, which builds
+them with CREATE INDEX CONCURRENTLY on PostgreSQL so log inserts are not
+blocked. The purge job assumes they exist and never runs DDL.
+
+Aggregated student view counters (student_activity_counters) have no
+per-row retention and are kept for STUDENT_VIEW_COUNTER_RETENTION_DAYS.
+They are deleted in the same bounded batches, by range scans on their
+(hour, id) index.
+"""
+
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select, text
+from app.extensions import db
+from app.models import (
+    AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog, StudentActivityCounter
+)
+from app.services.log_partitions import is_partitioned, list_partitions, month_start
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAUSE = 0.2  # seconds between batches
+DEFAULT_MAX_BATCHES = 200  # per table and run
+DEFAULT_COUNTER_RETENTION_DAYS = 365
+
+# Log model -> the column its age is measured by
+RETENTION_MODELS = (
+    (AuditLog, AuditLog.timestamp),
+    (StudentActivityLog, StudentActivityLog.timestamp),
+    (OfficeLoginLog, OfficeLoginLog.login_time),
+    (SuperAdminActivityLog, SuperAdminActivityLog.timestamp),
+)
+
+# Composite indexes the purge queries range-scan (schema.txt / build-log-retention-indexes)
+RETENTION_INDEXES = [
+    db.Index(f"idx_{model.__tablename__}_retention", model.retention_days, column)
+    for model, column in RETENTION_MODELS
+]
+
+
+def _setting(name, default):
+    return current_app.config.get(name, default)
+
+
+def _index_columns(index):
+    return ', '.join(f'"{column.name}"' for column in index.columns)
+
+
+def _create_index_concurrently(connection, index):
+    """
+    Build one index without blocking writes to its table (PostgreSQL).
+
+    A partitioned table cannot be indexed concurrently, so the index is
+    created on the parent only (instant, invalid until complete), built
+    concurrently on each partition and attached partition by partition.
+    """
+    table = index.table.name
+    columns = _index_columns(index)
+    if not is_partitioned(table, connection):
+        connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {table} ({columns})"))
+        return
+
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON ONLY {table} ({columns})"))
+    # Partitions whose index is already attached to the parent index
+    indexed = set(connection.execute(text(
+        "SELECT tbl.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_index x ON x.indexrelid = i.inhrelid "
+        "JOIN pg_class tbl ON tbl.oid = x.indrelid WHERE parent.relname = :index"
+    ), {'index': index.name}).scalars())
+    for partition in list_partitions(table, connection):
+        if partition in indexed:
+            continue
+        partition_index = f"{partition}_retention_idx"
+        connection.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} ({columns})"
+        ))
+        connection.execute(text(f"ALTER INDEX {index.name} ATTACH PARTITION {partition_index}"))
+
+
+def ensure_indexes():
+    """
+    Create the (retention_days, time column) indexes that do not exist yet.
+
+    Run from ``flask build-log-retention-indexes``, not from the purge job.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        for index in RETENTION_INDEXES:
+            index.create(bind=db.engine, checkfirst=True)
+        return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for index in RETENTION_INDEXES:
+            _create_index_concurrently(connection, index)
+
+
+def retention_periods(model):
+    """
+    Distinct retention_days values in a log table, via one index probe per value.
+
+    Returns:
+        list: The values in ascending order, plus None if some rows have no retention set
+    """
+    periods = []
+    current = db.session.execute(select(func.min(model.retention_days))).scalar()
+    while current is not None:
+        periods.append(current)
+        current = db.session.execute(
+            select(func.min(model.retention_days)).where(model.retention_days > current)
+        ).scalar()
+
+    has_null = db.session.execute(
+        select(model.id).where(model.retention_days.is_(None)).limit(1)
+    ).first()
+    if has_null:
+        periods.append(None)
+    return periods
+
+
+def _default_retention(model):
+    """The model's retention_days column default (used for rows where it is NULL)"""
+    return model.__table__.c.retention_days.default.arg
+
+
+def delete_in_batches(model, condition, batch_size, pause, max_batches):
+    """
+    Delete the rows of ``model`` matching ``condition``, ``batch_size`` at a time.
+
+    Returns:
+        tuple: (rows deleted, whether rows may remain because max_batches was hit)
+    """
+    table = model.__table__
+    deleted = 0
+    for batch in range(max_batches):
+        ids = select(table.c.id).where(condition).limit(batch_size).scalar_subquery()
+        result = db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted, False
+        if pause:
+            time.sleep(pause)
+    return deleted, True
+
+
+def drop_expired_partitions(model, now):
+    """
+    Drop month partitions of a partitioned log table whose rows have all expired.
+
+    Returns:
+        tuple: (rows dropped, names of the partitions dropped)
+    """
+    table = model.__tablename__
+    default_days = _default_retention(model)
+    dropped_rows, dropped = 0, []
+
+    for name in list_partitions(table):
+        suffix = name[len(table) + 2:]  # 'YYYY_MM' after '<table>_p'
+        if not name.startswith(f"{table}_p") or len(suffix) != 7:
+            continue
+        month_end = month_start(datetime(int(suffix[:4]), int(suffix[5:]), 1), 1)
+        if month_end > (now - timedelta(days=default_days)).date():
+            # Cheap skip: even rows with the default retention have not all expired
+            continue
+
+        longest, rows = db.session.execute(text(
+            f"SELECT max(coalesce(retention_days, :default_days)), count(*) FROM {name}"
+        ), {'default_days': default_days}).first()
+        if rows and month_end > (now - timedelta(days=longest)).date():
+            continue
+
+        db.session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        db.session.execute(text(f"DROP TABLE {name}"))
+        db.session.commit()
+        dropped_rows += rows or 0
+        dropped.append(name)
+    return dropped_rows, dropped
+
+
+def format_report(report):
+    """One line per table, e.g. 'audit_logs: 1200 rows purged (2 partitions dropped)'"""
+    lines = []
+    for table, stats in report.items():
+        line = f"{table}: {stats['deleted']} rows purged"
+        if stats['partitions_dropped']:
+            line += f" ({len(stats['partitions_dropped'])} partitions dropped)"
+        if stats['incomplete']:
+            line += " - batch limit reached, continuing next run"
+        lines.append(line)
+    return lines
+
+
+def purge_expired(now=None):
+    """
+    Delete expired rows from every log table.
+
+    Returns:
+        dict: table name -> {'deleted': rows deleted, 'partitions_dropped': [...],
+        'incomplete': True if the batch limit stopped the purge early}
+    """
+    now = now or datetime.utcnow()
+    batch_size = _setting('LOG_RETENTION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    pause = _setting('LOG_RETENTION_PAUSE', DEFAULT_PAUSE)
+    max_batches = _setting('LOG_RETENTION_MAX_BATCHES', DEFAULT_MAX_BATCHES)
+    postgres = db.engine.dialect.name == 'postgresql'
+
+    report = {}
+    for model, column in RETENTION_MODELS:
+        table = model.__tablename__
+        stats = {'deleted': 0, 'partitions_dropped': [], 'incomplete': False}
+        report[table] = stats
+
+        if postgres and is_partitioned(table):
+            rows, dropped = drop_expired_partitions(model, now)
+            stats['deleted'] += rows
+            stats['partitions_dropped'] = dropped
+
+        for days in retention_periods(model):
+            if days is None:
+                condition = model.retention_days.is_(None) & (
+                    column < now - timedelta(days=_default_retention(model))
+                )
+            else:
+                condition = (model.retention_days == days) & (column < now - timedelta(days=days))
+            deleted, incomplete = delete_in_batches(model, condition, batch_size, pause, max_batches)
+            stats['deleted'] += deleted
+            stats['incomplete'] = stats['incomplete'] or incomplete
+
+    counter_days = _setting('STUDENT_VIEW_COUNTER_RETENTION_DAYS', DEFAULT_COUNTER_RETENTION_DAYS)
+    deleted, incomplete = delete_in_batches(
+        StudentActivityCounter, StudentActivityCounter.hour < now - timedelta(days=counter_days),
+        batch_size, pause, max_batches
+    )
+    report[StudentActivityCounter.__tablename__] = {
+        'deleted': deleted, 'partitions_dropped': [], 'incomplete': incomplete
+    }
+
+    return report
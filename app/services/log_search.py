@@ -0,0 +1,202 @@
+"""
+Indexed substring search for the audit log listings.
+
+The search box matches a term anywhere in the user's name or email and in
+the log's action/target type. ``ILIKE '%term%'`` across outer joins cannot
+use a B-tree index, so each log type's search is rewritten as conditions on
+the log table alone ("actor is one of the matching users OR action
+matches"), and the substring matches are served by:
+
+* PostgreSQL: pg_trgm GIN indexes, which ILIKE uses directly. They are
+  created by ``flask build-log-search-index``.
+* SQLite (local and test runs): FTS5 tables with the trigram tokenizer,
+  kept in sync by triggers. They are created and filled by the same
+  command; searches only check that they exist and never run DDL.
+
+Terms shorter than three characters, which trigrams cannot index, and
+databases without either feature fall back to plain ILIKE.
+"""
+
+from sqlalchemy import bindparam, column, or_, select, text
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+from app.models import (
+    User, Student, OfficeAdmin, Office, AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog
+)
+
+MIN_INDEXED_LENGTH = 3  # trigram indexes cannot serve shorter terms
+
+# Table -> text columns the search matches
+SEARCH_COLUMNS = {
+    'users': ('first_name', 'last_name', 'email'),
+    'offices': ('name',),
+    'audit_logs': ('action', 'target_type'),
+    'student_activity_logs': ('action',),
+    'super_admin_activity_logs': ('action', 'target_type'),
+}
+
+# Database URLs whose FTS5 tables are known to exist
+_fts_state = {}
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def create_fts_table(connection, table, columns, tokenize='trigram'):
+    """
+    Create an FTS5 index (trigram by default) over ``table`` and the triggers
+    keeping it in sync, and (re)build it from the table's rows.
+
+    Meant for CLI commands: the rebuild reads the whole table.
+    """
+    fts = f"{table}_fts"
+    names = ', '.join(columns)
+    new_values = ', '.join(f"new.{name}" for name in columns)
+    old_values = ', '.join(f"old.{name}" for name in columns)
+
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{names}, content='{table}', content_rowid='id', tokenize='{tokenize}')"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END"
+    ))
+    # Only changes to the indexed columns touch the index
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END"
+    ))
+    # Index the rows written before the table or its triggers existed
+    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def fts_tables_exist(connection, tables):
+    """Whether the FTS5 table of every one of ``tables`` exists (read-only check)"""
+    names = [f"{table}_fts" for table in tables]
+    found = connection.execute(text(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN :names"
+    ).bindparams(bindparam('names', expanding=True)), {'names': names}).scalar()
+    return found == len(names)
+
+
+def _create_trigram_indexes(connection):
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for table, columns in SEARCH_COLUMNS.items():
+        for name in columns:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{name}_trgm ON {table} USING gin ({name} gin_trgm_ops)"
+            ))
+
+
+def _fts_tables():
+    return [table for table in SEARCH_COLUMNS if table != 'offices']
+
+
+def ensure_search_indexes():
+    """
+    Create the search indexes for the current database (``flask build-log-search-index``).
+
+    Returns:
+        bool: Whether indexed search is available
+    """
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        with db.engine.begin() as connection:
+            _create_trigram_indexes(connection)
+        return True
+
+    if dialect != 'sqlite':
+        return False
+
+    url = str(db.engine.url)
+    try:
+        with db.engine.begin() as connection:
+            for table in _fts_tables():  # offices has a handful of rows, ILIKE is fine
+                create_fts_table(connection, table, SEARCH_COLUMNS[table])
+        _fts_state[url] = True
+    except OperationalError:
+        # SQLite built without FTS5 or the trigram tokenizer (3.34+)
+        _fts_state[url] = False
+    return _fts_state[url]
+
+
+def _fts_available():
+    """Whether the FTS5 tables exist; until the command has created them searches use ILIKE"""
+    url = str(db.engine.url)
+    if not _fts_state.get(url):
+        # Only a positive answer is remembered, so the command takes effect without a restart
+        _fts_state[url] = fts_tables_exist(db.session, _fts_tables())
+    return _fts_state[url]
+
+
+def text_match(model, term):
+    """
+    Condition on ``model`` matching rows whose search columns contain ``term``.
+
+    On SQLite this looks the term up in the table's FTS5 index; everywhere
+    else it is an ILIKE per column, which PostgreSQL serves from the
+    trigram indexes.
+    """
+    table = model.__tablename__
+    columns = SEARCH_COLUMNS[table]
+
+    if len(term) >= MIN_INDEXED_LENGTH and table != 'offices' and _dialect() == 'sqlite' and _fts_available():
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = text(
+            f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :{table}_term"
+        ).bindparams(**{f"{table}_term": phrase}).columns(column('rowid'))
+        return model.id.in_(matches)
+
+    pattern = f"%{term}%"
+    return or_(*(getattr(model, name).ilike(pattern) for name in columns))
+
+
+def matching_user_ids(term):
+    """Subquery of the ids of users whose name or email contains ``term``"""
+    return select(User.id).where(text_match(User, term))
+
+
+def matching_student_ids(term):
+    """Subquery of the ids of students whose name or email contains ``term``"""
+    return select(Student.id).where(Student.user_id.in_(matching_user_ids(term)))
+
+
+def search_filter(log_type, term):
+    """
+    The search box condition for one audit log listing.
+
+    Args:
+        log_type: 'student', 'office', 'superadmin' or 'all'
+        term: The search text
+
+    Returns:
+        A condition on that log type's table only
+    """
+    if log_type == 'student':
+        return or_(
+            StudentActivityLog.student_id.in_(matching_student_ids(term)),
+            text_match(StudentActivityLog, term)
+        )
+    elif log_type == 'office':
+        admin_ids = select(OfficeAdmin.id).where(or_(
+            OfficeAdmin.user_id.in_(matching_user_ids(term)),
+            OfficeAdmin.office_id.in_(select(Office.id).where(text_match(Office, term)))
+        ))
+        return OfficeLoginLog.office_admin_id.in_(admin_ids)
+    elif log_type == 'superadmin':
+        return or_(
+            SuperAdminActivityLog.super_admin_id.in_(matching_user_ids(term)),
+            text_match(SuperAdminActivityLog, term)
+        )
+    else:  # 'all' or any other value
+        return or_(
+            AuditLog.actor_id.in_(matching_user_ids(term)),
+            text_match(AuditLog, term)
+        )
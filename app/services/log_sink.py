@@ -0,0 +1,409 @@
+"""
+Batched, asynchronous writer for the activity/audit log tables.
+
+``AuditLog``, ``StudentActivityLog`` and ``SuperAdminActivityLog`` rows are
+put on a bounded in-process queue instead of the request's session. A
+background worker drains the queue and writes each table's rows with one
+bulk INSERT whenever LOG_SINK_BATCH_SIZE records are waiting or
+LOG_SINK_FLUSH_INTERVAL seconds have passed. Page views that only log
+therefore never open a write transaction.
+
+A record logged while the request's session holds uncommitted changes is
+kept on the session until its transaction ends, so the worker never inserts
+a row referencing data it cannot see yet. Other records are queued right
+away and no longer need a commit. What happens to the held records when the
+transaction ends depends on the event:
+
+* Success records (is_success not False and no failure_reason) describe a
+  change made in that transaction and are all-or-nothing with it: queued
+  when it commits, dropped when it rolls back or the session is closed
+  without committing.
+* Failure records (is_success=False or a failure_reason) are always queued,
+  whether the transaction commits, rolls back or is never committed, so
+  the "action failed" entries written just before a rollback are kept. A
+  failure record pointing at a row the rollback removed ends up in the
+  dead-letter file (see below) instead of being lost silently.
+
+Rolling back a savepoint does not drop held records; only the outermost
+transaction ending does.
+
+When the queue is full (LOG_SINK_MAX_QUEUE) the caller writes a batch
+itself, which slows producers down instead of growing memory without bound.
+Queued records are flushed when the process exits. Set LOG_SINK_SYNC = True (e.g. in tests) to
+add each record to the current session immediately, as before.
+
+An aggregator registered for a model (see activity_aggregation.py) can turn
+a record into a counter increment instead of a row; increments for the same
+key within one batch are folded into a single upsert.
+
+A batch that fails to write is retried LOG_SINK_RETRIES times with a
+doubling pause starting at LOG_SINK_RETRY_BACKOFF seconds (errors caused by
+the rows themselves, such as a foreign key to a deleted user, are not
+retried). After that each table is written on its own, then each record of
+a table that still fails, so one bad row only costs itself. Records that
+cannot be written at all are appended to a JSON Lines dead-letter file per
+day under LOG_SINK_DEAD_LETTER_FOLDER (default <instance>/log_dead_letters)
+and written again with ``flask replay-log-dead-letters``.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import DateTime, event
+from sqlalchemy.exc import DataError, IntegrityError
+from app.extensions import db
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 2  # seconds
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5  # seconds before the first retry, doubled after each one
+PUT_TIMEOUT = 0.5  # seconds a producer waits for room before writing a batch itself
+
+# Errors caused by the rows written; retrying the same batch cannot fix them
+_ROW_ERRORS = (IntegrityError, DataError)
+
+REPLAY_SUFFIX = '.replay'
+
+# Session.info keys used to hold records until the caller's transaction ends
+_PENDING_KEY = 'log_sink_pending'
+_FLUSHED_KEY = 'log_sink_flushed'
+
+
+class LogSink:
+    """
+    Bounded queue of (model, values) records flushed with bulk inserts.
+
+    Usage:
+        log_sink.init_app(app)
+        log_sink.enqueue(StudentActivityLog, {'student_id': 1, 'action': 'Viewed dashboard'})
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue=DEFAULT_MAX_QUEUE, synchronous=False, retries=DEFAULT_RETRIES,
+                 retry_backoff=DEFAULT_RETRY_BACKOFF):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.dead_letter_folder = None
+        self.app = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._stopping = False
+        self._aggregators = {}
+
+    def register_aggregator(self, model, aggregator):
+        """
+        Fold some of ``model``'s records into counters.
+
+        Args:
+            aggregator: Object with key(values), returning a hashable counter key
+                or None to keep the record, and write(connection, folded), where
+                folded maps each key to (count, latest timestamp)
+        """
+        self._aggregators[model] = aggregator
+
+    def init_app(self, app):
+        """Read the LOG_SINK_* settings and flush the queue when the process exits"""
+        self.app = app
+        self.batch_size = app.config.get('LOG_SINK_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('LOG_SINK_FLUSH_INTERVAL', self.flush_interval)
+        self.synchronous = app.config.get('LOG_SINK_SYNC', self.synchronous)
+        self.retries = app.config.get('LOG_SINK_RETRIES', self.retries)
+        self.retry_backoff = app.config.get('LOG_SINK_RETRY_BACKOFF', self.retry_backoff)
+        self.dead_letter_folder = (app.config.get('LOG_SINK_DEAD_LETTER_FOLDER')
+                                   or os.path.join(app.instance_path, 'log_dead_letters'))
+        max_queue = app.config.get('LOG_SINK_MAX_QUEUE', self._queue.maxsize)
+        if max_queue != self._queue.maxsize and self._queue.empty():
+            self._queue = queue.Queue(maxsize=max_queue)
+        app.extensions['log_sink'] = self
+        atexit.register(self.shutdown)
+
+        for identifier, listener in (('after_flush', self._on_flush),
+                                     ('after_commit', self._on_commit),
+                                     ('after_transaction_end', self._on_transaction_end)):
+            if not event.contains(db.session, identifier, listener):
+                event.listen(db.session, identifier, listener)
+
+    def enqueue(self, model, values):
+        """
+        Queue one log row.
+
+        Args:
+            model: The log model class (its table receives the row)
+            values: Dict of column values; 'timestamp' defaults to now
+        """
+        if 'timestamp' in model.__table__.columns:
+            values.setdefault('timestamp', datetime.utcnow())
+
+        record = self._record(model, values)
+        if self.synchronous or self.app is None:
+            if record[0] is model:
+                db.session.add(model(**values))
+            else:
+                record[0].write(db.session.connection(), {record[1][0]: (1, values['timestamp'])})
+            return
+
+        session = db.session()
+        if session.new or session.dirty or session.deleted or session.info.get(_FLUSHED_KEY):
+            session.info.setdefault(_PENDING_KEY, []).append(record)
+            return
+        self._put(record)
+
+    def _record(self, model, values):
+        """A record is (model, column values) or, when aggregated, (aggregator, (key, column values))"""
+        aggregator = self._aggregators.get(model)
+        if aggregator is not None:
+            key = aggregator.key(values)
+            if key is not None:
+                return (aggregator, (key, values))
+        return (model, values)
+
+    def _put(self, record):
+        self._ensure_worker()
+        try:
+            self._queue.put(record, timeout=PUT_TIMEOUT)
+        except queue.Full:
+            # Backpressure: the producer pays for a batch so the queue can drain
+            self._write(self._drain(self.batch_size))
+            self._queue.put(record)
+
+    def flush(self):
+        """Write everything queued so far (used on shutdown and by tests)"""
+        while True:
+            records = self._drain(self.batch_size)
+            if not records:
+                return
+            self._write(records)
+
+    def shutdown(self):
+        """Stop the worker and flush the remaining records"""
+        self._stopping = True
+        worker = self._worker
+        if worker is not None and worker.is_alive() and self._worker_pid == os.getpid():
+            worker.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _on_flush(self, session, flush_context):
+        session.info[_FLUSHED_KEY] = True
+
+    def _on_commit(self, session):
+        session.info.pop(_FLUSHED_KEY, None)
+        for record in session.info.pop(_PENDING_KEY, ()):
+            self._put(record)
+
+    def _on_transaction_end(self, session, transaction):
+        # Runs after _on_commit on commit; otherwise the transaction rolled back or was closed
+        if transaction.parent is not None:
+            return
+        session.info.pop(_FLUSHED_KEY, None)
+        for record in session.info.pop(_PENDING_KEY, ()):
+            if self._is_failure(record):
+                self._put(record)
+
+    def _is_failure(self, record):
+        """Whether a record logs a failed action (aggregated records never do)"""
+        target, values = record
+        if target in self._aggregators.values():
+            return False
+        return values.get('is_success') is False or bool(values.get('failure_reason'))
+
+    def _ensure_worker(self):
+        """Start the worker on first use, and again in a forked child process"""
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._stopping = False
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='log-sink', daemon=True)
+            self._worker.start()
+
+    def _drain(self, limit):
+        """Take up to ``limit`` records off the queue without blocking"""
+        records = []
+        while len(records) < limit:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        """Worker loop: collect a batch until it is full or the flush interval ends"""
+        while not self._stopping:
+            try:
+                records = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(records) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    records.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(records)
+
+    def _write(self, records):
+        """
+        Write ``records``: the whole batch with retries, then each table, then
+        each record; what still fails goes to the dead-letter file.
+        """
+        if not records:
+            return
+
+        with self._write_lock, self.app.app_context():
+            error = self._insert_with_retries(records)
+            if error is None:
+                return
+            self.app.logger.warning(f"Writing {len(records)} log records failed, writing them one table at a time: {str(error)}")
+
+            by_target = {}
+            for record in records:
+                by_target.setdefault(record[0], []).append(record)
+
+            failed = []
+            for group in by_target.values():
+                if len(by_target) > 1 and self._insert(group) is None:
+                    continue
+                for record in group:
+                    error = self._insert([record])
+                    if error is not None:
+                        failed.append((record, error))
+
+            if failed:
+                self.app.logger.error(f"{len(failed)} of {len(records)} log records could not be written "
+                                      f"and were kept in the dead-letter file: {str(failed[-1][1])}")
+                self._dead_letter(failed)
+
+    def _insert_with_retries(self, records):
+        """Insert ``records`` in one transaction, retrying with backoff; returns the last error or None"""
+        pause = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            error = self._insert(records)
+            if error is None or isinstance(error, _ROW_ERRORS) or attempt == self.retries:
+                return error
+            time.sleep(pause)
+            pause *= 2
+
+    def _insert(self, records):
+        """Bulk insert ``records`` in one transaction, one INSERT per table; returns the error or None"""
+        # executemany needs the same columns in every row, so group by table and key set
+        rows_by_table = {}
+        folded_by_aggregator = {}
+        for target, payload in records:
+            if target in self._aggregators.values():
+                key, values = payload
+                timestamp = values['timestamp']
+                folded = folded_by_aggregator.setdefault(target, {})
+                count, last_seen = folded.get(key, (0, timestamp))
+                folded[key] = (count + 1, max(last_seen, timestamp))
+                continue
+            rows_by_table.setdefault((target.__table__, tuple(sorted(payload))), []).append(payload)
+
+        try:
+            with db.engine.begin() as connection:
+                for (table, _), rows in rows_by_table.items():
+                    connection.execute(table.insert(), rows)
+                for aggregator, folded in folded_by_aggregator.items():
+                    aggregator.write(connection, folded)
+        except Exception as e:
+            return e
+        return None
+
+    def _dead_letter(self, failed):
+        """Append records that could not be written to today's dead-letter file"""
+        models = {aggregator: model for model, aggregator in self._aggregators.items()}
+        os.makedirs(self.dead_letter_folder, exist_ok=True)
+        path = os.path.join(self.dead_letter_folder, f"{date.today().isoformat()}.jsonl")
+        with open(path, 'a', encoding='utf-8') as dead_letters:
+            for (target, payload), error in failed:
+                model = models.get(target, target)
+                values = payload[1] if target in models else payload
+                dead_letters.write(json.dumps({
+                    'table': model.__tablename__,
+                    'values': {key: _json_value(value) for key, value in values.items()},
+                    'error': str(error)[:500]
+                }, separators=(',', ':')))
+                dead_letters.write('\n')
+
+    def replay_dead_letters(self):
+        """
+        Write the records kept in the dead-letter files again (``flask replay-log-dead-letters``).
+
+        Each file is renamed before it is read, so records failing again go to
+        a new file instead of being read twice.
+
+        Returns:
+            int: Records read from the files
+        """
+        folder = self.dead_letter_folder
+        if not folder or not os.path.isdir(folder):
+            return 0
+        models = {mapper.class_.__tablename__: mapper.class_ for mapper in db.Model.registry.mappers}
+
+        replayed = 0
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if name.endswith('.jsonl'):
+                os.replace(path, path + REPLAY_SUFFIX)
+                path += REPLAY_SUFFIX
+            elif not name.endswith(REPLAY_SUFFIX):
+                continue
+
+            records = []
+            with open(path, encoding='utf-8') as dead_letters:
+                for line in dead_letters:
+                    entry = json.loads(line)
+                    model = models[entry['table']]
+                    records.append(self._record(model, _from_json(model, entry['values'])))
+            for offset in range(0, len(records), self.batch_size):
+                self._write(records[offset:offset + self.batch_size])
+            os.remove(path)
+            replayed += len(records)
+        return replayed
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _from_json(model, values):
+    """Column values read back from a dead-letter file, with datetimes parsed"""
+    columns = model.__table__.columns
+    return {
+        key: datetime.fromisoformat(value) if value is not None and isinstance(columns[key].type, DateTime) else value
+        for key, value in values.items()
+    }
+
+
+log_sink = LogSink()
+
+
+def flush_logs():
+    """Write all queued log records now"""
+    sink = current_app.extensions.get('log_sink', log_sink)
+    sink.flush()
+
+
+def replay_dead_letters():
+    """Write the records kept in the dead-letter files again"""
+    sink = current_app.extensions.get('log_sink', log_sink)
+    return sink.replay_dead_letters()
@@ -0,0 +1,96 @@
+"""
+Inquiry message history for the office, student and admin chat views.
+
+Pages are keyset pages over (created_at, id) within one inquiry, served by
+the composite ``idx_inquiry_messages_history`` index on
+(inquiry_id, created_at, id). Messages with the same created_at are ordered
+by id, so paging never skips or repeats one. Senders come from the same
+query through a joined load, so a page is one query however many people
+wrote in it.
+
+``ProgressiveChatLoader`` pages backwards with the ``cursor`` returned by the
+previous page. Requests that still send ``before_id`` cost one extra primary
+key lookup to turn it into a cursor.
+"""
+
+from sqlalchemy.orm import joinedload
+from app.extensions import db
+from app.models import InquiryMessage
+from app.services.keyset import keyset_paginate, encode_cursor
+
+DEFAULT_PAGE_SIZE = 6
+MAX_PAGE_SIZE = 50
+
+
+class MessagePage:
+    """One page of an inquiry's messages, oldest first"""
+
+    def __init__(self, messages, has_more, cursor):
+        self.messages = messages
+        self.has_more = has_more
+        self.cursor = cursor
+
+
+def history_query(inquiry_id):
+    """Messages of one inquiry with their senders loaded in the same query"""
+    return InquiryMessage.query.filter(
+        InquiryMessage.inquiry_id == inquiry_id
+    ).options(joinedload(InquiryMessage.sender))
+
+
+def cursor_before(inquiry_id, message_id):
+    """Cursor for the messages older than ``message_id``, or None if it is not in this inquiry"""
+    row = db.session.query(InquiryMessage.created_at, InquiryMessage.id).filter(
+        InquiryMessage.id == message_id,
+        InquiryMessage.inquiry_id == inquiry_id
+    ).first()
+    if row is None or row.created_at is None:
+        return None
+    return encode_cursor(row.created_at, row.id)
+
+
+def message_page(inquiry_id, cursor=None, before_id=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    The newest messages of an inquiry, or the ones older than a cursor.
+
+    Args:
+        cursor: ``cursor`` of the previous (newer) page
+        before_id: Older clients' alternative to cursor: id of the oldest message
+            shown; an id that is not a message of this inquiry gives an empty page
+        per_page: Messages per page (at most MAX_PAGE_SIZE)
+
+    Returns:
+        MessagePage: messages in chronological order; ``cursor`` continues to
+        older messages and is None on the oldest page
+    """
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    if cursor is None and before_id:
+        cursor = cursor_before(inquiry_id, before_id)
+        if cursor is None:
+            # Not the newest page: that would prepend messages the client already shows
+            return MessagePage([], False, None)
+
+    page = keyset_paginate(
+        history_query(inquiry_id), InquiryMessage.created_at, InquiryMessage.id,
+        cursor=cursor, per_page=per_page
+    )
+    return MessagePage(page.items[::-1], page.has_next, page.next_cursor)
+
+
+def all_messages(inquiry_id):
+    """Every message of an inquiry in chronological order"""
+    return history_query(inquiry_id).order_by(InquiryMessage.created_at, InquiryMessage.id).all()
+
+
+def message_to_dict(message):
+    """JSON form of a message for the chat views"""
+    sender = message.sender
+    return {
+        'id': message.id,
+        'content': message.content,
+        'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'sender_id': message.sender_id,
+        'sender_name': sender.get_full_name() if sender else 'Unknown',
+        'is_student': bool(sender and sender.role == 'student'),
+        'status': message.status
+    }
@@ -0,0 +1,122 @@
+"""
+Delivered and read receipts for inquiry messages, kept as watermarks.
+
+Each participant of an inquiry has one ``inquiry_read_states`` row holding
+the id up to which they have received (``delivered_up_to_id``) and read
+(``read_up_to_id``) its messages. A client reports "read up to message X"
+once, instead of one event per message, and ``advance()``:
+
+* returns without writing if X is not past the participant's watermark, so
+  repeated or out of order acks cost a single primary key lookup;
+* clamps X to the newest message of the inquiry, so an id from another
+  inquiry or one not written yet cannot push the watermark past messages
+  still to come;
+* otherwise raises the watermark and updates the status of every message in
+  the new range with one UPDATE (the per-message status, delivered_at and
+  read_at columns stay correct for the existing views), and commits once.
+
+Only the inquiry's student and the admins of its office may acknowledge its
+messages (``is_participant()``).
+
+``broadcast()`` then sends a single ``message_status_update`` covering the
+whole range to the inquiry room and the senders' personal rooms.
+"""
+
+from datetime import datetime
+from sqlalchemy import update
+from app.extensions import db, socketio
+from app.models import InquiryMessage, InquiryReadState
+from app.services.counters import raise_to
+from app.services.chat_payloads import inquiry_route, sender_profile
+
+DELIVERED = 'delivered'
+READ = 'read'
+
+# Message statuses a receipt moves forward from
+_EARLIER_STATUSES = {
+    DELIVERED: ('sending', 'sent'),
+    READ: ('sending', 'sent', 'delivered'),
+}
+
+
+def is_participant(inquiry_id, user_id):
+    """Whether the user is the inquiry's student or an admin of its office (cached lookups)"""
+    route = inquiry_route(inquiry_id)
+    user = sender_profile(user_id)
+    if route is None or user is None:
+        return False
+    if user['role'] == 'student':
+        return route['student_user_id'] == user['id']
+    return user['role'] == 'office_admin' and user['office_id'] == route['office_id']
+
+
+def advance(inquiry_id, user_id, status, up_to_id, commit=True):
+    """
+    Record that ``user_id`` has received or read every message of the inquiry up to ``up_to_id``.
+
+    Args:
+        status: DELIVERED or READ (read implies delivered)
+        commit: Commit the change; callers recording several receipts in one
+            transaction pass False and commit themselves
+
+    Returns:
+        dict: The ``message_status_update`` payload, with 'sender_ids' of the
+        messages that changed, or None if nothing moved
+    """
+    state = db.session.get(InquiryReadState, (inquiry_id, user_id))
+    watermark = 0
+    if state is not None:
+        watermark = state.read_up_to_id if status == READ else state.delivered_up_to_id
+    if up_to_id <= watermark:
+        return None
+
+    # Never move past the newest message of this inquiry
+    newest = db.session.query(db.func.max(InquiryMessage.id)).filter(
+        InquiryMessage.inquiry_id == inquiry_id
+    ).scalar() or 0
+    up_to_id = min(up_to_id, newest)
+    if up_to_id <= watermark:
+        return None
+
+    now = datetime.utcnow()
+    values = {'status': status, 'delivered_at': db.func.coalesce(InquiryMessage.delivered_at, now)}
+    if status == READ:
+        values['read_at'] = now
+
+    # Messages the participant sent themselves are not theirs to acknowledge
+    changed = db.session.execute(
+        update(InquiryMessage).where(
+            InquiryMessage.inquiry_id == inquiry_id,
+            InquiryMessage.id > watermark,
+            InquiryMessage.id <= up_to_id,
+            InquiryMessage.sender_id != user_id,
+            InquiryMessage.status.in_(_EARLIER_STATUSES[status])
+        ).values(**values).returning(InquiryMessage.sender_id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+
+    marks = {'read_up_to_id': up_to_id, 'delivered_up_to_id': up_to_id} if status == READ else {'delivered_up_to_id': up_to_id}
+    raise_to(db.session.connection(), InquiryReadState.__table__,
+             {'inquiry_id': inquiry_id, 'user_id': user_id}, {**marks, 'updated_at': now})
+    if commit:
+        db.session.commit()
+
+    if not changed:
+        return None
+    return {
+        'inquiry_id': inquiry_id,
+        'message_id': up_to_id,
+        'from_message_id': watermark + 1,
+        'up_to_id': up_to_id,
+        'status': status,
+        'user_id': user_id,
+        'timestamp': now.strftime('%Y-%m-%d %H:%M:%S'),
+        'sender_ids': sorted(set(changed))
+    }
+
+
+def broadcast(update_payload):
+    """Send one message_status_update for a range to the inquiry room and the senders' rooms"""
+    rooms = [f"inquiry_{update_payload['inquiry_id']}"]
+    rooms += [f'user_{sender_id}' for sender_id in update_payload['sender_ids']]
+    socketio.emit('message_status_update', update_payload, to=rooms)
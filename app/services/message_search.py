@@ -0,0 +1,278 @@
+"""
+Full-text search over inquiry conversations for office staff.
+
+A search matches the words of the query against message bodies
+(``InquiryMessage.content``) and inquiry subjects, within one office. Hits
+are ranked by relevance divided by an age factor, so a hit
+MESSAGE_SEARCH_RECENCY_DAYS (default 30) old counts half as much as an
+equally relevant one from today. The indexes:
+
+* PostgreSQL: GIN expression indexes on ``to_tsvector('english', ...)``
+  (schema.txt, or ``flask build-message-search-index`` on existing
+  databases). The query is parsed with ``websearch_to_tsquery``, so quoted
+  phrases, ``or`` and ``-word`` work; ranking uses ``ts_rank``.
+* SQLite (local and test runs): FTS5 tables with the porter tokenizer, kept
+  in sync by triggers and created by the same command; ranking uses bm25.
+  Searches only check that the tables exist and never run DDL.
+
+Both keep themselves current as messages are inserted. Other databases,
+and SQLite until the command has run, fall back to ILIKE on the whole query.
+
+A page is ranked first and only its hits are then highlighted, so the
+snippets of rows that do not make the page are never computed.
+"""
+
+import html
+import re
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import Float, DateTime, Integer, column, func, literal, literal_column, select, text, union_all
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+from app.models import Inquiry, InquiryMessage
+from app.services.log_search import create_fts_table, fts_tables_exist
+
+DEFAULT_RECENCY_DAYS = 30
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+SNIPPET_WORDS = 16
+
+MESSAGE = 'message'
+SUBJECT = 'subject'
+
+# Table -> text column searched
+SEARCH_COLUMNS = {
+    'inquiry_messages': 'content',
+    'inquiries': 'subject',
+}
+
+# Highlight markers; the snippet is HTML escaped and they become <mark> tags
+_START, _STOP = '\x02', '\x03'
+
+_TS_CONFIG = literal_column("'english'::regconfig")
+_HEADLINE_OPTIONS = f"StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS * 2}, MinWords={SNIPPET_WORDS}"
+
+# Database URLs whose FTS5 tables are known to exist
+_fts_state = {}
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def ensure_search_indexes():
+    """
+    Create the message search indexes for the current database (``flask build-message-search-index``).
+
+    Returns:
+        bool: Whether indexed search is available
+    """
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        with db.engine.begin() as connection:
+            for table, name in SEARCH_COLUMNS.items():
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_{name}_fts ON {table} "
+                    f"USING gin (to_tsvector('english', {name}))"
+                ))
+        return True
+
+    if dialect != 'sqlite':
+        return False
+
+    url = str(db.engine.url)
+    try:
+        with db.engine.begin() as connection:
+            for table, name in SEARCH_COLUMNS.items():
+                create_fts_table(connection, table, (name,), tokenize='porter unicode61')
+        _fts_state[url] = True
+    except OperationalError:
+        # SQLite built without FTS5
+        _fts_state[url] = False
+    return _fts_state[url]
+
+
+def _fts_available():
+    """Whether the FTS5 tables exist (read-only check; only a positive answer is remembered)"""
+    url = str(db.engine.url)
+    if not _fts_state.get(url):
+        _fts_state[url] = fts_tables_exist(db.session, SEARCH_COLUMNS)
+    return _fts_state[url]
+
+
+def _fts_query(term):
+    """FTS5 MATCH expression requiring every word of ``term``, the last one as a prefix"""
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    phrases = ['"' + word + '"' for word in words]
+    phrases[-1] += '*'
+    return ' '.join(phrases)
+
+
+def _age_in_days(created_at, now):
+    """Days since ``created_at``, never negative"""
+    if _dialect() == 'postgresql':
+        return func.greatest(func.extract('epoch', literal(now, DateTime) - created_at) / 86400.0, 0)
+    return func.max(func.julianday(literal(now, DateTime)) - func.julianday(created_at), 0)
+
+
+def _ranked(relevance, created_at, now):
+    recency_days = current_app.config.get('MESSAGE_SEARCH_RECENCY_DAYS', DEFAULT_RECENCY_DAYS)
+    return relevance / (1.0 + _age_in_days(created_at, now) / recency_days)
+
+
+def _candidates(office_id, term, mode, now):
+    """Message and subject hits of one office as (kind, id, inquiry_id, subject, created_at, score) selects"""
+    if mode == 'postgresql':
+        query = func.websearch_to_tsquery(_TS_CONFIG, term)
+        message_document = func.to_tsvector(_TS_CONFIG, InquiryMessage.content)
+        subject_document = func.to_tsvector(_TS_CONFIG, Inquiry.subject)
+        message_relevance = func.ts_rank(message_document, query)
+        subject_relevance = func.ts_rank(subject_document, query)
+        message_match = message_document.op('@@')(query)
+        subject_match = subject_document.op('@@')(query)
+        message_from, subject_from = InquiryMessage, Inquiry
+    elif mode == 'sqlite':
+        match = _fts_query(term)
+        message_hits = text(
+            "SELECT rowid AS id, -bm25(inquiry_messages_fts) AS relevance "
+            "FROM inquiry_messages_fts WHERE inquiry_messages_fts MATCH :message_match"
+        ).bindparams(message_match=match).columns(column('id', Integer), column('relevance', Float)).subquery()
+        subject_hits = text(
+            "SELECT rowid AS id, -bm25(inquiries_fts) AS relevance "
+            "FROM inquiries_fts WHERE inquiries_fts MATCH :subject_match"
+        ).bindparams(subject_match=match).columns(column('id', Integer), column('relevance', Float)).subquery()
+        message_relevance, subject_relevance = message_hits.c.relevance, subject_hits.c.relevance
+        message_match = subject_match = None
+        message_from = message_hits.join(InquiryMessage, InquiryMessage.id == message_hits.c.id)
+        subject_from = subject_hits.join(Inquiry, Inquiry.id == subject_hits.c.id)
+    else:
+        pattern = f"%{term}%"
+        message_relevance = subject_relevance = literal(1.0)
+        message_match = InquiryMessage.content.ilike(pattern)
+        subject_match = Inquiry.subject.ilike(pattern)
+        message_from, subject_from = InquiryMessage, Inquiry
+
+    messages = select(
+        literal(MESSAGE).label('kind'),
+        InquiryMessage.id.label('id'),
+        Inquiry.id.label('inquiry_id'),
+        Inquiry.subject.label('subject'),
+        InquiryMessage.created_at.label('created_at'),
+        _ranked(message_relevance, InquiryMessage.created_at, now).label('score')
+    ).select_from(message_from).join(Inquiry, Inquiry.id == InquiryMessage.inquiry_id).where(
+        Inquiry.office_id == office_id
+    )
+    subjects = select(
+        literal(SUBJECT).label('kind'),
+        Inquiry.id.label('id'),
+        Inquiry.id.label('inquiry_id'),
+        Inquiry.subject.label('subject'),
+        Inquiry.created_at.label('created_at'),
+        _ranked(subject_relevance, Inquiry.created_at, now).label('score')
+    ).select_from(subject_from).where(Inquiry.office_id == office_id)
+
+    if message_match is not None:
+        messages = messages.where(message_match)
+        subjects = subjects.where(subject_match)
+    return messages, subjects
+
+
+def _highlights(kind, ids, term, mode):
+    """Snippet with \\x02/\\x03 around the matches for each hit id of one kind"""
+    if not ids:
+        return {}
+    model, name = (InquiryMessage, 'content') if kind == MESSAGE else (Inquiry, 'subject')
+    table = model.__tablename__
+
+    if mode == 'postgresql':
+        rows = db.session.execute(select(
+            model.id,
+            func.ts_headline(_TS_CONFIG, getattr(model, name), func.websearch_to_tsquery(_TS_CONFIG, term),
+                             _HEADLINE_OPTIONS)
+        ).where(model.id.in_(ids)))
+        return dict(rows.all())
+
+    if mode == 'sqlite':
+        # snippet() only works in the context of a MATCH on the FTS table
+        placeholders = ', '.join(f":id_{index}" for index in range(len(ids)))
+        rows = db.session.execute(text(
+            f"SELECT rowid, snippet({table}_fts, 0, :start, :stop, '…', {SNIPPET_WORDS}) "
+            f"FROM {table}_fts WHERE {table}_fts MATCH :match AND rowid IN ({placeholders})"
+        ), {'start': _START, 'stop': _STOP, 'match': _fts_query(term),
+            **{f"id_{index}": row_id for index, row_id in enumerate(ids)}})
+        return dict(rows.all())
+
+    rows = db.session.execute(select(model.id, getattr(model, name)).where(model.id.in_(ids)))
+    return {row_id: _excerpt(value, term) for row_id, value in rows}
+
+
+def _excerpt(value, term):
+    """Plain-text snippet around the first occurrence of ``term`` (ILIKE fallback)"""
+    position = value.lower().find(term.lower())
+    if position < 0:
+        return value[:SNIPPET_WORDS * 8]
+    start = max(0, position - SNIPPET_WORDS * 4)
+    end = position + len(term)
+    excerpt = value[start:position] + _START + value[position:end] + _STOP + value[end:end + SNIPPET_WORDS * 4]
+    return ('…' if start else '') + excerpt + ('…' if end + SNIPPET_WORDS * 4 < len(value) else '')
+
+
+def _snippet_html(snippet):
+    """HTML escape a snippet and turn the highlight markers into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def search_messages(office_id, term, page=1, per_page=DEFAULT_PAGE_SIZE, now=None):
+    """
+    Search the messages and subjects of one office's inquiries.
+
+    Args:
+        office_id: Office whose inquiries are searched
+        term: The search text
+        page: 1-based page of the ranked hits
+        per_page: Hits per page (at most MAX_PAGE_SIZE)
+
+    Returns:
+        dict: 'results' (best first), each with 'inquiry_id', 'message_id'
+        (None for a subject hit), 'matched' ('message' or 'subject'),
+        'subject', 'snippet' (HTML with <mark> around the matches) and
+        'created_at'; and 'has_more'
+    """
+    term = (term or '').strip()
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    page = max(1, page)
+    now = now or datetime.utcnow()
+
+    mode = _dialect()
+    if mode == 'sqlite' and not _fts_available():
+        mode = None
+    if not term or (mode == 'sqlite' and _fts_query(term) is None):
+        return {'results': [], 'has_more': False}
+
+    hits = union_all(*_candidates(office_id, term, mode, now)).subquery()
+    rows = db.session.execute(
+        select(hits).order_by(hits.c.score.desc(), hits.c.created_at.desc(), hits.c.id.desc())
+        .limit(per_page + 1).offset((page - 1) * per_page)
+    ).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    snippets = {
+        kind: _highlights(kind, [row.id for row in rows if row.kind == kind], term, mode)
+        for kind in (MESSAGE, SUBJECT)
+    }
+
+    return {
+        'results': [{
+            'inquiry_id': row.inquiry_id,
+            'message_id': row.id if row.kind == MESSAGE else None,
+            'matched': row.kind,
+            'subject': row.subject,
+            'snippet': _snippet_html(snippets[row.kind].get(row.id)),
+            'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S') if row.created_at else None
+        } for row in rows],
+        'has_more': has_more
+    }
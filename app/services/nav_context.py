@@ -0,0 +1,159 @@
+"""
+Cached navbar/sidebar badge context for blueprint base templates.
+
+Badge counts and the notification dropdown are rendered on every page, so
+they are memoized per request and cached per (user, office) for office
+admins and per user for students, for NAV_CONTEXT_TTL seconds (default 5). Mapper listeners drop the affected
+entries whenever a notification, inquiry or counseling session is written,
+so a user's own actions show up on the next page load.
+"""
+
+from datetime import datetime
+from flask import g, current_app
+from sqlalchemy import desc, event, inspect
+from sqlalchemy.orm import joinedload
+from app.models import Notification, Inquiry, CounselingSession
+from app.services.cache import TTLCache
+
+DEFAULT_TTL = 5  # seconds
+
+office_context_cache = TTLCache(ttl=DEFAULT_TTL)
+student_context_cache = TTLCache(ttl=DEFAULT_TTL)
+
+
+def _ttl():
+    return current_app.config.get('NAV_CONTEXT_TTL', DEFAULT_TTL)
+
+
+def notification_snapshot(notification):
+    """Copy a notification's columns into a dict that is safe to keep across requests"""
+    snapshot = {column.name: getattr(notification, column.name) for column in Notification.__table__.columns}
+    source_office = notification.source_office
+    snapshot['source_office'] = {'id': source_office.id, 'name': source_office.name} if source_office else None
+    return snapshot
+
+
+def _notification_badges(user_id):
+    """Unread count and the five most recent notifications for the dropdown"""
+    # Get unread notifications count
+    unread_notifications_count = Notification.query.filter_by(
+        user_id=user_id,
+        is_read=False
+    ).count()
+
+    # Get recent notifications for dropdown
+    notifications = Notification.query.options(
+        joinedload(Notification.source_office)
+    ).filter_by(
+        user_id=user_id
+    ).order_by(desc(Notification.created_at)).limit(5).all()
+
+    return {
+        'unread_notifications_count': unread_notifications_count,
+        'notifications': [notification_snapshot(n) for n in notifications]
+    }
+
+
+def build_office_context(user_id, office_id):
+    """Run the badge queries for an office admin"""
+    now = datetime.utcnow()
+    context = _notification_badges(user_id)
+
+    # Get count of pending inquiries
+    pending_inquiries_count = Inquiry.query.filter_by(
+        office_id=office_id,
+        status='pending'
+    ).count()
+
+    # Get count of upcoming sessions
+    upcoming_sessions_count = CounselingSession.query.filter(
+        CounselingSession.office_id == office_id,
+        CounselingSession.status.in_(['pending', 'confirmed']),
+        CounselingSession.scheduled_at > now
+    ).count()
+
+    # The dashboard has always counted scheduled/confirmed sessions from now on
+    dashboard_upcoming_sessions_count = CounselingSession.query.filter(
+        CounselingSession.office_id == office_id,
+        CounselingSession.scheduled_at >= now,
+        CounselingSession.status.in_(['scheduled', 'confirmed'])
+    ).count()
+
+    context.update({
+        'pending_inquiries_count': pending_inquiries_count,
+        'upcoming_sessions_count': upcoming_sessions_count,
+        'dashboard_upcoming_sessions_count': dashboard_upcoming_sessions_count
+    })
+    return context
+
+
+def office_context(user_id, office_id):
+    """
+    Get the badge context for an office admin, memoized for the request.
+
+    Returns:
+        dict: A fresh copy each call, so callers may update() it
+    """
+    key = (user_id, office_id)
+    memo = g.setdefault('_office_nav_context', {})
+    if key not in memo:
+        memo[key] = office_context_cache.get_or_set(
+            key, lambda: build_office_context(user_id, office_id), ttl=_ttl()
+        )
+    return dict(memo[key])
+
+
+def student_context(user_id):
+    """
+    Get the navbar notification context for a student, memoized for the request.
+
+    Returns:
+        dict: unread_notifications_count and notifications, a fresh copy each call
+    """
+    memo = g.setdefault('_student_nav_context', {})
+    if user_id not in memo:
+        memo[user_id] = student_context_cache.get_or_set(
+            user_id, lambda: _notification_badges(user_id), ttl=_ttl()
+        )
+    return dict(memo[user_id])
+
+
+def invalidate_user(user_id):
+    """Drop cached context for one user (e.g. after a notification change)"""
+    office_context_cache.invalidate_where(lambda key: key[0] == user_id)
+    student_context_cache.invalidate(user_id)
+
+
+def invalidate_office(office_id):
+    """Drop cached context for every admin of an office"""
+    office_context_cache.invalidate_where(lambda key: key[1] == office_id)
+
+
+def _office_ids(target):
+    """Current and previous office ids of an inquiry or session being flushed"""
+    history = inspect(target).attrs['office_id'].history
+    return {office_id for office_id in [target.office_id, *(history.deleted or ())] if office_id is not None}
+
+
+def _on_notification_write(mapper, connection, target):
+    invalidate_user(target.user_id)
+
+
+def _on_office_item_write(mapper, connection, target):
+    for office_id in _office_ids(target):
+        invalidate_office(office_id)
+
+
+LISTENERS = (
+    (Notification, _on_notification_write),
+    (Inquiry, _on_office_item_write),
+    (CounselingSession, _on_office_item_write),
+)
+
+
+def register_listeners():
+    """Attach the invalidation listeners to the mappers (safe to call more than once)"""
+    for model, listener in LISTENERS:
+        for identifier in ('after_insert', 'after_update', 'after_delete'):
+            if not event.contains(model, identifier, listener):
+                event.listen(model, identifier, listener)
@@ -0,0 +1,236 @@
+"""
+Per-office KPI snapshot (office_kpis).
+
+One row per office holding the response rate, median first-response time,
+students served in the last 30 days and the 30 days before, and open and
+resolved inquiry counts. Views read a single row by office_id instead of
+joining every message of every inquiry on each page load.
+
+On PostgreSQL ``office_kpis`` is a materialized view refreshed with
+``REFRESH MATERIALIZED VIEW CONCURRENTLY``. Other databases get a plain
+table that is rewritten from the same query. Either way the refresh runs
+in the background from the APScheduler job in office_counseling.py, or by
+hand with ``flask refresh-office-kpis``; both create the snapshot on first
+use. Page requests only read it: until the first refresh has built it they
+get zeroed KPIs.
+"""
+
+import statistics
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, Float, DateTime,
+    select, func, case, cast, extract, literal, literal_column, union_all, text
+)
+from app.extensions import db
+from app.models import Office, Inquiry, InquiryMessage, User, CounselingSession
+
+# Kept out of db.metadata so db.create_all() never creates a table where
+# PostgreSQL expects the materialized view
+_metadata = MetaData()
+
+office_kpis = Table(
+    'office_kpis', _metadata,
+    Column('office_id', Integer, primary_key=True),
+    Column('response_rate', Integer, nullable=False, default=0),  # % of inquiries with an office reply
+    Column('median_first_response_minutes', Float),
+    Column('students_served_30d', Integer, nullable=False, default=0),
+    Column('students_served_prev_30d', Integer, nullable=False, default=0),
+    Column('open_inquiries', Integer, nullable=False, default=0),
+    Column('resolved_inquiries', Integer, nullable=False, default=0),
+    Column('refreshed_at', DateTime)
+)
+
+EMPTY_KPIS = {
+    'response_rate': 0,
+    'median_first_response_minutes': None,
+    'students_served_30d': 0,
+    'students_served_prev_30d': 0,
+    'open_inquiries': 0,
+    'resolved_inquiries': 0,
+    'refreshed_at': None
+}
+
+
+# Database URLs whose office_kpis snapshot is known to exist
+_snapshot_state = {}
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _snapshot_exists():
+    """Whether office_kpis has been built (read-only check; only a positive answer is remembered)"""
+    url = str(db.engine.url)
+    if not _snapshot_state.get(url):
+        if _is_postgres():
+            found = db.session.execute(text("SELECT to_regclass('office_kpis') IS NOT NULL")).scalar()
+        else:
+            found = db.session.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'office_kpis'"
+            )).scalar() > 0
+        _snapshot_state[url] = bool(found)
+    return _snapshot_state[url]
+
+
+def _first_replies():
+    """Earliest office admin reply per inquiry"""
+    return select(
+        InquiryMessage.inquiry_id.label('inquiry_id'),
+        func.min(InquiryMessage.created_at).label('first_reply_at')
+    ).join(
+        User, InquiryMessage.sender_id == User.id
+    ).where(
+        User.role == 'office_admin'
+    ).group_by(InquiryMessage.inquiry_id).subquery('first_replies')
+
+
+def _kpi_select(now, month_ago, two_months_ago, with_median):
+    """
+    Build the office_kpis query.
+
+    For the materialized view the time bounds are SQL expressions, so every
+    refresh uses the current time; the table fallback passes fixed values.
+    """
+    first_replies = _first_replies()
+    response_minutes = (
+        extract('epoch', first_replies.c.first_reply_at) - extract('epoch', Inquiry.created_at)
+    ) / 60
+
+    median = literal(None, Float)
+    if with_median:
+        median = func.percentile_cont(0.5).within_group(response_minutes)
+
+    inquiries = select(
+        Inquiry.office_id.label('office_id'),
+        func.count(Inquiry.id).label('total'),
+        func.count(first_replies.c.first_reply_at).label('responded'),
+        func.sum(case((Inquiry.status.in_(['pending', 'in_progress']), 1), else_=0)).label('open_count'),
+        func.sum(case((Inquiry.status == 'resolved', 1), else_=0)).label('resolved_count'),
+        median.label('median_minutes')
+    ).select_from(Inquiry).outerjoin(
+        first_replies, first_replies.c.inquiry_id == Inquiry.id
+    ).group_by(Inquiry.office_id).subquery('inquiry_stats')
+
+    # A student is served by a resolved inquiry or a completed session; count each student once
+    served_events = union_all(
+        select(
+            Inquiry.office_id.label('office_id'),
+            Inquiry.student_id.label('student_id'),
+            Inquiry.created_at.label('served_at')
+        ).where(Inquiry.status == 'resolved', Inquiry.created_at > two_months_ago),
+        select(
+            CounselingSession.office_id,
+            CounselingSession.student_id,
+            CounselingSession.scheduled_at
+        ).where(CounselingSession.status == 'completed', CounselingSession.scheduled_at > two_months_ago)
+    ).subquery('served_events')
+
+    served = select(
+        served_events.c.office_id,
+        func.count(func.distinct(case(
+            (served_events.c.served_at > month_ago, served_events.c.student_id)
+        ))).label('served_current'),
+        func.count(func.distinct(case(
+            (served_events.c.served_at <= month_ago, served_events.c.student_id)
+        ))).label('served_previous')
+    ).group_by(served_events.c.office_id).subquery('served')
+
+    total = func.coalesce(inquiries.c.total, 0)
+    return select(
+        Office.id.label('office_id'),
+        cast(case(
+            (total > 0, func.round(100.0 * inquiries.c.responded / total)),
+            else_=0
+        ), Integer).label('response_rate'),
+        inquiries.c.median_minutes.label('median_first_response_minutes'),
+        func.coalesce(served.c.served_current, 0).label('students_served_30d'),
+        func.coalesce(served.c.served_previous, 0).label('students_served_prev_30d'),
+        func.coalesce(inquiries.c.open_count, 0).label('open_inquiries'),
+        func.coalesce(inquiries.c.resolved_count, 0).label('resolved_inquiries'),
+        now.label('refreshed_at')
+    ).select_from(Office).outerjoin(
+        inquiries, inquiries.c.office_id == Office.id
+    ).outerjoin(
+        served, served.c.office_id == Office.id
+    )
+
+
+def _median_response_times():
+    """Median first-response minutes per office, computed in Python for non-Postgres databases"""
+    first_replies = _first_replies()
+    rows = db.session.query(
+        Inquiry.office_id,
+        (extract('epoch', first_replies.c.first_reply_at) - extract('epoch', Inquiry.created_at)) / 60
+    ).join(
+        first_replies, first_replies.c.inquiry_id == Inquiry.id
+    ).all()
+
+    minutes_by_office = {}
+    for office_id, minutes in rows:
+        minutes_by_office.setdefault(office_id, []).append(float(minutes))
+    return {office_id: statistics.median(values) for office_id, values in minutes_by_office.items()}
+
+
+def _create_materialized_view():
+    """Create the office_kpis materialized view and the unique index CONCURRENTLY refresh needs"""
+    now = literal_column("timezone('utc', now())")
+    month_ago = literal_column("(timezone('utc', now()) - interval '30 days')")
+    two_months_ago = literal_column("(timezone('utc', now()) - interval '60 days')")
+    query = _kpi_select(now, month_ago, two_months_ago, with_median=True)
+    sql = str(query.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+    db.session.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS office_kpis AS {sql}"))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_office_kpis_office_id ON office_kpis(office_id)"
+    ))
+    db.session.commit()
+
+
+def refresh():
+    """Recompute office_kpis for every office"""
+    if _is_postgres():
+        _create_materialized_view()
+        db.session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY office_kpis"))
+        db.session.commit()
+        return
+
+    # Plain table fallback: rewrite every row inside one transaction
+    _metadata.create_all(bind=db.engine, tables=[office_kpis])
+    now = datetime.utcnow()
+    query = _kpi_select(
+        literal(now, DateTime), now - timedelta(days=30), now - timedelta(days=60), with_median=False
+    )
+    rows = [dict(row._mapping) for row in db.session.execute(query)]
+
+    medians = _median_response_times()
+    for row in rows:
+        row['median_first_response_minutes'] = medians.get(row['office_id'])
+
+    db.session.execute(office_kpis.delete())
+    if rows:
+        db.session.execute(office_kpis.insert(), rows)
+    db.session.commit()
+
+
+def get_office_kpis(office_id):
+    """
+    Get the KPI row for one office.
+
+    Never builds or refreshes the snapshot: until the scheduler job (or
+    ``flask refresh-office-kpis``) has built it, and for offices created
+    after the last refresh, the KPIs are zeroed.
+
+    Returns:
+        dict: The office_kpis columns, without office_id
+    """
+    if not _snapshot_exists():
+        return dict(EMPTY_KPIS)
+
+    row = db.session.execute(select(office_kpis).where(office_kpis.c.office_id == office_id)).first()
+    if row is None:
+        return dict(EMPTY_KPIS)
+
+    kpis = dict(row._mapping)
+    kpis.pop('office_id')
+    return kpis
@@ -0,0 +1,206 @@
+"""
+Per-staff activity metrics for the office team dashboard.
+
+All figures for every staff member of an office are computed with a fixed
+number of grouped queries (one per data source) instead of a set of queries
+per person, so the cost of a page view does not grow with the team size.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import func, case, extract
+from sqlalchemy.orm import contains_eager
+from app.extensions import db
+from app.models import User, OfficeAdmin, Inquiry, InquiryMessage, CounselingSession, OfficeLoginLog
+
+# A staff member counts as online if they were active this recently
+ONLINE_WINDOW = timedelta(minutes=15)
+
+
+def workload_level(active_items):
+    """Map the number of open inquiries and upcoming sessions to a workload label"""
+    if active_items < 3:
+        return "low"
+    if active_items < 7:
+        return "medium"
+    return "high"
+
+
+class StaffMetrics:
+    """
+    Compute team dashboard metrics for all staff of one office.
+
+    Usage:
+        metrics = StaffMetrics(office_id)
+        for row in metrics.staff_data():
+            ...
+    """
+
+    def __init__(self, office_id, now=None):
+        self.office_id = office_id
+        self.now = now or datetime.utcnow()
+        self.one_month_ago = self.now - timedelta(days=30)
+        self.today_start = datetime.combine(self.now.date(), datetime.min.time())
+
+    def staff_members(self):
+        """Get all office admin users assigned to the office"""
+        return User.query.join(OfficeAdmin).options(
+            contains_eager(User.office_admin)
+        ).filter(
+            OfficeAdmin.office_id == self.office_id,
+            User.role == 'office_admin'
+        ).all()
+
+    def _inquiry_counts(self, staff_ids):
+        """Inquiries handled/resolved/pending per staff member (any message sent counts as handling)"""
+        rows = db.session.query(
+            InquiryMessage.sender_id,
+            func.count(func.distinct(Inquiry.id)),
+            func.count(func.distinct(case((Inquiry.status == 'resolved', Inquiry.id)))),
+            func.count(func.distinct(case((Inquiry.status.in_(['pending', 'in_progress']), Inquiry.id))))
+        ).join(
+            Inquiry, InquiryMessage.inquiry_id == Inquiry.id
+        ).filter(
+            Inquiry.office_id == self.office_id,
+            InquiryMessage.sender_id.in_(staff_ids)
+        ).group_by(InquiryMessage.sender_id).all()
+
+        return {
+            sender_id: {'handled': handled, 'resolved': resolved, 'pending': pending}
+            for sender_id, handled, resolved, pending in rows
+        }
+
+    def _response_times(self, staff_ids):
+        """Average minutes from inquiry creation to each staff member's first reply"""
+        # Rank each staff member's messages per inquiry so only the first reply is used
+        ranked = db.session.query(
+            InquiryMessage.sender_id.label('sender_id'),
+            InquiryMessage.created_at.label('replied_at'),
+            Inquiry.created_at.label('asked_at'),
+            func.row_number().over(
+                partition_by=(InquiryMessage.inquiry_id, InquiryMessage.sender_id),
+                order_by=(InquiryMessage.created_at, InquiryMessage.id)
+            ).label('position')
+        ).join(
+            Inquiry, InquiryMessage.inquiry_id == Inquiry.id
+        ).filter(
+            Inquiry.office_id == self.office_id,
+            InquiryMessage.sender_id.in_(staff_ids)
+        ).subquery()
+
+        seconds = extract('epoch', ranked.c.replied_at) - extract('epoch', ranked.c.asked_at)
+        rows = db.session.query(
+            ranked.c.sender_id,
+            func.avg(seconds) / 60
+        ).filter(
+            ranked.c.position == 1
+        ).group_by(ranked.c.sender_id).all()
+
+        return {sender_id: int(minutes) if minutes else 0 for sender_id, minutes in rows}
+
+    def _session_counts(self, staff_ids):
+        """Completed, upcoming, today's and last-30-day session counts per counselor"""
+        tomorrow_start = self.today_start + timedelta(days=1)
+        rows = db.session.query(
+            CounselingSession.counselor_id,
+            func.sum(case((CounselingSession.status == 'completed', 1), else_=0)),
+            func.sum(case((
+                CounselingSession.status.in_(['pending', 'confirmed']) &
+                (CounselingSession.scheduled_at > self.now), 1), else_=0)),
+            func.sum(case((
+                (CounselingSession.scheduled_at >= self.today_start) &
+                (CounselingSession.scheduled_at < tomorrow_start), 1), else_=0)),
+            func.sum(case((CounselingSession.scheduled_at > self.one_month_ago, 1), else_=0))
+        ).filter(
+            CounselingSession.office_id == self.office_id,
+            CounselingSession.counselor_id.in_(staff_ids)
+        ).group_by(CounselingSession.counselor_id).all()
+
+        return {
+            counselor_id: {
+                'completed': int(completed or 0),
+                'upcoming': int(upcoming or 0),
+                'today': int(today or 0),
+                'monthly': int(monthly or 0)
+            }
+            for counselor_id, completed, upcoming, today, monthly in rows
+        }
+
+    def _monthly_messages(self, staff_ids):
+        """Messages sent by each staff member in the last 30 days"""
+        rows = db.session.query(
+            InquiryMessage.sender_id,
+            func.count(InquiryMessage.id)
+        ).filter(
+            InquiryMessage.sender_id.in_(staff_ids),
+            InquiryMessage.created_at > self.one_month_ago
+        ).group_by(InquiryMessage.sender_id).all()
+        return dict(rows)
+
+    def _last_logins(self, office_admin_ids):
+        """Latest login time per office admin record"""
+        rows = db.session.query(
+            OfficeLoginLog.office_admin_id,
+            func.max(OfficeLoginLog.login_time)
+        ).filter(
+            OfficeLoginLog.office_admin_id.in_(office_admin_ids)
+        ).group_by(OfficeLoginLog.office_admin_id).all()
+        return dict(rows)
+
+    def is_online(self, staff):
+        """Check whether a staff member is flagged online and was recently active"""
+        return bool(
+            staff.is_online and staff.last_activity and
+            staff.last_activity > self.now - ONLINE_WINDOW
+        )
+
+    def staff_data(self, staff_members=None):
+        """
+        Build the per-staff metrics for the team dashboard.
+
+        Args:
+            staff_members: Users to report on, defaults to all staff of the office
+
+        Returns:
+            list: One dict per staff member, online staff first
+        """
+        if staff_members is None:
+            staff_members = self.staff_members()
+        if not staff_members:
+            return []
+
+        staff_ids = [staff.id for staff in staff_members]
+        office_admin_ids = [staff.office_admin.id for staff in staff_members if staff.office_admin]
+
+        inquiry_counts = self._inquiry_counts(staff_ids)
+        response_times = self._response_times(staff_ids)
+        session_counts = self._session_counts(staff_ids)
+        monthly_messages = self._monthly_messages(staff_ids)
+        last_logins = self._last_logins(office_admin_ids) if office_admin_ids else {}
+
+        no_inquiries = {'handled': 0, 'resolved': 0, 'pending': 0}
+        no_sessions = {'completed': 0, 'upcoming': 0, 'today': 0, 'monthly': 0}
+
+        staff_data = []
+        for staff in staff_members:
+            inquiries = inquiry_counts.get(staff.id, no_inquiries)
+            sessions = session_counts.get(staff.id, no_sessions)
+
+            staff_data.append({
+                'user': staff,
+                'inquiries_handled': inquiries['handled'],
+                'inquiries_resolved': inquiries['resolved'],
+                'inquiries_pending': inquiries['pending'],
+                'sessions_count': sessions['completed'],
+                'upcoming_sessions': sessions['upcoming'],
+                'todays_sessions': sessions['today'],
+                'total_activity': inquiries['handled'] + sessions['completed'],
+                'monthly_activity': monthly_messages.get(staff.id, 0) + sessions['monthly'],
+                'avg_response_time': response_times.get(staff.id, 0),
+                'last_login': last_logins.get(staff.office_admin.id) if staff.office_admin else None,
+                'is_online': self.is_online(staff),
+                'workload': workload_level(inquiries['pending'] + sessions['upcoming'])
+            })
+
+        # Online staff first
+        staff_data.sort(key=lambda x: x['is_online'], reverse=True)
+        return staff_data
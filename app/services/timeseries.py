@@ -0,0 +1,280 @@
+"""
+Time-series aggregation helpers for dashboard charts and stat cards.
+
+Counts are computed with one grouped query per series over a plain
+``column >= start AND column < end`` range, so the ``created_at`` style
+indexes can be used. Rows are grouped per calendar day in SQL and folded
+into day/week/month buckets in Python, which keeps the query portable
+between PostgreSQL and SQLite.
+
+``compare_periods`` counts two date windows side by side with conditional
+aggregation (``SUM(CASE ...)``) for week-over-week style stat cards.
+"""
+
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, case, and_, true
+from app.extensions import db
+
+BUCKET_SIZES = ('day', 'week', 'month')
+
+
+def floor_to_bucket(value, bucket):
+    """Return the start of the bucket that contains ``value``"""
+    day_start = datetime(value.year, value.month, value.day)
+    if bucket == 'day':
+        return day_start
+    if bucket == 'week':
+        # Weeks start on Monday, matching Python's weekday()
+        return day_start - timedelta(days=day_start.weekday())
+    if bucket == 'month':
+        return day_start.replace(day=1)
+    raise ValueError(f"Unsupported bucket size: {bucket}")
+
+
+def next_bucket(value, bucket):
+    """Return the start of the bucket following the one starting at ``value``"""
+    if bucket == 'day':
+        return value + timedelta(days=1)
+    if bucket == 'week':
+        return value + timedelta(days=7)
+    if bucket == 'month':
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    raise ValueError(f"Unsupported bucket size: {bucket}")
+
+
+def bucket_range(start, end, bucket):
+    """List the bucket start datetimes covering the half-open range [start, end)"""
+    buckets = []
+    current = floor_to_bucket(start, bucket)
+    while current < end:
+        buckets.append(current)
+        current = next_bucket(current, bucket)
+    return buckets
+
+
+def trailing_window(count, bucket, now=None):
+    """
+    Get the (start, end) range for the last ``count`` buckets, including the current one.
+
+    Args:
+        count: Number of buckets to cover
+        bucket: 'day', 'week' or 'month'
+        now: Reference time, defaults to utcnow
+
+    Returns:
+        tuple: (start, end) where end is exclusive
+    """
+    now = now or datetime.utcnow()
+    end = next_bucket(floor_to_bucket(now, bucket), bucket)
+    start = floor_to_bucket(now, bucket)
+    for _ in range(count - 1):
+        start = floor_to_bucket(start - timedelta(days=1), bucket)
+    return start, end
+
+
+def _as_date(value):
+    """Normalize a grouped day value (date, datetime or 'YYYY-MM-DD' string) to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _column_bound(column, value, upper=False):
+    """
+    Convert a datetime bound for comparison with ``column``.
+
+    Date columns hold whole days, so an exclusive upper bound includes the
+    day it falls in unless it is exactly midnight.
+    """
+    if not isinstance(column.type, db.Date) or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if upper and value != floor_to_bucket(value, 'day'):
+        return value.date() + timedelta(days=1)
+    return value.date()
+
+
+def time_series(column, start, end, bucket='day', filters=None, series=None, weight=None):
+    """
+    Count rows per time bucket using a single grouped query.
+
+    Args:
+        column: DateTime column to bucket on (e.g. Inquiry.created_at)
+        start: Start of the range; floored to the containing bucket
+        end: Exclusive end of the range
+        bucket: 'day', 'week' or 'month'
+        filters: Optional list of extra filter expressions
+        series: Dict of series name -> boolean SQL expression. A value of
+            None counts every row in the bucket. Defaults to {'count': None}.
+        weight: Optional numeric column to sum instead of counting rows,
+            for pre-aggregated tables such as inquiry_daily_stats
+
+    Returns:
+        dict: 'buckets' holds the bucket start datetimes and every series
+        name maps to a list of counts aligned with 'buckets'
+    """
+    if bucket not in BUCKET_SIZES:
+        raise ValueError(f"Unsupported bucket size: {bucket}")
+
+    series = series or {'count': None}
+    buckets = bucket_range(start, end, bucket)
+    result = {'buckets': buckets}
+    for name in series:
+        result[name] = [0] * len(buckets)
+
+    if not buckets:
+        return result
+
+    day = func.date(column)
+    amount = 1 if weight is None else weight
+    columns = [day.label('day')]
+    for name, condition in series.items():
+        if condition is None:
+            total = func.count() if weight is None else func.sum(weight)
+        else:
+            total = func.sum(case((condition, amount), else_=0))
+        columns.append(total.label(name))
+
+    query = db.session.query(*columns).filter(
+        column >= _column_bound(column, buckets[0]),
+        column < _column_bound(column, end, upper=True)
+    )
+    if filters:
+        query = query.filter(*filters)
+
+    positions = {bucket_start: index for index, bucket_start in enumerate(buckets)}
+    for row in query.group_by(day).all():
+        row_day = _as_date(row.day)
+        bucket_start = floor_to_bucket(datetime(row_day.year, row_day.month, row_day.day), bucket)
+        index = positions.get(bucket_start)
+        if index is None:
+            continue
+        for name in series:
+            result[name][index] += int(getattr(row, name) or 0)
+
+    return result
+
+
+def inquiry_time_series(start, end, bucket='day', office_id=None):
+    """
+    New and resolved inquiry counts per bucket, read from the inquiry_daily_stats rollup.
+
+    An inquiry counts as resolved in the bucket it was created in, since the
+    model has no resolved_at timestamp. The rollup is per day, so ``start``
+    and ``end`` are effectively rounded to whole days.
+
+    Returns:
+        dict: 'buckets', 'new' and 'resolved' lists aligned by index
+    """
+    from app.models import InquiryDailyStat
+
+    filters = []
+    if office_id is not None:
+        filters.append(InquiryDailyStat.office_id == office_id)
+
+    return time_series(
+        InquiryDailyStat.day, start, end, bucket,
+        filters=filters,
+        series={
+            'new': None,
+            'resolved': InquiryDailyStat.status == 'resolved'
+        },
+        weight=InquiryDailyStat.inquiry_count
+    )
+
+
+def percent_change(current, previous, empty_change=None):
+    """
+    Percentage change from ``previous`` to ``current``.
+
+    When there is no baseline, ``empty_change`` is returned if given,
+    otherwise 100 for any growth from zero and 0 for none.
+    """
+    if previous:
+        return ((current - previous) / previous) * 100
+    if empty_change is not None:
+        return empty_change
+    return 100 if current > 0 else 0
+
+
+def compare_periods(column, current, previous, filters=None, group_by=None,
+                    weight=None, distinct=None, include_overall=False, empty_change=None):
+    """
+    Count rows in two date windows with a single conditional-aggregation query.
+
+    Args:
+        column: DateTime (or Date) column the windows apply to
+        current: (start, end) of the current window; either side may be None
+            for an open range, end is exclusive
+        previous: (start, end) of the comparison window
+        filters: Optional list of base filter expressions
+        group_by: Optional column to split the counts by (e.g. Inquiry.status)
+        weight: Optional numeric column to sum instead of counting rows
+        distinct: Optional column whose distinct values are counted instead of rows
+        include_overall: Also count every row matching the base filters,
+            regardless of the windows
+        empty_change: Change reported when the previous count is zero,
+            see percent_change()
+
+    Returns:
+        dict: 'current', 'previous' (and 'overall') map each group to a count
+        plus a 'total' key, and 'change' maps the same keys to percent change.
+        Without group_by only the 'total' key is present.
+    """
+    def window_condition(window):
+        start, end = window
+        conditions = []
+        if start is not None:
+            conditions.append(column >= _column_bound(column, start))
+        if end is not None:
+            conditions.append(column < _column_bound(column, end, upper=True))
+        return and_(*conditions) if conditions else true()
+
+    def measure(condition):
+        if distinct is not None:
+            return func.count(func.distinct(case((condition, distinct))))
+        return func.sum(case((condition, 1 if weight is None else weight), else_=0))
+
+    windows = {'current': current, 'previous': previous}
+    if include_overall:
+        windows['overall'] = (None, None)
+
+    columns = [group_by.label('group')] if group_by is not None else []
+    for name, window in windows.items():
+        columns.append(measure(window_condition(window)).label(name))
+
+    query = db.session.query(*columns)
+    if filters:
+        query = query.filter(*filters)
+
+    # Only scan the rows the windows can match when both are bounded
+    if not include_overall:
+        starts = [window[0] for window in windows.values()]
+        ends = [window[1] for window in windows.values()]
+        if None not in starts:
+            query = query.filter(column >= _column_bound(column, min(starts)))
+        if None not in ends:
+            query = query.filter(column < _column_bound(column, max(ends), upper=True))
+
+    if group_by is not None:
+        rows = query.group_by(group_by).all()
+    else:
+        rows = [query.one()]
+
+    result = {name: {'total': 0} for name in windows}
+    for row in rows:
+        for name in windows:
+            count = int(getattr(row, name) or 0)
+            if group_by is not None:
+                result[name][row.group] = count
+            result[name]['total'] += count
+
+    keys = set(result['current']) | set(result['previous'])
+    result['change'] = {
+        key: percent_change(result['current'].get(key, 0), result['previous'].get(key, 0), empty_change)
+        for key in keys
+    }
+    return result
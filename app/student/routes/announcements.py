@@ -5,7 +5,7 @@ from sqlalchemy import desc
 from app.student import student_bp
 from app.models import (
     Announcement, Student, User, Office, 
-    StudentActivityLog, Notification
+    StudentActivityLog
 )
 from app.extensions import db
 from app.utils import role_required
@@ -35,33 +35,17 @@ def announcements():
     for announcement in announcements:
         announcement.is_new = (today - announcement.created_at).days < 3
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action="Viewed announcements",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/announcements.html',
-        announcements=announcements,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        announcements=announcements
     )
 
 @student_bp.route('/announcement/<int:announcement_id>')
@@ -88,31 +72,15 @@ def view_announcement(announcement_id):
             flash("You do not have permission to view this announcement", "error")
             return redirect(url_for('student.announcements'))
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action=f"Viewed announcement #{announcement_id}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/view_announcement.html',
-        announcement=announcement,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        announcement=announcement
     )
\ No newline at end of file
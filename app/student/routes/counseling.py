@@ -26,34 +26,18 @@ def counseling_sessions():
     # Get all offices for scheduling
     offices = Office.query.all()
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action="Viewed counseling sessions",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/counseling_sessions.html',
         sessions=sessions,
-        offices=offices,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        offices=offices
     )
 
 @student_bp.route('/view-session/<int:session_id>')
@@ -70,34 +54,18 @@ def view_session(session_id):
         student_id=student.id
     ).first_or_404()
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action=f"Viewed counseling session #{session_id}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     # Placeholder - return a simple template
     return render_template(
         'student/view_session.html',
-        session=session,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        session=session
     )
 
 @student_bp.route('/schedule-session', methods=['POST'])
@@ -194,40 +162,24 @@ def request_counseling_session():
     
     counseling_offices_count = len(counseling_offices)
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Get date constraints for the form
     today = datetime.utcnow().date().strftime('%Y-%m-%d')
     max_date = (datetime.utcnow() + timedelta(days=30)).date().strftime('%Y-%m-%d')
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action="Viewed counseling session request form",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/request_counseling.html',
         offices=offices,
         counseling_offices_count=counseling_offices_count,
         today=today,
-        max_date=max_date,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        max_date=max_date
     )
 
 @student_bp.route('/office/<int:office_id>/check-video-support')
@@ -239,15 +191,14 @@ def check_office_video_support(office_id):
     
     # Log this API call
     student = Student.query.filter_by(user_id=current_user.id).first()
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action=f"Checked video support for office: {office.name}",
-        timestamp=datetime.utcnow(),
+        related_id=office.id,
+        related_type="office",
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return jsonify({
         'supports_video': office.supports_video,
@@ -446,24 +397,11 @@ def join_video_session(session_id):
     db.session.add(log_entry)
     db.session.commit()
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     return render_template(
         'student/video_session.html',
         session=session,
         counselor=counselor,
         meeting_id=session.meeting_id,
         meeting_url=session.meeting_url,
-        meeting_password=session.meeting_password,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        meeting_password=session.meeting_password
     )
\ No newline at end of file
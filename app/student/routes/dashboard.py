@@ -5,7 +5,7 @@ from sqlalchemy import desc
 from app.student import student_bp
 from app.models import (
     Inquiry, CounselingSession, Student, User, 
-    Office, Announcement, StudentActivityLog, Notification
+    Office, Announcement, StudentActivityLog
 )
 from app.extensions import db
 from app.utils import role_required
@@ -107,27 +107,13 @@ def dashboard():
     # Since 'is_active' does not exist, fetch all offices instead
     available_offices = Office.query.all()
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Record this dashboard view as activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action="Viewed dashboard",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/student_dashboard.html',
@@ -137,7 +123,5 @@ def dashboard():
         recent_inquiries=recent_inquiries,
         todays_activities=todays_activities,
         recent_announcements=recent_announcements,
-        available_offices=available_offices,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        available_offices=available_offices
     )
\ No newline at end of file
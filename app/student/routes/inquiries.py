@@ -10,6 +10,7 @@ from app.models import (
 )
 from app.extensions import db
 from app.utils import role_required
+from app.services.message_history import message_page, message_to_dict
 import os
 from werkzeug.utils import secure_filename
 
@@ -68,27 +69,13 @@ def inquiries():
         'resolved': Inquiry.query.filter_by(student_id=student.id, status='resolved').count()
     }
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action="Viewed inquiries list",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/inquiries.html',
@@ -97,9 +84,7 @@ def inquiries():
         offices=offices,
         stats=stats,
         current_status=status,
-        current_office=office_id,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        current_office=office_id
     )
 
 # View a single inquiry with messages
@@ -117,16 +102,9 @@ def view_inquiry(inquiry_id):
         student_id=student.id
     ).first_or_404()
     
-    # Get latest 6 messages for this inquiry for initial load
-    messages = InquiryMessage.query.filter_by(
-        inquiry_id=inquiry.id
-    ).order_by(desc(InquiryMessage.created_at)).limit(6).all()
-    
-    # Reverse the messages to display in chronological order
-    messages = messages[::-1]
-    
-    # Get total message count for pagination
-    total_messages = InquiryMessage.query.filter_by(inquiry_id=inquiry.id).count()
+    # Get latest 6 messages for this inquiry for initial load, oldest first
+    history = message_page(inquiry.id, per_page=6)
+    messages = history.messages
     
     # Get related inquiries (same office)
     related_inquiries = Inquiry.query.filter(
@@ -135,39 +113,22 @@ def view_inquiry(inquiry_id):
         Inquiry.id != inquiry.id
     ).order_by(desc(Inquiry.created_at)).limit(3).all()
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student=student,
         action=f"Viewed inquiry #{inquiry.id}",
         related_id=inquiry.id,
         related_type="inquiry",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/view_inquiry.html',
         inquiry=inquiry,
         messages=messages,
-        total_messages=total_messages,
         related_inquiries=related_inquiries,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications,
-        has_more_messages=(total_messages > 6)
+        has_more_messages=history.has_more
     )
 
 # Submit inquiry to specific office
@@ -187,34 +148,21 @@ def submit_inquiry(office_id):
         OfficeConcernType.office_id == office_id
     ).all()
     
-    # Get unread notifications count for navbar
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).count()
-    
-    # Get notifications for dropdown
-    notifications = Notification.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Notification.created_at)).limit(5).all()
-    
-    # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
-        action=f"Viewed submission form for {office.name}",
-        timestamp=datetime.utcnow(),
+    # Log this activity; the office is identified by related_id, so view
+    # counters stay one series per office even if it is renamed
+    StudentActivityLog.log_action(
+        student=student,
+        action="Viewed submission form",
+        related_id=office.id,
+        related_type="office",
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/submit_inquiry.html',
         office=office,
-        concern_types=concern_types,
-        unread_notifications_count=unread_notifications_count,
-        notifications=notifications
+        concern_types=concern_types
     )
 
 # Create a new inquiry
@@ -446,45 +394,18 @@ def get_older_messages(inquiry_id):
         ).first_or_404()
         
         # Get pagination parameters
-        before_id = request.args.get('before_id', type=int)
-        limit = request.args.get('limit', 6, type=int)
-        
-        # Query for older messages
-        query = InquiryMessage.query.filter_by(
-            inquiry_id=inquiry.id
+        history = message_page(
+            inquiry.id,
+            cursor=request.args.get('cursor'),
+            before_id=request.args.get('before_id', type=int),
+            per_page=request.args.get('limit', 6, type=int)
         )
         
-        # If we have a before_id, only get messages older than that
-        if before_id:
-            oldest_message = InquiryMessage.query.get(before_id)
-            if oldest_message:
-                query = query.filter(InquiryMessage.created_at < oldest_message.created_at)
-        
-        # Get messages in descending order and limit
-        messages = query.order_by(desc(InquiryMessage.created_at)).limit(limit).all()
-        
-        # Reverse the messages to display in chronological order
-        messages = messages[::-1]
-        
-        # Serialize messages data for JSON response
-        messages_data = []
-        for message in messages:
-            sender = User.query.get(message.sender_id)
-            is_student = sender.id == current_user.id
-            
-            messages_data.append({
-                'id': message.id,
-                'content': message.content,
-                'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'sender_name': sender.get_full_name() if sender else 'Unknown',
-                'is_student': is_student,
-                'status': message.status
-            })
-        
         return jsonify({
             'success': True,
-            'messages': messages_data,
-            'has_more': len(messages) >= limit
+            'messages': [message_to_dict(message) for message in history.messages],
+            'has_more': history.has_more,
+            'cursor': history.cursor
         })
         
     except Exception as e:
@@ -2,30 +2,32 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from app.models import Notification, db
 from app.utils import student_required
+from app.services.nav_context import student_context, invalidate_user
 
 # Use a blueprint from the parent package if it exists
 from app.student import student_bp
 
+@student_bp.context_processor
+def inject_student_context():
+    """Provide the navbar unread count and notification dropdown to every student template"""
+    if current_user.is_authenticated and current_user.role == 'student':
+        return student_context(current_user.id)
+    return {'unread_notifications_count': 0, 'notifications': []}
+
 @student_bp.route('/notifications')
 @login_required
 @student_required
 def notifications():
     """Route to display all student notifications"""
     # Get all notifications for the current student, sorted by creation time (newest first)
+    # (the unread badge comes from inject_student_context)
     notifications = Notification.query.filter_by(user_id=current_user.id)\
         .order_by(Notification.created_at.desc())\
         .all()
     
-    # Get count of unread notifications
-    unread_notifications_count = Notification.query.filter_by(
-        user_id=current_user.id, 
-        is_read=False
-    ).count()
-    
     return render_template(
         'student/notifications.html',
-        notifications=notifications,
-        unread_notifications_count=unread_notifications_count
+        notifications=notifications
     )
 
 # API endpoint for marking a notification as read/dismissed
@@ -53,5 +55,7 @@ def mark_all_read():
         'is_read': True
     })
     db.session.commit()
+    # Bulk updates skip the mapper events that normally refresh the navbar cache
+    invalidate_user(current_user.id)
     
     return jsonify(success=True)
\ No newline at end of file
@@ -6,6 +6,7 @@ from app.models import (
     OfficeLoginLog, StudentActivityLog
 )
 from app.extensions import db, socketio
+from app.services.dashboard_snapshot import get_snapshot, mark_dirty
 from datetime import datetime
 import json
 
@@ -309,34 +310,10 @@ def register_dashboard_handlers():
         if not current_user.is_authenticated or current_user.role != 'super_admin':
             return
         
-        # Get real-time statistics
-        active_users = User.query.filter_by(is_active=True).count()
-        pending_inquiries = Inquiry.query.filter_by(status='pending').count()
-        upcoming_sessions = CounselingSession.query.filter(
-            CounselingSession.scheduled_at > datetime.utcnow(),
-            CounselingSession.status == 'scheduled'
-        ).count()
-        
-        # Get office activity
-        offices = Office.query.all()
-        office_activity = []
-        for office in offices:
-            inquiries_count = Inquiry.query.filter_by(office_id=office.id).count()
-            sessions_count = CounselingSession.query.filter_by(office_id=office.id).count()
-            office_activity.append({
-                'office_id': office.id,
-                'office_name': office.name,
-                'inquiries_count': inquiries_count,
-                'sessions_count': sessions_count
-            })
-        
-        emit('dashboard_stats', {
-            'active_users': active_users,
-            'pending_inquiries': pending_inquiries,
-            'upcoming_sessions': upcoming_sessions,
-            'office_activity': office_activity,
-            'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        })
+        # Send the full cached snapshot to the requesting client
+        stats = dict(get_snapshot())
+        stats['timestamp'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        emit('dashboard_stats', stats)
     
     @socketio.on('request_system_health')
     def handle_system_health_request():
@@ -564,32 +541,9 @@ def emit_super_admin_activity(admin, action, target_type, target=None, details=N
 
 def update_dashboard_stats():
     """
-    Update real-time dashboard statistics for super admins.
-    This can be called periodically or after significant system events.
+    Mark the real-time dashboard statistics for super admins as stale.
+    This can be called after significant system events; the statistics are
+    recomputed off the request path at most once per DASHBOARD_STATS_INTERVAL
+    and only the changed fields are broadcast to admin_room.
     """
-    active_users = User.query.filter_by(is_active=True).count()
-    pending_inquiries = Inquiry.query.filter_by(status='pending').count()
-    upcoming_sessions = CounselingSession.query.filter(
-        CounselingSession.scheduled_at > datetime.utcnow(),
-        CounselingSession.status == 'scheduled'
-    ).count()
-    
-    offices = Office.query.all()
-    office_activity = []
-    for office in offices:
-        inquiries_count = Inquiry.query.filter_by(office_id=office.id).count()
-        sessions_count = CounselingSession.query.filter_by(office_id=office.id).count()
-        office_activity.append({
-            'office_id': office.id,
-            'office_name': office.name,
-            'inquiries_count': inquiries_count,
-            'sessions_count': sessions_count
-        })
-    
-    socketio.emit('dashboard_stats', {
-        'active_users': active_users,
-        'pending_inquiries': pending_inquiries,
-        'upcoming_sessions': upcoming_sessions,
-        'office_activity': office_activity,
-        'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-    }, room='admin_room')
\ No newline at end of file
+    mark_dirty()
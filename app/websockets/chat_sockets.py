@@ -10,9 +10,12 @@ from flask import request, current_app
 from flask_login import current_user
 import json
 import datetime
+import threading
 from app.extensions import db, socketio
-from app.models import InquiryMessage, User, Office
+from app.models import InquiryMessage
 from app.utils import format_date
+from app.services import message_receipts
+from app.services.chat_payloads import message_payload, inquiry_route
 
 def init_socketio():
     """Register chat socket event handlers"""
@@ -92,6 +95,31 @@ def on_join_inquiry(data):
         'status': 'success'
     })
 
+def _send_to_participants(message_data):
+    """
+    Broadcast a message payload to its inquiry room and to the other side's
+    personal room (the student's user room or the office room).
+    
+    Returns:
+        str: The inquiry room
+    """
+    route = inquiry_route(message_data['inquiry_id'])
+    room = f"inquiry_{message_data['inquiry_id']}"
+    emit('new_message', message_data, room=room)
+    
+    # Also emit to personal rooms for offline notifications
+    if message_data['sender_role'] == 'office_admin' and route['student_user_id']:
+        # Student personal rooms are keyed by user id, not student id
+        student_room = f"user_{route['student_user_id']}"
+        emit('new_chat_message', message_data, room=student_room)
+        current_app.logger.info(f"New message notification sent to student room: {student_room}")
+    elif message_data['sender_role'] == 'student' and route['office_id']:
+        office_room = f"office_{route['office_id']}"
+        emit('new_chat_message', message_data, room=office_room)
+        current_app.logger.info(f"New message notification sent to office room: {office_room}")
+    
+    return room
+
 @socketio.on('new_message_notification')
 def handle_new_message(data):
     """
@@ -113,50 +141,12 @@ def handle_new_message(data):
     if not message or message.inquiry_id != int(inquiry_id):
         return
         
-    # Prepare data to emit
-    sender = User.query.get(message.sender_id)
-    if not sender:
+    # Sender and inquiry details come from cache
+    message_data = message_payload(message, timestamp=format_date(message.created_at))
+    if not message_data:
         return
     
-    # Get additional data for office users
-    office_id = None
-    office_name = None
-    if sender.role == 'office_admin' and hasattr(sender, 'office_id'):
-        office_id = sender.office_id
-        office = Office.query.get(office_id)
-        if office:
-            office_name = office.name
-        
-    message_data = {
-        'message_id': message.id,
-        'inquiry_id': message.inquiry_id,
-        'content': message.content,
-        'timestamp': format_date(message.created_at),
-        'sender_id': message.sender_id,
-        'sender_name': sender.full_name,
-        'sender_role': sender.role,
-        'status': message.status,
-        'from_admin': sender.role == 'office_admin',
-        'office_id': office_id,
-        'office_name': office_name,
-        'student_id': message.inquiry.student_id if hasattr(message.inquiry, 'student_id') else None
-    }
-    
-    # Broadcast to the room
-    room = f'inquiry_{inquiry_id}'
-    emit('new_message', message_data, room=room)
-    
-    # Also emit to personal rooms for offline notifications
-    if sender.role == 'office_admin' and message.inquiry.student_id:
-        # Send to student's personal room
-        student_room = f'user_{message.inquiry.student_id}'
-        emit('new_chat_message', message_data, room=student_room)
-        current_app.logger.info(f"New message notification sent to student room: {student_room}")
-    elif sender.role == 'student' and message.inquiry.office_id:
-        # Send to office's room
-        office_room = f'office_{message.inquiry.office_id}'
-        emit('new_chat_message', message_data, room=office_room)
-        current_app.logger.info(f"New message notification sent to office room: {office_room}")
+    room = _send_to_participants(message_data)
     
     current_app.logger.info(f"New message notification: {message_id} in room {room}")
 
@@ -183,51 +173,17 @@ def handle_chat_message_sent(data):
         )
         
         db.session.add(new_message)
+        db.session.flush()
+        # Built before the commit so the message does not have to be reloaded
+        message_data = message_payload(new_message, status='sent', timestamp=format_date(new_message.created_at))
         db.session.commit()
         
-        # Get additional data
-        office_id = None
-        office_name = None
-        if current_user.role == 'office_admin' and hasattr(current_user, 'office_id'):
-            office_id = current_user.office_id
-            office = Office.query.get(office_id)
-            if office:
-                office_name = office.name
-        
-        # Prepare message data
-        message_data = {
-            'message_id': new_message.id,
-            'inquiry_id': new_message.inquiry_id,
-            'content': new_message.content,
-            'timestamp': format_date(new_message.created_at),
-            'sender_id': new_message.sender_id,
-            'sender_name': current_user.full_name,
-            'sender_role': current_user.role,
-            'status': 'sent',
-            'from_admin': current_user.role == 'office_admin',
-            'office_id': office_id,
-            'office_name': office_name,
-            'student_id': new_message.inquiry.student_id if hasattr(new_message.inquiry, 'student_id') else None
-        }
-        
-        # Broadcast to the inquiry room
-        room = f'inquiry_{inquiry_id}'
-        emit('new_message', message_data, room=room)
-        
-        # Also emit to personal rooms
-        if current_user.role == 'office_admin' and new_message.inquiry.student_id:
-            # Send to student's personal room
-            student_room = f'user_{new_message.inquiry.student_id}'
-            emit('new_chat_message', message_data, room=student_room)
-        elif current_user.role == 'student' and new_message.inquiry.office_id:
-            # Send to office's room
-            office_room = f'office_{new_message.inquiry.office_id}'
-            emit('new_chat_message', message_data, room=office_room)
+        room = _send_to_participants(message_data)
         
         # Acknowledge receipt to sender
-        emit('message_sent', {'message_id': new_message.id, 'status': 'success'})
+        emit('message_sent', {'message_id': message_data['message_id'], 'status': 'success'})
         
-        current_app.logger.info(f"Message {new_message.id} sent via websocket to room {room}")
+        current_app.logger.info(f"Message {message_data['message_id']} sent via websocket to room {room}")
         
     except Exception as e:
         db.session.rollback()
@@ -323,114 +279,86 @@ def handle_admin_typing(data):
     
     current_app.logger.debug(f"Admin typing indicator: {current_user.id} is {'typing' if is_typing else 'not typing'} to student {student_id}")
 
-@socketio.on('chat_message_delivered')
-def handle_message_delivered(data):
-    """Handle message delivered events"""
-    if not current_user.is_authenticated:
+# Delivered/read/received acks are buffered per (inquiry, user) for
+# CHAT_ACK_WINDOW seconds, then written and broadcast together: a client
+# acking every message it renders costs one transaction and at most one
+# message_status_update per status for the whole burst.
+DEFAULT_ACK_WINDOW = 0.15  # seconds
+
+_pending_acks = {}
+_pending_acks_lock = threading.Lock()
+
+def _acknowledge(data, status):
+    """Buffer a delivered/read ack; the first ack for an (inquiry, user) schedules the flush"""
+    try:
+        inquiry_id = int(data.get('inquiry_id'))
+        # Clients send the newest message they have received/read; older
+        # clients send one event per message with only message_id
+        up_to_id = int(data.get('up_to_id') or data.get('message_id'))
+    except (TypeError, ValueError):
         return
-        
-    # Get required data
-    inquiry_id = data.get('inquiry_id')
-    message_id = data.get('message_id')
-    sender_id = data.get('sender_id')
     
-    if not inquiry_id or not message_id or not sender_id:
-        return
-        
-    # Update status in the database
-    message = InquiryMessage.query.get(message_id)
-    if not message or str(message.inquiry_id) != str(inquiry_id) or str(message.sender_id) != str(sender_id):
+    if not message_receipts.is_participant(inquiry_id, current_user.id):
+        current_app.logger.warning(f"User {current_user.id} is not a participant of inquiry {inquiry_id}; ack ignored")
         return
     
-    # Update the message status directly
-    message.status = 'delivered'
-    message.delivered_at = datetime.datetime.utcnow()
-        
-    try:
-        db.session.commit()
-        
-        # Broadcast status update to the room
-        room = f'inquiry_{inquiry_id}'
-        emit('message_status_update', {
-            'inquiry_id': inquiry_id,
-            'message_id': message_id,
-            'status': 'delivered',
-            'user_id': current_user.id
-        }, room=room)
-        
-        # Also send to sender's personal room
-        sender_room = f'user_{sender_id}'
-        emit('message_status_update', {
-            'inquiry_id': inquiry_id,
-            'message_id': message_id,
-            'status': 'delivered',
-            'user_id': current_user.id
-        }, room=sender_room)
-        
-        current_app.logger.debug(f"Message {message_id} marked as delivered by user {current_user.id}")
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error marking message as delivered: {str(e)}")
+    key = (inquiry_id, current_user.id)
+    with _pending_acks_lock:
+        pending = _pending_acks.get(key)
+        first = pending is None
+        if first:
+            pending = _pending_acks[key] = {}
+        pending[status] = max(pending.get(status, 0), up_to_id)
+    
+    if first:
+        socketio.start_background_task(_flush_acks, current_app._get_current_object(), key)
 
-@socketio.on('chat_message_read')
-def handle_message_read(data):
-    """Handle message read events"""
-    if not current_user.is_authenticated:
-        return
-        
-    # Get required data
-    inquiry_id = data.get('inquiry_id')
-    message_id = data.get('message_id')
-    sender_id = data.get('sender_id')
+def _flush_acks(app, key):
+    """Background task: after the ack window, record the newest buffered acks in one transaction"""
+    socketio.sleep(app.config.get('CHAT_ACK_WINDOW', DEFAULT_ACK_WINDOW))
+    with _pending_acks_lock:
+        pending = _pending_acks.pop(key, {})
+    
+    inquiry_id, user_id = key
+    read_up_to = pending.get(message_receipts.READ, 0)
+    delivered_up_to = pending.get(message_receipts.DELIVERED, 0)
     
-    if not inquiry_id or not message_id or not sender_id:
+    with app.app_context():
+        try:
+            updates = []
+            if read_up_to:
+                updates.append(message_receipts.advance(inquiry_id, user_id, message_receipts.READ, read_up_to, commit=False))
+            # Reading up to a message already delivers everything before it
+            if delivered_up_to > read_up_to:
+                updates.append(message_receipts.advance(inquiry_id, user_id, message_receipts.DELIVERED, delivered_up_to, commit=False))
+            db.session.commit()
+            
+            for update in filter(None, updates):
+                message_receipts.broadcast(update)
+                app.logger.debug(
+                    f"Messages {update['from_message_id']}-{update['up_to_id']} of inquiry {inquiry_id} marked as {update['status']} by user {user_id}"
+                )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error recording message receipts: {str(e)}")
+
+@socketio.on('chat_message_delivered')
+def handle_message_delivered(data):
+    """Handle "delivered up to message X" events"""
+    if not current_user.is_authenticated or not data:
         return
-        
-    # Update status in the database
-    message = InquiryMessage.query.get(message_id)
-    if not message or str(message.inquiry_id) != str(inquiry_id) or str(message.sender_id) != str(sender_id):
+    _acknowledge(data, message_receipts.DELIVERED)
+
+@socketio.on('chat_message_read')
+def handle_message_read(data):
+    """Handle "read up to message X" events"""
+    if not current_user.is_authenticated or not data:
         return
-    
-    # Update the message status directly
-    message.status = 'read'
-    message.read_at = datetime.datetime.utcnow()
-        
-    try:
-        db.session.commit()
-        
-        # Broadcast status update to the room
-        room = f'inquiry_{inquiry_id}'
-        emit('message_status_update', {
-            'inquiry_id': inquiry_id,
-            'message_id': message_id,
-            'status': 'read',
-            'user_id': current_user.id
-        }, room=room)
-        
-        # Also send to sender's personal room
-        sender_room = f'user_{sender_id}'
-        emit('message_status_update', {
-            'inquiry_id': inquiry_id,
-            'message_id': message_id,
-            'status': 'read',
-            'user_id': current_user.id
-        }, room=sender_room)
-        
-        current_app.logger.debug(f"Message {message_id} marked as read by user {current_user.id}")
-    except Exception as e:
-        db.session.rollback()
-        current_app.logger.error(f"Error marking message as read: {str(e)}")
+    _acknowledge(data, message_receipts.READ)
 
 @socketio.on('message_received')
 def handle_message_received(data):
-    """Handle message received confirmation (for logging/debugging)"""
-    if not current_user.is_authenticated:
-        return
-    
-    inquiry_id = data.get('inquiry_id')
-    message_id = data.get('message_id')
-    
-    if not inquiry_id or not message_id:
+    """Handle message received confirmation: the message has reached this client, so it counts as delivered"""
+    if not current_user.is_authenticated or not data:
         return
-    
-    current_app.logger.debug(f"Message {message_id} received confirmation from user {current_user.id}")
\ No newline at end of file
+    _acknowledge(data, message_receipts.DELIVERED)
@@ -6,6 +6,7 @@ from app.models import (
     CounselingSession, Student, AuditLog, InquiryMessage
 )
 from datetime import datetime
+from app.services.chat_payloads import message_payload, build_payload, inquiry_route
 
 def init_socketio():
     """Register office socket event handlers"""
@@ -104,46 +105,22 @@ def init_socketio():
         
         print(f"DEBUG: Office admin {current_user.id} sent message {message_id} to student {student_id} in inquiry {inquiry_id}")
         
-        # Emit to student
-        if student_id:
-            student = Student.query.get(student_id)
-            if student:
-                student_user = User.query.get(student.user_id)
-                if student_user:
-                    # Get office name
-                    office_name = "Office"
-                    if current_user.office_admin:
-                        office = Office.query.get(current_user.office_admin.office_id)
-                        if office:
-                            office_name = office.name
-                    
-                    # Emit to student's personal room
-                    emit('new_chat_message', {
-                        'inquiry_id': inquiry_id,
-                        'message_id': message_id,
-                        'sender_id': current_user.id,
-                        'sender_name': current_user.get_full_name(),
-                        'content': content,
-                        'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-                        'from_admin': True,
-                        'office_name': office_name,
-                        'status': 'sent'
-                    }, room=f'user_{student_user.id}')
-                    
-                    print(f"DEBUG: Message {message_id} emitted to student user room: user_{student_user.id}")
+        # Route by the inquiry rather than the student the client named
+        message_data = build_payload(
+            inquiry_id, current_user.id, message_id, content,
+            datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), 'sent'
+        )
+        if not message_data:
+            return
+        route = inquiry_route(inquiry_id)
+        
+        # Emit to student's personal room
+        emit('new_chat_message', message_data, room=f"user_{route['student_user_id']}")
+        print(f"DEBUG: Message {message_id} emitted to student user room: user_{route['student_user_id']}")
         
         # Also emit to the inquiry room for other office admins
-        room_name = f'inquiry_{inquiry_id}'
-        emit('new_chat_message', {
-            'inquiry_id': inquiry_id,
-            'message_id': message_id,
-            'sender_id': current_user.id,
-            'sender_name': current_user.get_full_name(),
-            'content': content,
-            'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-            'is_admin': True,
-            'status': 'sent'
-        }, room=room_name, include_self=False)  # Don't send back to sender
+        room_name = f"inquiry_{route['id']}"
+        emit('new_chat_message', message_data, room=room_name, include_self=False)  # Don't send back to sender
         
         print(f"DEBUG: Message {message_id} also emitted to inquiry room: {room_name}")
             
@@ -223,56 +200,18 @@ def emit_office_reply(message):
     if not message:
         return
     
-    # Get the inquiry
-    inquiry = Inquiry.query.get(message.inquiry_id)
-    if not inquiry:
+    # One payload for both rooms; sender and inquiry details come from cache
+    message_data = message_payload(message, status='sent')
+    if not message_data or message_data['sender_role'] != 'office_admin':
         return
     
-    # Get sender details
-    sender = User.query.get(message.sender_id)
-    if not sender or sender.role != 'office_admin':
+    route = inquiry_route(message.inquiry_id)
+    if not route['student_user_id']:
         return
     
-    # Get student
-    student = Student.query.get(inquiry.student_id)
-    if not student or not student.user_id:
-        return
-    
-    student_user = User.query.get(student.user_id)
-    if not student_user:
-        return
-    
-    # Get office name
-    office_name = "Office"
-    office_admin = OfficeAdmin.query.filter_by(user_id=sender.id).first()
-    if office_admin:
-        office = Office.query.get(office_admin.office_id)
-        if office:
-            office_name = office.name
-    
-    # Emit to student's personal room
-    print(f"DEBUG: Emitting office reply from {sender.id} to student {student_user.id} for inquiry {inquiry.id}")
-    
-    socketio.emit('new_chat_message', {
-        'inquiry_id': inquiry.id,
-        'message_id': message.id,
-        'sender_id': sender.id,
-        'sender_name': sender.get_full_name(),
-        'content': message.content,
-        'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        'from_admin': True,
-        'office_name': office_name,
-        'status': 'sent'
-    }, room=f'user_{student_user.id}')
+    # Emit to student's personal room and to the inquiry room for other office admins;
+    # a client in both rooms gets the message once
+    print(f"DEBUG: Emitting office reply from {message_data['sender_id']} to student {route['student_user_id']} for inquiry {route['id']}")
     
-    # Also emit to the inquiry room for other office admins
-    socketio.emit('new_chat_message', {
-        'inquiry_id': inquiry.id, 
-        'message_id': message.id,
-        'sender_id': sender.id,
-        'sender_name': sender.get_full_name(),
-        'content': message.content,
-        'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        'is_admin': True,
-        'status': 'sent'
-    }, room=f'inquiry_{inquiry.id}')
\ No newline at end of file
+    socketio.emit('new_chat_message', message_data,
+                  to=[f"user_{route['student_user_id']}", f"inquiry_{route['id']}"])
\ No newline at end of file
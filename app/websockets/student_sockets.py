@@ -5,6 +5,7 @@ from datetime import datetime
 import json
 from app.models import Inquiry, InquiryMessage, User, Student, Office, OfficeAdmin
 from app import db
+from app.services.chat_payloads import message_payload, build_payload, sender_profile, inquiry_route
 
 def init_socketio():
     """Register student socket event handlers"""
@@ -97,164 +98,89 @@ def init_socketio():
         
         print(f"DEBUG: Student {current_user.id} sending message for inquiry {inquiry_id} to office {office_id}")
         
-        # Validate the inquiry belongs to this student
-        inquiry = Inquiry.query.get(inquiry_id)
-        if not inquiry or inquiry.student_id != current_user.student.id:
+        # Validate the inquiry belongs to this student (both lookups are cached)
+        route = inquiry_route(inquiry_id) if inquiry_id else None
+        sender = sender_profile(current_user.id)
+        if not route or not sender or route['student_id'] != sender['student_id']:
             print(f"DEBUG: Student {current_user.id} not authorized for inquiry {inquiry_id}")
             return
         
-        # If message_id isn't provided, this could be a real-time notification before DB save
-        # In this case, create a temporary ID
-        if not message_id:
-            from uuid import uuid4
-            message_id = f'temp_{str(uuid4())}'
-            print(f"DEBUG: Created temporary message_id: {message_id}")
-        
         # Save to database if we have content
+        message_data = None
         if content:
             try:
                 new_message = InquiryMessage(
-                    inquiry_id=inquiry_id,
+                    inquiry_id=route['id'],
                     sender_id=current_user.id,
                     content=content
                 )
                 db.session.add(new_message)
+                db.session.flush()
+                # Built before the commit so the message does not have to be reloaded
+                message_data = message_payload(new_message, status='sent')
                 db.session.commit()
-                message_id = new_message.id
-                print(f"DEBUG: Saved message to database with ID: {message_id}")
+                print(f"DEBUG: Saved message to database with ID: {new_message.id}")
             except Exception as e:
                 print(f"DEBUG: Error saving message to database: {str(e)}")
                 db.session.rollback()
+                message_data = None
+        
+        # If the message wasn't saved, this is a real-time notification before DB save
+        # In this case, use a temporary ID
+        if message_data is None:
+            if not message_id:
+                from uuid import uuid4
+                message_id = f'temp_{str(uuid4())}'
+                print(f"DEBUG: Created temporary message_id: {message_id}")
+            message_data = build_payload(
+                route['id'], current_user.id, message_id, content,
+                datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), 'sent'
+            )
         
-        # Emit to office admins that a new message was sent
-        if inquiry_id and office_id:
-            # First check if office_id is valid
-            office = Office.query.get(office_id)
-            if not office:
+        # Ensure we use the right office_id from the inquiry
+        if not route['office_id']:
+            if not office_id or not Office.query.get(office_id):
                 print(f"DEBUG: Invalid office_id: {office_id}")
                 return
-                
-            # Ensure we use the right office_id from the inquiry
-            if not inquiry.office_id:
-                inquiry.office_id = office_id
-                db.session.commit()
-                print(f"DEBUG: Updated inquiry {inquiry_id} with office_id {office_id}")
-            
-            # Create the message payload
-            message_data = {
-                'inquiry_id': inquiry_id,
-                'message_id': message_id,
-                'sender_id': current_user.id,
-                'sender_name': current_user.get_full_name(),
-                'content': content,
-                'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-                'is_student': True,
-                'student_id': current_user.student.id,
-                'office_id': office_id
-            }
-            
-            # Try multiple event types to ensure delivery
-            # 1. Specific event for office admins
-            emit('student_message_sent', message_data, room=f'office_{office_id}')
-            print(f"DEBUG: Emitted student_message_sent to office_{office_id}: {json.dumps(message_data)}")
-            
-            # 2. General message event that many handlers listen for
-            emit('new_chat_message', message_data, room=f'office_{office_id}')
-            print(f"DEBUG: Emitted new_chat_message to office_{office_id}")
-            
-            # 3. Try the inquiry-specific room too
-            emit('new_chat_message', message_data, room=f'inquiry_{inquiry_id}')
-            print(f"DEBUG: Emitted to inquiry_{inquiry_id} room")
-            
-            # 4. Try for any admin viewing this specific inquiry
-            emit('new_message', message_data, room=f'inquiry_view_{inquiry_id}')
-            print(f"DEBUG: Emitted to inquiry_view_{inquiry_id} room")
-            
-            # Also emit a sent confirmation back to the sender
-            emit('message_status_update', {
-                'inquiry_id': inquiry_id,
-                'message_id': message_id,
-                'status': 'sent',
-                'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            }, room=f'user_{current_user.id}')
-            
-            print(f"DEBUG: Sent confirmation back to student user_{current_user.id}")
-            
-            # Also update the student's UI with their own message
-            emit('new_chat_message', {
-                'inquiry_id': inquiry_id,
-                'message_id': message_id,
-                'sender_id': current_user.id,
-                'sender_name': current_user.get_full_name(),
-                'content': content,
-                'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-                'is_student': True,
-                'status': 'sent'
-            }, room=f'user_{current_user.id}')
-            
-            print(f"DEBUG: Sent student's own message back to their UI")
-    
-    @socketio.on('chat_message_delivered')
-    def on_chat_message_delivered(data):
-        """Handle when a chat message is delivered to recipient"""
-        print(f"DEBUG: on_chat_message_delivered received: {json.dumps(data)}")
+            Inquiry.query.get(route['id']).office_id = office_id
+            db.session.commit()
+            message_data['office_id'] = office_id
+            print(f"DEBUG: Updated inquiry {inquiry_id} with office_id {office_id}")
+        office_id = message_data['office_id']
         
-        if not current_user.is_authenticated:
-            return
-            
-        inquiry_id = data.get('inquiry_id')
-        message_id = data.get('message_id')
-        sender_id = data.get('sender_id')
-        
-        if inquiry_id and message_id and sender_id:
-            # Update message status in database
-            message = InquiryMessage.query.get(message_id)
-            if message:
-                message.delivered_at = datetime.utcnow()
-                message.status = 'delivered'
-                db.session.commit()
-                print(f"DEBUG: Updated message {message_id} status to 'delivered' in database")
-            
-            # Emit to sender that message was delivered
-            emit('message_status_update', {
-                'inquiry_id': inquiry_id,
-                'message_id': message_id,
-                'status': 'delivered',
-                'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            }, room=f'user_{sender_id}')
-            
-            print(f"DEBUG: Emitted message_status_update (delivered) to user_{sender_id}")
-    
-    @socketio.on('chat_message_read')
-    def on_chat_message_read(data):
-        """Handle when a chat message is read by recipient"""
-        print(f"DEBUG: on_chat_message_read received: {json.dumps(data)}")
+        # Try multiple event types to ensure delivery
+        # 1. Specific event for office admins
+        emit('student_message_sent', message_data, room=f'office_{office_id}')
+        print(f"DEBUG: Emitted student_message_sent to office_{office_id}: {json.dumps(message_data)}")
         
-        if not current_user.is_authenticated:
-            return
-            
-        inquiry_id = data.get('inquiry_id')
-        message_id = data.get('message_id')
-        sender_id = data.get('sender_id')
-        
-        if inquiry_id and message_id and sender_id:
-            # Update message status in database
-            message = InquiryMessage.query.get(message_id)
-            if message:
-                message.read_at = datetime.utcnow()
-                message.status = 'read'
-                db.session.commit()
-                print(f"DEBUG: Updated message {message_id} status to 'read' in database")
-            
-            # Emit to sender that message was read
-            emit('message_status_update', {
-                'inquiry_id': inquiry_id,
-                'message_id': message_id,
-                'status': 'read',
-                'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            }, room=f'user_{sender_id}')
-            
-            print(f"DEBUG: Emitted message_status_update (read) to user_{sender_id}")
+        # 2. General message event that many handlers listen for
+        emit('new_chat_message', message_data, room=f'office_{office_id}')
+        print(f"DEBUG: Emitted new_chat_message to office_{office_id}")
+        
+        # 3. Try the inquiry-specific room too
+        emit('new_chat_message', message_data, room=f'inquiry_{inquiry_id}')
+        print(f"DEBUG: Emitted to inquiry_{inquiry_id} room")
+        
+        # 4. Try for any admin viewing this specific inquiry
+        emit('new_message', message_data, room=f'inquiry_view_{inquiry_id}')
+        print(f"DEBUG: Emitted to inquiry_view_{inquiry_id} room")
+        
+        # Also emit a sent confirmation back to the sender
+        emit('message_status_update', {
+            'inquiry_id': inquiry_id,
+            'message_id': message_data['message_id'],
+            'status': 'sent',
+            'timestamp': message_data['timestamp']
+        }, room=f'user_{current_user.id}')
+        
+        print(f"DEBUG: Sent confirmation back to student user_{current_user.id}")
+        
+        # Also update the student's UI with their own message
+        emit('new_chat_message', message_data, room=f'user_{current_user.id}')
+        
+        print(f"DEBUG: Sent student's own message back to their UI")
+    
+    # chat_message_delivered / chat_message_read are handled in chat_sockets.py
     
     @socketio.on('student_typing')
     def on_student_typing(data):
@@ -363,72 +289,36 @@ def emit_inquiry_reply(message):
         print(f"DEBUG: emit_inquiry_reply called with invalid message")
         return
     
-    # Get the inquiry
-    inquiry = Inquiry.query.get(message.inquiry_id)
-    if not inquiry:
-        print(f"DEBUG: Invalid inquiry_id in emit_inquiry_reply: {message.inquiry_id}")
-        return
-    
-    # Get sender details
-    sender = User.query.get(message.sender_id)
-    if not sender:
-        print(f"DEBUG: Invalid sender_id in emit_inquiry_reply: {message.sender_id}")
+    # One payload for every event; sender and inquiry details come from cache
+    message_data = message_payload(message, status='sent')
+    if not message_data:
+        print(f"DEBUG: Invalid inquiry or sender in emit_inquiry_reply: {message.inquiry_id}, {message.sender_id}")
         return
+    route = inquiry_route(message.inquiry_id)
     
-    print(f"DEBUG: emit_inquiry_reply processing message {message.id} from {sender.role}")
+    print(f"DEBUG: emit_inquiry_reply processing message {message_data['message_id']} from {message_data['sender_role']}")
     
     # Determine target room based on sender role
-    if sender.role == 'student':
+    if message_data['is_student']:
         # Message from student to office
-        message_data = {
-            'inquiry_id': inquiry.id,
-            'message_id': message.id,
-            'sender_id': sender.id,
-            'sender_name': sender.get_full_name(),
-            'content': message.content,
-            'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'status': 'sent',
-            'is_student': True
-        }
+        office_room = f"office_{route['office_id']}"
         
         # Emit all event types that office might be listening for
-        socketio.emit('new_chat_message', message_data, room=f'office_{inquiry.office_id}')
-        socketio.emit('student_message_sent', message_data, room=f'office_{inquiry.office_id}')
-        socketio.emit('new_message', message_data, room=f'office_{inquiry.office_id}')
+        socketio.emit('new_chat_message', message_data, room=office_room)
+        socketio.emit('student_message_sent', message_data, room=office_room)
+        socketio.emit('new_message', message_data, room=office_room)
         
-        print(f"DEBUG: Emitted student message to office_{inquiry.office_id}")
+        print(f"DEBUG: Emitted student message to {office_room}")
         
         # Also emit to the inquiry-specific room for other admins viewing the same inquiry
-        socketio.emit('new_chat_message', message_data, room=f'inquiry_{inquiry.id}')
-        print(f"DEBUG: Emitted student message to inquiry_{inquiry.id}")
+        socketio.emit('new_chat_message', message_data, room=f"inquiry_{route['id']}")
+        print(f"DEBUG: Emitted student message to inquiry_{route['id']}")
     else:
         # Message from office to student
-        # Get student
-        student = Student.query.get(inquiry.student_id)
-        if student:
-            student_user = User.query.get(student.user_id)
-            if student_user:
-                # Get office name
-                office_name = "Office"
-                if sender.office_admin:
-                    office = Office.query.get(sender.office_admin.office_id)
-                    if office:
-                        office_name = office.name
-                
-                message_data = {
-                    'inquiry_id': inquiry.id,
-                    'message_id': message.id,
-                    'sender_id': sender.id,
-                    'sender_name': sender.get_full_name(),
-                    'content': message.content,
-                    'timestamp': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'status': 'sent',
-                    'office_name': office_name,
-                    'from_admin': True
-                }
-                
-                # Emit all event types student might be listening for
-                socketio.emit('new_chat_message', message_data, room=f'user_{student_user.id}')
-                socketio.emit('new_message', message_data, room=f'user_{student_user.id}')
-                
-                print(f"DEBUG: Emitted admin message to student user_{student_user.id}")
\ No newline at end of file
+        student_room = f"user_{route['student_user_id']}"
+        
+        # Emit all event types student might be listening for
+        socketio.emit('new_chat_message', message_data, room=student_room)
+        socketio.emit('new_message', message_data, room=student_room)
+        
+        print(f"DEBUG: Emitted admin message to student {student_room}")
@@ -19,6 +19,19 @@ document.addEventListener('DOMContentLoaded', function() {
         exportOptions.classList.toggle('hidden');
     });
     
+    // Export with the current filters; the file is built in the background
+    exportOptions.querySelectorAll('[data-export-format]').forEach(button => {
+        button.addEventListener('click', function() {
+            const filterForm = document.querySelector(`form[action="${window.location.pathname}"]`);
+            const formData = filterForm ? new FormData(filterForm) : new FormData();
+            new URLSearchParams(window.location.search).forEach((value, key) => {
+                if (!formData.has(key)) formData.append(key, value);
+            });
+            formData.set('format', button.dataset.exportFormat);
+            window.exportJobs.start(exportOptions.dataset.exportUrl, { method: 'POST', body: formData });
+        });
+    });
+    
     // Close export dropdown when clicking elsewhere
     document.addEventListener('click', function(event) {
         if (!exportBtn.contains(event.target)) {
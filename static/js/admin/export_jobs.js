@@ -0,0 +1,140 @@
+// export_jobs.js - Background export jobs: start an export, follow its progress, offer the download link
+//
+// Export routes answer with a job id right away. Progress arrives as
+// 'export_progress' socket events in the user's room (falling back to polling
+// the job status URL), and the last event carries the download link.
+
+class ExportJobManager {
+    constructor() {
+        this.jobs = {};
+        this.early = {};
+        this.container = null;
+        this.socket = null;
+    }
+
+    initialize() {
+        if (typeof io !== 'undefined') {
+            this.socket = io({ transports: ['websocket', 'polling'] });
+            this.socket.on('export_progress', (state) => this._update(state));
+        }
+
+        // Links marked with data-export-job start a job instead of navigating
+        document.querySelectorAll('a[data-export-job]').forEach(link => {
+            link.addEventListener('click', (event) => {
+                event.preventDefault();
+                this.start(link.getAttribute('href'));
+            });
+        });
+    }
+
+    start(url, options = {}) {
+        const csrfMeta = document.querySelector('meta[name="csrf-token"]');
+        const headers = {
+            'X-Requested-With': 'XMLHttpRequest',
+            'Accept': 'application/json'
+        };
+        if (csrfMeta) {
+            headers['X-CSRFToken'] = csrfMeta.getAttribute('content');
+        }
+
+        return fetch(url, { method: options.method || 'GET', body: options.body, headers: headers })
+            .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+            .then(({ ok, data }) => {
+                if (!ok || !data.job_id) {
+                    this._showError(data.error || 'Could not start the export');
+                    return;
+                }
+                this.jobs[data.job_id] = { statusUrl: data.status_url };
+                // The job may already have reported before this response arrived
+                this._update(this.early[data.job_id] || { job_id: data.job_id, status: 'queued', rows_written: 0, title: 'Export' });
+                delete this.early[data.job_id];
+                if (!this.socket) {
+                    this._poll(data.job_id);
+                }
+            })
+            .catch(() => this._showError('Could not start the export'));
+    }
+
+    _poll(jobId) {
+        const job = this.jobs[jobId];
+        if (!job) return;
+        fetch(job.statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(state => {
+                this._update(state);
+                if (state.status !== 'done' && state.status !== 'failed') {
+                    setTimeout(() => this._poll(jobId), 2000);
+                }
+            })
+            .catch(() => setTimeout(() => this._poll(jobId), 5000));
+    }
+
+    _container() {
+        if (!this.container) {
+            this.container = document.createElement('div');
+            this.container.className = 'fixed bottom-4 right-4 z-50 space-y-2 w-80';
+            document.body.appendChild(this.container);
+        }
+        return this.container;
+    }
+
+    _update(state) {
+        // Only show jobs started from this page
+        if (!this.jobs[state.job_id]) {
+            this.early[state.job_id] = state;
+            return;
+        }
+
+        let toast = document.getElementById(`export-job-${state.job_id}`);
+        if (!toast) {
+            toast = document.createElement('div');
+            toast.id = `export-job-${state.job_id}`;
+            toast.className = 'bg-white border border-gray-200 rounded-lg shadow-lg p-4 text-sm';
+            this._container().appendChild(toast);
+        }
+
+        const title = document.createElement('div');
+        title.className = 'font-medium text-gray-800';
+        title.textContent = state.title || 'Export';
+
+        const detail = document.createElement('div');
+        detail.className = 'mt-1 text-gray-600';
+
+        if (state.status === 'done') {
+            const link = document.createElement('a');
+            link.href = state.download_url;
+            link.className = 'text-blue-600 hover:underline font-medium';
+            link.textContent = `Download (${state.rows_written.toLocaleString()} rows)`;
+            detail.appendChild(link);
+        } else if (state.status === 'failed') {
+            detail.className = 'mt-1 text-red-600';
+            detail.textContent = state.error || 'Export failed';
+        } else if (state.status === 'running') {
+            const total = state.total_rows ? ` of ~${state.total_rows.toLocaleString()}` : '';
+            detail.textContent = `${state.rows_written.toLocaleString()}${total} rows written...`;
+        } else {
+            detail.textContent = 'Waiting to start...';
+        }
+
+        const close = document.createElement('button');
+        close.className = 'float-right text-gray-400 hover:text-gray-600';
+        close.innerHTML = '&times;';
+        close.addEventListener('click', () => {
+            toast.remove();
+            delete this.jobs[state.job_id];
+        });
+
+        toast.replaceChildren(close, title, detail);
+    }
+
+    _showError(message) {
+        const toast = document.createElement('div');
+        toast.className = 'bg-red-50 border border-red-200 text-red-700 rounded-lg shadow-lg p-4 text-sm';
+        toast.textContent = message;
+        this._container().appendChild(toast);
+        setTimeout(() => toast.remove(), 5000);
+    }
+}
+
+window.exportJobs = new ExportJobManager();
+document.addEventListener('DOMContentLoaded', () => window.exportJobs.initialize());
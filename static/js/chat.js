@@ -258,22 +258,21 @@ class ChatManager {
      */
     _onMessageStatusUpdate(data) {
         console.log('[ChatManager] Processing message status update:', JSON.stringify(data));
-        if (data.inquiry_id !== this.options.inquiryId) return;
-
-        const messageEl = document.querySelector(`.message-bubble[data-message-id="${data.message_id}"]`);
-        if (!messageEl) {
-            console.warn('[ChatManager] Message element not found for status update:', data.message_id);
-            return;
-        }
-
-        const statusEl = messageEl.querySelector('.message-status');
-        if (!statusEl) {
-            console.warn('[ChatManager] Status element not found for message:', data.message_id);
-            return;
-        }
-
-        // Update status icon and text
-        this._updateMessageStatusDisplay(statusEl, data.status);
+        if (data.inquiry_id != this.options.inquiryId) return;
+
+        // The update covers every message from from_message_id up to up_to_id
+        const upToId = Number(data.up_to_id || data.message_id);
+        const fromId = Number(data.from_message_id || upToId);
+        this.messageContainer.querySelectorAll('.message-bubble[data-message-id]').forEach(messageEl => {
+            const messageId = Number(messageEl.dataset.messageId);
+            if (messageId < fromId || messageId > upToId) return;
+
+            const statusEl = messageEl.querySelector('.message-status');
+            if (statusEl) {
+                // Update status icon and text
+                this._updateMessageStatusDisplay(statusEl, data.status);
+            }
+        });
 
         // Remove from pending messages if applicable
         if (this.pendingMessages.has(data.message_id)) {
@@ -520,28 +519,26 @@ class ChatManager {
      */
     _markMessageAsDelivered(messageId, senderId) {
         const socket = this.options.socketManager;
-        console.log('[ChatManager] Marking message as delivered:', messageId, 'from sender:', senderId);
+        console.log('[ChatManager] Marking messages as delivered up to:', messageId);
 
-        // Emit delivered status
+        // Emit delivered status; it covers every earlier message too
         socket.emit('chat_message_delivered', {
             inquiry_id: this.options.inquiryId,
-            message_id: messageId,
-            sender_id: senderId
+            up_to_id: messageId
         });
     }
 
     /**
-     * Mark a message as read
+     * Mark a message, and every message before it, as read
      */
     _markMessageAsRead(messageId, senderId) {
         const socket = this.options.socketManager;
-        console.log('[ChatManager] Marking message as read:', messageId, 'from sender:', senderId);
+        console.log('[ChatManager] Marking messages as read up to:', messageId);
 
         // Emit read status
         socket.emit('chat_message_read', {
             inquiry_id: this.options.inquiryId,
-            message_id: messageId,
-            sender_id: senderId
+            up_to_id: messageId
         });
     }
 
@@ -550,26 +547,28 @@ class ChatManager {
      */
     _markVisibleMessagesAsRead() {
         console.log('[ChatManager] Marking visible messages as read');
-        // Process any unread messages
-        if (this.unreadMessages.length > 0) {
-            this.unreadMessages.forEach(msg => {
-                this._markMessageAsRead(msg.id, msg.senderId);
-            });
-            this.unreadMessages = [];
-        }
+        // One "read up to" event for the newest unread message covers the rest
+        let upToId = 0;
+        this.unreadMessages.forEach(msg => {
+            upToId = Math.max(upToId, Number(msg.id));
+        });
+        this.unreadMessages = [];
 
         // Also check for any visible messages that might need to be marked
         const visibleMessages = this.messageContainer.querySelectorAll(`.message-bubble[data-sender-id]:not([data-sender-id="${this.options.currentUserId}"]):not(.message-read)`);
 
         visibleMessages.forEach(messageEl => {
             const messageId = messageEl.dataset.messageId;
-            const senderId = messageEl.dataset.senderId;
 
-            if (messageId && senderId) {
-                this._markMessageAsRead(messageId, senderId);
+            if (messageId) {
+                upToId = Math.max(upToId, Number(messageId));
                 messageEl.classList.add('message-read');
             }
         });
+
+        if (upToId) {
+            this._markMessageAsRead(upToId);
+        }
     }
 
     /**
@@ -131,8 +131,7 @@ class InquiryChat {
                 // Mark message as delivered
                 this.socket.emit('chat_message_delivered', {
                     inquiry_id: this.inquiryId,
-                    message_id: data.message_id || data.id,
-                    sender_id: data.sender_id
+                    up_to_id: data.message_id || data.id
                 });
                 this.debug('Marked message as delivered');
 
@@ -192,9 +191,13 @@ class InquiryChat {
             // Only handle updates for this inquiry
             if (data.inquiry_id != this.inquiryId) return;
 
-            // Update the message status in the UI
-            const messageElement = document.querySelector(`[data-message-id="${data.message_id}"]`);
-            if (messageElement) {
+            // A status update covers every message from from_message_id up to up_to_id
+            const upToId = Number(data.up_to_id || data.message_id);
+            const fromId = Number(data.from_message_id || upToId);
+            this.messageContainer.querySelectorAll('[data-message-id]').forEach((messageElement) => {
+                const messageId = Number(messageElement.getAttribute('data-message-id'));
+                if (messageId < fromId || messageId > upToId) return;
+
                 const statusElement = messageElement.querySelector('.message-status');
                 if (statusElement) {
                     const iconElement = statusElement.querySelector('.status-icon i');
@@ -215,10 +218,9 @@ class InquiryChat {
                     if (textElement) {
                         textElement.textContent = data.status.charAt(0).toUpperCase() + data.status.slice(1);
                     }
-
-                    this.debug('Updated message status in UI');
                 }
-            }
+            });
+            this.debug('Updated message status in UI');
         });
     }
 
@@ -480,10 +482,10 @@ class InquiryChat {
         // Get all message elements that are not from the current user
         const messageElements = this.messageContainer.querySelectorAll('.message-bubble[data-sender-id]:not([data-sender-id="' + this.currentUserId + '"])');
 
-        // Check if each message is visible
+        // Find the newest visible unread message; one "read up to" event covers everything before it
+        let upToId = 0;
         messageElements.forEach((element) => {
             const messageId = element.getAttribute('data-message-id');
-            const senderId = element.getAttribute('data-sender-id');
 
             // Check if the message is in the viewport
             const rect = element.getBoundingClientRect();
@@ -495,18 +497,20 @@ class InquiryChat {
             );
 
             if (isVisible && this.unreadMessages.includes(messageId)) {
-                // Mark the message as read
-                this.socket.emit('chat_message_read', {
-                    inquiry_id: this.inquiryId,
-                    message_id: messageId,
-                    sender_id: senderId
-                });
-                this.debug(`Marked message ${messageId} as read`);
-
-                // Remove from unread messages
-                this.unreadMessages = this.unreadMessages.filter(id => id !== messageId);
+                upToId = Math.max(upToId, Number(messageId));
             }
         });
+
+        if (upToId) {
+            this.socket.emit('chat_message_read', {
+                inquiry_id: this.inquiryId,
+                up_to_id: upToId
+            });
+            this.debug(`Marked messages up to ${upToId} as read`);
+
+            // Everything up to it is read now
+            this.unreadMessages = this.unreadMessages.filter(id => Number(id) > upToId);
+        }
     }
 
     /**
@@ -34,6 +34,7 @@ class ProgressiveChatLoader {
         this.isLoading = false;
         this.hasMoreMessages = true;
         this.oldestMessageId = null;
+        this.cursor = null;
         this.loadingIndicator = null;
 
         // Initialize
@@ -107,8 +108,12 @@ class ProgressiveChatLoader {
         const scrollHeightBefore = this.messageContainer.scrollHeight;
 
         // Build API URL with parameters
+        // The cursor from the previous batch continues exactly where it ended;
+        // the first batch starts before the oldest message rendered server-side
         let apiUrl = `${this.apiEndpoint}?limit=${this.batchSize}`;
-        if (this.oldestMessageId) {
+        if (this.cursor) {
+            apiUrl += `&cursor=${encodeURIComponent(this.cursor)}`;
+        } else if (this.oldestMessageId) {
             apiUrl += `&before_id=${this.oldestMessageId}`;
         }
 
@@ -127,6 +132,7 @@ class ProgressiveChatLoader {
 
                     // Check if there are more messages to load
                     this.hasMoreMessages = data.has_more;
+                    this.cursor = data.cursor || null;
 
                     if (data.messages && data.messages.length > 0) {
                         // Update oldest message ID
@@ -178,6 +184,7 @@ class ProgressiveChatLoader {
         this.isLoading = false;
         this.hasMoreMessages = true;
         this.oldestMessageId = null;
+        this.cursor = null;
 
         const firstMessage = this.messageContainer.querySelector('[data-message-id]');
         if (firstMessage) {